@@ -0,0 +1,30 @@
+"""add movies fulltext index
+
+Revision ID: 4c1f8e2a9b7d
+Revises: 33247af2ebfc
+Create Date: 2026-10-17 20:55:12.418203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1f8e2a9b7d'
+down_revision = '33247af2ebfc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_movies_title_description',
+        'movies',
+        ['title', 'description'],
+        unique=False,
+        mysql_prefix='FULLTEXT',
+    )
+
+
+def downgrade():
+    op.drop_index('ix_movies_title_description', table_name='movies')
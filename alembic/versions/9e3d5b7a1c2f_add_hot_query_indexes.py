@@ -0,0 +1,53 @@
+"""add hot query indexes
+
+Revision ID: 9e3d5b7a1c2f
+Revises: 4c1f8e2a9b7d
+Create Date: 2026-10-17 21:24:37.905114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3d5b7a1c2f'
+down_revision = '4c1f8e2a9b7d'
+branch_labels = None
+depends_on = None
+
+
+indexes = [
+    ('ix_users_email', 'users', ['email'], True),
+    ('ix_user_roles_user_id', 'user_roles', ['user_id'], False),
+    ('ix_operations_parent_id_order_index', 'operations', ['parent_id', 'order_index'], False),
+    ('ix_movies_is_deleted_created_at', 'movies', ['is_deleted', 'created_at'], False),
+    (
+        'ix_movie_images_movie_id_is_deleted_is_thumbnail',
+        'movie_images',
+        ['movie_id', 'is_deleted', 'is_thumbnail'],
+        False,
+    ),
+    (
+        'ix_movie_ratings_movie_id_is_deleted_created_at',
+        'movie_ratings',
+        ['movie_id', 'is_deleted', 'created_at'],
+        False,
+    ),
+    (
+        'ix_movie_comments_movie_id_parent_id_is_deleted_created_at',
+        'movie_comments',
+        ['movie_id', 'parent_id', 'is_deleted', 'created_at'],
+        False,
+    ),
+    ('ix_movie_comments_parent_id_is_deleted', 'movie_comments', ['parent_id', 'is_deleted'], False),
+]
+
+
+def upgrade():
+    for name, table, columns, unique in indexes:
+        op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade():
+    for name, table, columns, unique in reversed(indexes):
+        op.drop_index(name, table_name=table)
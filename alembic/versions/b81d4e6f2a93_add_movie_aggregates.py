@@ -0,0 +1,31 @@
+"""add movie aggregates
+
+Revision ID: b81d4e6f2a93
+Revises: 9e3d5b7a1c2f
+Create Date: 2026-10-17 21:52:06.331870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81d4e6f2a93'
+down_revision = '9e3d5b7a1c2f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('movies', sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('movies', sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('movies', sa.Column('rating_histogram', sa.Text(), nullable=True))
+    op.add_column('movies', sa.Column('comment_count', sa.Integer(), nullable=False, server_default='0'))
+    # Existing rows are filled by `python -m commands.reconcile_aggregates`
+
+
+def downgrade():
+    op.drop_column('movies', 'comment_count')
+    op.drop_column('movies', 'rating_histogram')
+    op.drop_column('movies', 'rating_sum')
+    op.drop_column('movies', 'rating_count')
@@ -0,0 +1,40 @@
+"""add movie filter indexes
+
+Revision ID: c5a7e9d1f3b2
+Revises: b81d4e6f2a93
+Create Date: 2026-10-17 22:31:48.205117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a7e9d1f3b2'
+down_revision = 'b81d4e6f2a93'
+branch_labels = None
+depends_on = None
+
+
+indexes = [
+    ('ix_movies_is_deleted_year', ['is_deleted', 'year']),
+    ('ix_movies_is_deleted_title', ['is_deleted', 'title']),
+    ('ix_movies_is_deleted_rating_average', ['is_deleted', 'rating_average']),
+    ('ix_movies_user_id_is_deleted_created_at', ['user_id', 'is_deleted', 'created_at']),
+    ('ix_movies_user_id_is_deleted_year', ['user_id', 'is_deleted', 'year']),
+]
+
+
+def upgrade():
+    op.add_column('movies', sa.Column('rating_average', sa.Float(), nullable=False, server_default='0'))
+    op.execute(
+        "UPDATE movies SET rating_average = rating_sum / rating_count WHERE rating_count > 0"
+    )
+    for name, columns in indexes:
+        op.create_index(name, 'movies', columns, unique=False)
+
+
+def downgrade():
+    for name, columns in reversed(indexes):
+        op.drop_index(name, table_name='movies')
+    op.drop_column('movies', 'rating_average')
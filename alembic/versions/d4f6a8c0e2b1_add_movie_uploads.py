@@ -0,0 +1,41 @@
+"""add movie uploads
+
+Revision ID: d4f6a8c0e2b1
+Revises: c5a7e9d1f3b2
+Create Date: 2026-10-17 23:12:40.518366
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6a8c0e2b1'
+down_revision = 'c5a7e9d1f3b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('movie_uploads',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('movie_id', sa.String(length=36), nullable=True),
+    sa.Column('user_id', sa.String(length=36), nullable=True),
+    sa.Column('path', sa.String(length=80), nullable=True),
+    sa.Column('content_type', sa.String(length=100), nullable=True),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('upload_offset', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.Column('is_completed', sa.Boolean(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['movie_id'], ['movies.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_movie_uploads_is_completed_expires_at', 'movie_uploads', ['is_completed', 'expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_movie_uploads_is_completed_expires_at', table_name='movie_uploads')
+    op.drop_table('movie_uploads')
@@ -0,0 +1,24 @@
+"""add user permission version
+
+Revision ID: e7b9d1f3a5c6
+Revises: d4f6a8c0e2b1
+Create Date: 2026-10-18 10:04:12.771920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b9d1f3a5c6'
+down_revision = 'd4f6a8c0e2b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('permission_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('users', 'permission_version')
@@ -0,0 +1,26 @@
+"""add movie upload lease
+
+Revision ID: f2c4e6a8b0d3
+Revises: e7b9d1f3a5c6
+Create Date: 2026-10-18 14:21:37.402518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c4e6a8b0d3'
+down_revision = 'e7b9d1f3a5c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('movie_uploads', sa.Column('lease_id', sa.String(length=36), nullable=True))
+    op.add_column('movie_uploads', sa.Column('leased_until', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('movie_uploads', 'leased_until')
+    op.drop_column('movie_uploads', 'lease_id')
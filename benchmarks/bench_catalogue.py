@@ -0,0 +1,129 @@
+"""Compare the SQL and snapshot engines behind movies.get_movie_list.
+
+Usage: python -m benchmarks.bench_catalogue [--sizes 10000 100000 1000000] [--repeat 20]
+
+Each size is loaded into a throwaway SQLite file with the production schema
+and indexes, so the SQL numbers are a lower bound for a networked MySQL.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from config import config
+from database import Base
+from models import MovieModel, UserModel
+from routers.admin.v1.crud import movies
+
+
+WORDS = ["dark", "night", "love", "story", "return", "city", "last", "war", "star", "dream", "lost", "king"]
+
+QUERIES = {
+    "newest": {},
+    "year range": {"sort_by": "year", "order": "asc", "year_from": 1990, "year_to": 1999},
+    "min rating": {"min_rating": 4},
+    "by uploader": {"user_id": "user-7"},
+    "title": {"sort_by": "title", "order": "asc"},
+}
+
+
+def populate(engine, size: int, users: int = 1000, batch_size: int = 20000):
+    random.seed(size)
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(UserModel),
+            [
+                {"id": f"user-{i}", "first_name": "User", "last_name": str(i), "email": f"user{i}@example.com", "password": "x"}
+                for i in range(users)
+            ],
+        )
+        for offset in range(0, size, batch_size):
+            rows = []
+            for i in range(offset, min(size, offset + batch_size)):
+                rating_count = random.choice([0, 0, 1, 3, 10])
+                rating_sum = sum(random.randint(1, 5) for _ in range(rating_count))
+                rows.append({
+                    "id": f"{i:036d}",
+                    "title": " ".join(random.sample(WORDS, 3)),
+                    "description": "",
+                    "year": random.randint(1950, 2024),
+                    "user_id": f"user-{random.randrange(users)}",
+                    "path": "uploads/movies/x.mp4" if random.random() < 0.5 else None,
+                    "rating_count": rating_count,
+                    "rating_sum": rating_sum,
+                    "rating_average": rating_sum / rating_count if rating_count else 0,
+                    "rating_histogram": "{}",
+                    "comment_count": 0,
+                    "is_deleted": False,
+                    "created_at": now - timedelta(seconds=i),
+                    "updated_at": now,
+                })
+            conn.execute(insert(MovieModel), rows)
+
+
+def measure(function, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def run_query(db, engine: str, params: dict, pages: int = 1):
+    config["movie_list_engine"] = engine
+    params = dict(params)
+    sort_by = params.pop("sort_by", "all")
+    order = params.pop("order", "all")
+    user_id = params.pop("user_id", "all")
+    cursor = None
+    for _ in range(pages):
+        data = movies.get_movie_list(db, 0, 20, "all", sort_by, order, user_id, cursor, "none", **params)
+        cursor = data["next_cursor"]
+
+
+def bench(size: int, repeat: int):
+    directory = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    Base.metadata.create_all(engine)
+    started = time.perf_counter()
+    populate(engine, size)
+    print(f"\n{size:,} movies (populated in {time.perf_counter() - started:.1f}s)")
+
+    db = sessionmaker(bind=engine)()
+    started = time.perf_counter()
+    movies.catalogue.clear()
+    movies._catalogue_loaded = False
+    run_query(db, "snapshot", {})
+    print(f"  snapshot load {time.perf_counter() - started:.1f}s")
+
+    print(f"  {'query':<22}{'sql ms':>10}{'snapshot ms':>14}")
+    for name, params in QUERIES.items():
+        for pages in (1, 10):
+            sql = measure(lambda: run_query(db, "sql", params, pages), repeat) / pages
+            snapshot = measure(lambda: run_query(db, "snapshot", params, pages), repeat) / pages
+            label = name if pages == 1 else f"{name} (10 pages)"
+            print(f"  {label:<22}{sql:>10.2f}{snapshot:>14.2f}")
+    db.close()
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench(size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compare file serving throughput of FileResponse and RangeFileResponse.
+
+Usage: python -m benchmarks.bench_ranges [--size-mb 64] [--repeat 3] [--seeks 10]
+
+Responses are driven directly through their ASGI interface with a sink that
+discards the body, so the numbers measure the handler rather than a network.
+"zerocopy" plays the part of a server offering http.response.zerocopysend by
+calling os.sendfile into /dev/null.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from starlette.responses import FileResponse
+
+from libs.ranges import ZEROCOPY, RangeFileResponse
+
+
+def _scope(headers: dict, zerocopy: bool = False):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [(key.lower().encode("latin-1"), value.encode("latin-1")) for key, value in headers.items()],
+    }
+    if zerocopy:
+        scope["extensions"] = {ZEROCOPY: {}}
+    return scope
+
+
+async def serve(response, scope, sink: int):
+    sent = 0
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal sent
+        if message["type"] == "http.response.body":
+            sent += len(message["body"])
+        elif message["type"] == ZEROCOPY:
+            offset, count = message["offset"], message["count"]
+            while count:
+                written = os.sendfile(sink, message["file"].fileno(), offset, count)
+                offset += written
+                count -= written
+                sent += written
+
+    await response(scope, receive, send)
+    return sent
+
+
+def measure(run, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        sent = asyncio.run(run())
+        timings.append(time.perf_counter() - started)
+    return sent, statistics.median(timings)
+
+
+def bench(path: str, size: int, repeat: int, seeks: int):
+    sink = os.open(os.devnull, os.O_WRONLY)
+    random.seed(size)
+    starts = [random.randrange(0, size - 1024 * 1024) for _ in range(seeks)]
+
+    def full(response_class, zerocopy=False):
+        return lambda: serve(response_class(path), _scope({}, zerocopy), sink)
+
+    def seeking(response_class, zerocopy=False):
+        async def run():
+            sent = 0
+            for start in starts:
+                headers = {"Range": f"bytes={start}-{start + 1024 * 1024 - 1}"}
+                sent += await serve(response_class(path), _scope(headers, zerocopy), sink)
+            return sent
+        return run
+
+    cases = [
+        ("full file, FileResponse", full(FileResponse)),
+        ("full file, RangeFileResponse", full(RangeFileResponse)),
+        ("full file, zerocopy", full(RangeFileResponse, zerocopy=True)),
+        (f"{seeks} x 1 MiB seeks, FileResponse", seeking(FileResponse)),
+        (f"{seeks} x 1 MiB seeks, RangeFileResponse", seeking(RangeFileResponse)),
+        (f"{seeks} x 1 MiB seeks, zerocopy", seeking(RangeFileResponse, zerocopy=True)),
+    ]
+    print(f"{'case':<36}{'sent MiB':>10}{'ms':>10}{'MiB/s':>10}")
+    for name, run in cases:
+        sent, seconds = measure(run, repeat)
+        mib = sent / 1024 / 1024
+        print(f"{name:<36}{mib:>10.0f}{seconds * 1000:>10.1f}{mib / seconds:>10.0f}")
+    os.close(sink)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seeks", type=int, default=10)
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    with tempfile.NamedTemporaryFile(suffix=".mp4") as file:
+        block = os.urandom(1024 * 1024)
+        for _ in range(args.size_mb):
+            file.write(block)
+        file.flush()
+        bench(file.name, size, args.repeat, args.seeks)
+
+
+if __name__ == "__main__":
+    main()
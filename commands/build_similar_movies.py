@@ -0,0 +1,44 @@
+"""Rebuild the precomputed "similar movies" store.
+
+Usage: python -m commands.build_similar_movies [--k 20] [--memory-mb 256] [--incremental] [--plain-cosine]
+"""
+import argparse
+import os
+import time
+
+from database import SessionLocal
+from libs.similarity import SimilarityStore
+from routers.admin.v1.crud.recommendations import SIMILARITY_STORE, build_similarity_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=20, help="Neighbours kept per movie")
+    parser.add_argument("--memory-mb", type=int, default=256, help="Budget for one similarity chunk")
+    parser.add_argument("--incremental", action="store_true", help="Only recompute movies rated since the last build")
+    parser.add_argument("--plain-cosine", action="store_true", help="Skip centring ratings on each user's mean")
+    parser.add_argument("--output", default=SIMILARITY_STORE)
+    args = parser.parse_args()
+
+    previous = None
+    if args.incremental and os.path.exists(args.output):
+        previous = SimilarityStore.load(args.output)
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        store = build_similarity_store(
+            db,
+            k=args.k,
+            memory_budget=args.memory_mb * 1024 * 1024,
+            adjusted=not args.plain_cosine,
+            previous=previous,
+        )
+    finally:
+        db.close()
+    store.save(args.output)
+    print(f"Stored neighbours for {len(store)} movies in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""Delete resumable upload sessions that expired before being finalized.
+
+Usage: python -m commands.expire_uploads
+"""
+import argparse
+
+from database import SessionLocal
+from routers.admin.v1.crud.uploads import expire_uploads
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__.splitlines()[0]).parse_args()
+
+    db = SessionLocal()
+    try:
+        removed = expire_uploads(db)
+    finally:
+        db.close()
+    print(f"Removed {removed} expired uploads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Rebuild the rating and comment aggregates stored on ``movies``.
+
+Usage: python -m commands.reconcile_aggregates [--batch-size 500]
+
+Running servers only drop their cached responses if ``invalidation_channel``
+is shared between processes. With the default in-process channel they keep
+serving the old aggregates until ``response_cache_ttl`` expires or they are
+restarted; autocomplete popularity is refreshed on restart.
+"""
+import argparse
+
+from database import SessionLocal
+from libs.invalidation import LocalChannel, channel
+from libs.response_cache import invalidate_responses
+from models import MovieModel
+from routers.admin.v1.crud.movies import rebuild_movie_aggregates
+
+
+def reconcile(db, batch_size: int = 500):
+    last_id = ""
+    checked = changed = 0
+    while True:
+        movie_ids = [
+            row.id
+            for row in db.query(MovieModel.id)
+            .filter(MovieModel.id > last_id)
+            .order_by(MovieModel.id)
+            .limit(batch_size)
+        ]
+        if not movie_ids:
+            break
+        changed += rebuild_movie_aggregates(db, movie_ids)
+        db.commit()
+        checked += len(movie_ids)
+        last_id = movie_ids[-1]
+    if changed:
+        # Reaches running servers only through a shared invalidation_channel
+        invalidate_responses("*")
+    return checked, changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        checked, changed = reconcile(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"Checked {checked} movies, fixed {changed}")
+    if changed and isinstance(channel, LocalChannel):
+        print("No shared invalidation_channel: restart the servers or wait for response_cache_ttl")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,48 @@ config = {
     "db_user": "Database username",
     "db_pass": "Database password",
     "salt": b"Password Salt value",
+    "bcrypt_rounds": 12, # Int - Cost factor for new hashes, None to use the fixed salt
+    "password_workers": 4, # Int - Threads reserved for bcrypt
+    "password_queue_size": 16, # Int - Waiting bcrypt calls before returning 503
     "jwt_key": {},  
     "otp_time": 10, # Int - In minutes
     "url": "URL of frontend website",
+    "token_cache_size": 4096, # Int - Max verified tokens kept in memory
+    "token_cache_ttl": 60, # Int - In seconds
+    "access_token_ttl": 15, # Int - In minutes
+    "refresh_token_ttl": 30, # Int - In days
+    "permission_cache_size": 4096, # Int - Max users kept in memory
+    "permission_cache_ttl": 300, # Int - In seconds
+    "rate_limit_backend": None, # None for in-process, "sqlite:/path/to/file.db" to share between workers
+    "rate_limits": {
+        "login": {"ip": (20, 60), "email": (5, 60)}, # (requests, seconds)
+        "sign-up": {"ip": (5, 60), "email": (3, 60)},
+        "change-password": {"ip": (10, 60), "token": (5, 60)},
+    },
+    "max_page_size": 100, # Int - Largest limit accepted by list endpoints
+    "count_cache_ttl": 30, # Int - In seconds, for filtered list counts
+    "count_counter_ttl": 300, # Int - In seconds, before unfiltered counters are re-counted
+    "search_backend": "auto", # "fulltext" (MySQL), "memory" or "auto" to pick from the database
+    "search_max_results": 1000, # Int - Ranked matches considered by the in-memory search
+    "response_cache_bytes": 33554432, # Int - Memory budget for cached public responses
+    "response_cache_ttl": 300, # Int - In seconds, upper bound if an invalidation is missed
+    "response_cache_max_age": 0, # Int - In seconds, Cache-Control max-age sent to clients
+    "leaderboard_prior_weight": 10, # Int - Votes worth of global mean mixed into top rated scores
+    "leaderboard_rescore_interval": 300, # Int - In seconds, between full leaderboard rebuilds
+    "trending_half_life": 24, # Int - In hours
+    "trending_window": 14, # Int - In days, activity considered when rebuilding trending
+    "trending_weights": {"rating": 1.0, "comment": 0.5},
+    "similarity_store": "uploads/similar_movies.npz", # Written by `python -m commands.build_similar_movies`
+    "movie_list_engine": "sql", # "sql" or "snapshot" to serve public /movies lists from an in-memory NumPy copy
+    "comment_max_depth": 2, # Int - Deepest reply level returned inside a comment thread, deeper ones via /replies
+    "comment_reply_budget": 200, # Int - Most replies returned inside one response across all levels
+    "upload_max_bytes": 17179869184, # Int - Largest video accepted by resumable uploads
+    "upload_chunk_max_bytes": 67108864, # Int - Largest body accepted by one PATCH chunk
+    "upload_expiry": 86400, # Int - In seconds, idle time before an unfinished upload is swept
+    "upload_max_open": 3, # Int - Unfinished uploads one user may hold at a time
+    "upload_lease": 60, # Int - In seconds, how long a chunk write may hold its upload without progress
+    "upload_sweep_interval": 600, # Int - In seconds, minimum gap between sweeps done by new uploads
+    "upload_buffer_bytes": 1048576, # Int - Write size used when streaming raw uploads to disk
+    "image_max_bytes": 10485760, # Int - Largest image accepted by PUT /movies/{movie_id}/images/raw
+    "invalidation_channel": None, # "package.module:Class" shared by workers, None for in-process
 }
\ No newline at end of file
@@ -1,4 +1,8 @@
+from fastapi import Depends, Header
+from sqlalchemy.orm import Session
+
 from database import SessionLocal
+from routers.admin.v1.crud import users
 
 
 # Dependency
@@ -7,4 +11,15 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_current_user(token: str = Header(None), db: Session = Depends(get_db)):
+    return users.verify_token(db, token=token)
+
+
+def require_operation(operation: str):
+    def verify_operation(token: str = Header(None), db: Session = Depends(get_db)):
+        return users.verify_token_operation(db, token=token, operation=operation)
+
+    return verify_operation
@@ -0,0 +1,148 @@
+from bisect import bisect_left, insort
+from heapq import merge
+from threading import RLock
+
+from libs.search import tokenize
+
+
+class PrefixIndex:
+    """Sorted array of ``(key, id)`` pairs answering prefix queries with ``bisect``.
+
+    Every title is stored once per word tail so "kni" finds "The Dark Knight".
+    Titles starting with the query come first, then by ``popularity``.
+
+    Prefixes up to ``bucket_length`` characters also keep their titles in
+    popularity order, split by whether the title starts with the prefix, so
+    one-letter queries read the top of a list instead of every match. Longer
+    prefixes with more than ``max_candidates`` keys walk the bucket of their
+    first ``bucket_length`` characters in that order and stop at ``limit``.
+    """
+
+    def __init__(self, max_candidates: int = 5000, bucket_length: int = 3):
+        self.max_candidates = max_candidates
+        self.bucket_length = bucket_length
+        self._keys = []
+        self._items = {}
+        self._buckets = {}
+        self._lock = RLock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _entry(self, title: str, popularity: float):
+        words = tokenize(title)
+        key = " ".join(words)
+        tails = tuple({" ".join(words[position:]) for position in range(len(words))})
+        prefixes = {
+            tail[:length]: key.startswith(tail[:length])
+            for tail in tails
+            for length in range(1, min(len(tail), self.bucket_length) + 1)
+            if tail[length - 1] != " "
+        }
+        return {"title": title, "popularity": popularity, "key": key, "tails": tails, "prefixes": prefixes}
+
+    @staticmethod
+    def _rank(item_id: str, entry: dict):
+        return (-entry["popularity"], entry["title"], item_id)
+
+    def _bucket(self, prefix: str, starts: bool):
+        buckets = self._buckets.get(prefix)
+        if buckets is None:
+            buckets = self._buckets[prefix] = ([], [])
+        return buckets[0] if starts else buckets[1]
+
+    def _unbucket(self, item_id: str, entry: dict):
+        rank = self._rank(item_id, entry)
+        for prefix, starts in entry["prefixes"].items():
+            bucket = self._bucket(prefix, starts)
+            position = bisect_left(bucket, rank)
+            if position < len(bucket) and bucket[position] == rank:
+                del bucket[position]
+
+    def _rebucket(self, item_id: str, entry: dict):
+        rank = self._rank(item_id, entry)
+        for prefix, starts in entry["prefixes"].items():
+            insort(self._bucket(prefix, starts), rank)
+
+    def add(self, item_id: str, title: str, popularity: float = 0):
+        entry = self._entry(title, popularity)
+        with self._lock:
+            self.remove(item_id)
+            for tail in entry["tails"]:
+                insort(self._keys, (tail, item_id))
+            self._rebucket(item_id, entry)
+            self._items[item_id] = entry
+
+    def extend(self, items):
+        """Bulk load ``(id, title, popularity)`` rows, sorting once at the end."""
+        with self._lock:
+            for item_id, title, popularity in items:
+                entry = self._entry(title, popularity)
+                self._items[item_id] = entry
+                self._keys.extend((tail, item_id) for tail in entry["tails"])
+                rank = self._rank(item_id, entry)
+                for prefix, starts in entry["prefixes"].items():
+                    self._bucket(prefix, starts).append(rank)
+            self._keys.sort()
+            for buckets in self._buckets.values():
+                buckets[0].sort()
+                buckets[1].sort()
+
+    def remove(self, item_id: str):
+        with self._lock:
+            entry = self._items.pop(item_id, None)
+            if entry is None:
+                return
+            for tail in entry["tails"]:
+                position = bisect_left(self._keys, (tail, item_id))
+                if position < len(self._keys) and self._keys[position] == (tail, item_id):
+                    del self._keys[position]
+            self._unbucket(item_id, entry)
+
+    def set_popularity(self, item_id: str, popularity: float):
+        with self._lock:
+            entry = self._items.get(item_id)
+            if entry is not None and entry["popularity"] != popularity:
+                self._unbucket(item_id, entry)
+                entry["popularity"] = popularity
+                self._rebucket(item_id, entry)
+
+    def search(self, query: str, limit: int = 10):
+        """Return ``[(id, title), ...]`` for titles with a word starting with ``query``."""
+        prefix = " ".join(tokenize(query))
+        if not prefix:
+            return []
+        with self._lock:
+            if len(prefix) <= self.bucket_length:
+                starts, others = self._buckets.get(prefix, ([], []))
+                ranked = starts[:limit] + others[:max(0, limit - len(starts))]
+            else:
+                position = bisect_left(self._keys, (prefix,))
+                end = bisect_left(self._keys, (prefix + "\uffff",))
+                if end - position <= self.max_candidates:
+                    ranked = self._scan(prefix, position, end, limit)
+                else:
+                    ranked = self._walk(prefix, limit)
+        return [(rank[2], rank[1]) for rank in ranked]
+
+    def _scan(self, prefix: str, position: int, end: int, limit: int):
+        ranks = {}
+        for tail, item_id in self._keys[position:end]:
+            if item_id not in ranks:
+                entry = self._items[item_id]
+                ranks[item_id] = (not entry["key"].startswith(prefix), self._rank(item_id, entry))
+        return [rank for _, rank in sorted(ranks.values())[:limit]]
+
+    def _walk(self, prefix: str, limit: int):
+        # Every title with a tail starting with ``prefix`` is in this bucket pair
+        starts, others = self._buckets.get(prefix[:self.bucket_length], ([], []))
+        first, second = [], []
+        for rank in merge(starts, others):
+            entry = self._items[rank[2]]
+            if entry["key"].startswith(prefix):
+                first.append(rank)
+                if len(first) >= limit:
+                    break
+            elif len(second) < limit and any(tail.startswith(prefix) for tail in entry["tails"]):
+                second.append(rank)
+        return first + second[:limit - len(first)]
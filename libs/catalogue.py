@@ -0,0 +1,301 @@
+from datetime import datetime
+from threading import RLock
+
+import numpy as np
+
+from fastapi import HTTPException, status
+
+from libs.pagination import decode_cursor, encode_cursor
+from libs.search import normalize
+
+
+NO_YEAR = np.iinfo(np.int32).min
+EXTRA_FIELDS = ("description", "rating_count", "rating_sum", "rating_histogram", "comment_count", "thumbnail")
+
+
+def _to_micros(value: datetime):
+    return np.datetime64(value, "us").astype(np.int64)
+
+
+def _from_micros(value):
+    return np.datetime64(int(value), "us").item()
+
+
+class MovieSnapshot:
+    """Struct-of-arrays copy of the live movie catalogue.
+
+    Filter columns live in NumPy arrays. Each sort column keeps a cached
+    ``lexsort`` order, dropped on the next write, that list queries walk from
+    the cursor position while filtering chunk by chunk. Deleted rows are
+    tombstoned and reclaimed by ``compact`` once they pile up. Ties on the
+    sort column are broken by ``id`` as in the SQL path, so a cursor means the
+    same thing on every worker and in both engines.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = RLock()
+        self._reset(capacity)
+
+    def _reset(self, capacity: int):
+        self.size = 0
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.id_rank = np.zeros(capacity, dtype=np.int64)
+        self.year = np.zeros(capacity, dtype=np.int32)
+        self.created_at = np.zeros(capacity, dtype=np.int64)
+        self.rating = np.zeros(capacity, dtype=np.float64)
+        self.has_video = np.zeros(capacity, dtype=bool)
+        self.user = np.zeros(capacity, dtype=np.int32)
+        self.title_rank = np.zeros(capacity, dtype=np.int64)
+        self.ids = []
+        self.titles = []
+        self.title_keys = []
+        self.extras = []
+        self._rows = {}
+        self._users = {}
+        self._user_ids = []
+        self._title_values = np.zeros(0, dtype=str)
+        self._titles_dirty = False
+        self._id_values = np.zeros(0, dtype=str)
+        self._ids_dirty = False
+        self._deleted = 0
+        self._orders = {}
+        self._counts = {}
+
+    def __len__(self):
+        return len(self._rows) - self._deleted
+
+    def _grow(self):
+        capacity = max(1024, len(self.alive) * 2)
+        for name in ("alive", "id_rank", "year", "created_at", "rating", "has_video", "user", "title_rank"):
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def _user_code(self, user_id: str):
+        code = self._users.get(user_id)
+        if code is None:
+            code = self._users[user_id] = len(self._user_ids)
+            self._user_ids.append(user_id)
+        return code
+
+    def upsert(self, record: dict):
+        """Insert or replace a movie given as a dict of its list fields."""
+        with self._lock:
+            row = self._rows.get(record["id"])
+            if row is None:
+                if self.size == len(self.alive):
+                    self._grow()
+                row = self.size
+                self.size += 1
+                self._rows[record["id"]] = row
+                self._ids_dirty = True
+                self.ids.append(record["id"])
+                self.titles.append(None)
+                self.title_keys.append(None)
+                self.extras.append(None)
+            elif not self.alive[row]:
+                self._deleted -= 1
+            self._orders.clear()
+            self._counts.clear()
+            self.alive[row] = True
+            self.year[row] = NO_YEAR if record["year"] is None else record["year"]
+            self.created_at[row] = _to_micros(record["created_at"])
+            self.rating[row] = record["rating_average"] or 0
+            self.has_video[row] = bool(record["has_video"])
+            self.user[row] = self._user_code(record["user_id"])
+            title_key = normalize(record["title"])
+            if title_key != self.title_keys[row]:
+                self._titles_dirty = True
+            self.titles[row] = record["title"]
+            self.title_keys[row] = title_key
+            self.extras[row] = tuple(record[field] for field in EXTRA_FIELDS)
+
+    def clear(self):
+        with self._lock:
+            self._reset(1024)
+
+    def extend(self, records):
+        for record in records:
+            self.upsert(record)
+
+    def remove(self, movie_id: str):
+        with self._lock:
+            row = self._rows.get(movie_id)
+            if row is None or not self.alive[row]:
+                return
+            self.alive[row] = False
+            self._deleted += 1
+            self._counts.clear()
+            if self._deleted > 1024 and self._deleted * 4 > len(self._rows):
+                self.compact()
+
+    def compact(self):
+        with self._lock:
+            keep = np.flatnonzero(self.alive[:self.size])
+            records = [self._record(row) for row in keep]
+            self._reset(max(1024, len(keep)))
+            self.extend(records)
+
+    def _record(self, row: int):
+        record = dict(zip(EXTRA_FIELDS, self.extras[row]))
+        year = int(self.year[row])
+        record.update(
+            id=self.ids[row],
+            title=self.titles[row],
+            year=None if year == NO_YEAR else year,
+            created_at=_from_micros(self.created_at[row]),
+            rating_average=float(self.rating[row]),
+            has_video=bool(self.has_video[row]),
+            user_id=self._user_ids[self.user[row]],
+        )
+        return record
+
+    def _rank_titles(self):
+        if not self._titles_dirty:
+            return
+        keys = np.asarray([key or "" for key in self.title_keys], dtype=str)
+        self._title_values, ranks = np.unique(keys, return_inverse=True)
+        self.title_rank[:self.size] = ranks
+        self._titles_dirty = False
+
+    def _rank_ids(self):
+        if not self._ids_dirty:
+            return
+        self._id_values, ranks = np.unique(np.asarray(self.ids, dtype=str), return_inverse=True)
+        self.id_rank[:self.size] = ranks
+        self._ids_dirty = False
+
+    def _id_key(self, item_id: str):
+        # A row that is no longer in the snapshot keeps its place between two ids
+        position = np.searchsorted(self._id_values, item_id)
+        exact = position < len(self._id_values) and self._id_values[position] == item_id
+        return float(position) if exact else position - 0.5
+
+    def _sort_key(self, sort_key: str, size: int):
+        if sort_key == "title":
+            self._rank_titles()
+            return self.title_rank[:size]
+        if sort_key == "year":
+            return self.year[:size].astype(np.int64)
+        if sort_key == "rating":
+            return self.rating[:size]
+        return self.created_at[:size]
+
+    def _cursor_key(self, sort_key: str, value):
+        if sort_key == "title":
+            # A title that is no longer in the snapshot falls between two ranks
+            position = np.searchsorted(self._title_values, value)
+            exact = position < len(self._title_values) and self._title_values[position] == value
+            return float(position) if exact else position - 0.5
+        if sort_key == "year":
+            return NO_YEAR if value is None else int(value)
+        if sort_key == "rating":
+            return float(value)
+        return _to_micros(value)
+
+    def _cursor_value(self, sort_key: str, row: int):
+        if sort_key == "title":
+            return self.title_keys[row]
+        if sort_key == "year":
+            year = int(self.year[row])
+            return None if year == NO_YEAR else year
+        if sort_key == "rating":
+            return float(self.rating[row])
+        return _from_micros(self.created_at[row])
+
+    def _order(self, sort_key: str):
+        """Row positions sorted by ``(key, id)`` plus the sorted keys and ties."""
+        order = self._orders.get(sort_key)
+        if order is None:
+            self._rank_ids()
+            keys = self._sort_key(sort_key, self.size)
+            ties = self.id_rank[:self.size]
+            positions = np.lexsort((ties, keys))
+            order = self._orders[sort_key] = (positions, keys[positions], ties[positions])
+        return order
+
+    def _match(self, rows, user_code, year_from, year_to, has_video, min_rating):
+        matched = self.alive[rows].copy()
+        if user_code is not None:
+            matched &= self.user[rows] == user_code
+        if year_from is not None:
+            matched &= self.year[rows] >= year_from
+        if year_to is not None:
+            matched &= (self.year[rows] <= year_to) & (self.year[rows] != NO_YEAR)
+        if min_rating is not None:
+            matched &= self.rating[rows] >= min_rating
+        if has_video is not None:
+            matched &= self.has_video[rows] == has_video
+        return matched
+
+    def query(
+        self,
+        user_id: str = None,
+        year_from: int = None,
+        year_to: int = None,
+        has_video: bool = None,
+        min_rating: float = None,
+        sort_key: str = "created_at",
+        descending: bool = True,
+        limit: int = 10,
+        cursor: str = None,
+        start: int = 0,
+    ):
+        """Return ``(movie records, count, next_cursor)`` for one list page.
+
+        The page is read by walking the cached sort order from the cursor
+        position in growing chunks, so only the filter count touches every row.
+        """
+        with self._lock:
+            user_code = None
+            if user_id is not None:
+                user_code = self._users.get(user_id)
+                if user_code is None:
+                    return [], 0, None
+            filters = (user_code, year_from, year_to, has_video, min_rating)
+            count = self._counts.get(filters)
+            if count is None:
+                count = self._counts[filters] = int(np.count_nonzero(self._match(slice(0, self.size), *filters)))
+
+            positions, keys, ties = self._order(sort_key)
+            # Ascending walks forward from ``position``, descending backwards from it
+            position = 0 if not descending else len(positions)
+            payload = decode_cursor(cursor) if cursor else None
+            if payload and payload[0] == "k":
+                try:
+                    key = self._cursor_key(sort_key, payload[1])
+                except (TypeError, ValueError):
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid cursor"
+                    )
+                low = np.searchsorted(keys, key, "left")
+                high = np.searchsorted(keys, key, "right")
+                side = "left" if descending else "right"
+                position = low + np.searchsorted(ties[low:high], self._id_key(str(payload[2])), side)
+                start = 0
+            elif payload and payload[0] == "o":
+                start = payload[1]
+
+            wanted = start + limit + 1
+            found, matched = 0, []
+            chunk = max(256, wanted * 4)
+            while found < wanted and (position > 0 if descending else position < len(positions)):
+                if descending:
+                    rows = positions[max(0, position - chunk):position][::-1]
+                    position = max(0, position - chunk)
+                else:
+                    rows = positions[position:position + chunk]
+                    position += chunk
+                rows = rows[self._match(rows, *filters)]
+                matched.append(rows)
+                found += len(rows)
+                chunk *= 4
+            selected = np.concatenate(matched)[start:wanted] if matched else []
+
+            next_cursor = None
+            if len(selected) > limit:
+                selected = selected[:limit]
+                last = selected[-1]
+                next_cursor = encode_cursor(["k", self._cursor_value(sort_key, last), self.ids[last]])
+            return [self._record(row) for row in selected], count, next_cursor
@@ -0,0 +1,75 @@
+import time
+
+from threading import Lock
+
+from sqlalchemy import text
+
+from config import config
+from libs.cache import TTLCache
+
+
+class CountCache:
+    """Row counts for list endpoints.
+
+    Unfiltered counts come from per-table counters that are seeded with one
+    ``COUNT(*)``, adjusted by the write paths and re-seeded every
+    ``counter_ttl`` seconds to absorb drift from other workers. Filtered
+    counts are cached by a normalised filter key for ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl: float = 30, counter_ttl: float = 300, maxsize: int = 4096):
+        self.counter_ttl = counter_ttl
+        self._filtered = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._counters = {}
+        self._lock = Lock()
+
+    def count(self, db, query, table: str, filters: dict = None, mode: str = "exact"):
+        if mode == "none":
+            return None
+        filters = {key: value for key, value in (filters or {}).items() if value is not None}
+        if not filters:
+            if mode == "estimate":
+                estimate = self.estimate(db, table)
+                if estimate is not None:
+                    return estimate
+            return self._counter(query, table)
+        key = (table, tuple(sorted(filters.items())))
+        value = self._filtered.get(key)
+        if value is None:
+            value = query.order_by(None).count()
+            self._filtered.set(key, value)
+        return value
+
+    def _counter(self, query, table: str):
+        with self._lock:
+            counter = self._counters.get(table)
+        if counter is not None and counter[1] > time.monotonic():
+            return counter[0]
+        value = query.order_by(None).count()
+        with self._lock:
+            self._counters[table] = (value, time.monotonic() + self.counter_ttl)
+        return value
+
+    def estimate(self, db, table: str):
+        if db.bind.dialect.name != "mysql":
+            return None
+        return db.execute(
+            text(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+            ),
+            {"table": table},
+        ).scalar()
+
+    def incr(self, table: str, delta: int = 1):
+        with self._lock:
+            counter = self._counters.get(table)
+            if counter is not None:
+                self._counters[table] = (max(0, counter[0] + delta), counter[1])
+        self._filtered.invalidate_keys(lambda key: key[0] == table)
+
+
+counts = CountCache(
+    ttl=config.get("count_cache_ttl", 30),
+    counter_ttl=config.get("count_counter_ttl", 300),
+)
@@ -0,0 +1,41 @@
+import importlib
+
+from collections import defaultdict
+from threading import Lock
+
+from config import config
+
+
+class LocalChannel:
+    """In-process invalidation channel, only reaches the current worker.
+
+    Any object with the same ``subscribe``/``publish`` methods can be plugged
+    in through ``config["invalidation_channel"]`` ("package.module:Class") to
+    fan messages out to every worker, e.g. on top of Redis pub/sub.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(list)
+        self._lock = Lock()
+
+    def subscribe(self, topic: str, callback):
+        with self._lock:
+            self._subscribers[topic].append(callback)
+
+    def publish(self, topic: str, message: str):
+        with self._lock:
+            callbacks = list(self._subscribers[topic])
+        for callback in callbacks:
+            callback(message)
+
+
+def _load_channel():
+    path = config.get("invalidation_channel")
+    if not path:
+        return LocalChannel()
+    module_name, class_name = path.split(":")
+    channel_class = getattr(importlib.import_module(module_name), class_name)
+    return channel_class()
+
+
+channel = _load_channel()
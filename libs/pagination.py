@@ -0,0 +1,128 @@
+import base64
+import json
+
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+from config import config
+
+
+MAX_PAGE_SIZE = config.get("max_page_size", 100)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(payload: list):
+    data = json.dumps([_encode_value(value) for value in payload], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _invalid_cursor():
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid cursor"
+    )
+
+
+def _valid_payload(payload):
+    """``["o", offset]`` or ``["k", sort value, id]``."""
+    if not isinstance(payload, list) or not payload:
+        return False
+    if payload[0] == "o":
+        return len(payload) == 2 and type(payload[1]) is int and payload[1] >= 0
+    if payload[0] == "k":
+        value, last_id = payload[1:] if len(payload) == 3 else (None, None)
+        return (
+            type(last_id) in (str, int)
+            and (value is None or type(value) in (str, int, float, dict))
+        )
+    return False
+
+
+def decode_cursor(cursor: str):
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        if not _valid_payload(payload):
+            raise ValueError(cursor)
+        return [_decode_value(value) for value in payload]
+    except (ValueError, TypeError, KeyError, IndexError):
+        raise _invalid_cursor()
+
+
+def get_sort(columns: dict, sort_by: str, order: str, default):
+    """Resolve ``sort_by``/``order``; unknown keys sort by ``default`` newest first."""
+    if sort_by in columns:
+        return columns[sort_by], order == "desc"
+    return default, True
+
+
+def _after(sort_column, id_column, descending: bool, value, last_id):
+    """Rows that come after ``(value, last_id)``; ``col > NULL`` would match nothing."""
+    if value is None:
+        after_id = id_column < last_id if descending else id_column > last_id
+        tied = and_(sort_column.is_(None), after_id)
+        # NULLs are the last group when descending, the first when ascending
+        return tied if descending else or_(sort_column.isnot(None), tied)
+    if descending:
+        return or_(
+            sort_column < value,
+            and_(sort_column == value, id_column < last_id),
+            sort_column.is_(None),
+        )
+    return or_(sort_column > value, and_(sort_column == value, id_column > last_id))
+
+
+def paginate(query, sort_column, id_column, descending: bool, limit: int, cursor: str = None, start: int = 0):
+    """Page ``query`` by ``(sort_column, id_column)``.
+
+    A cursor continues after the last row of the previous page. Without one,
+    ``start`` falls back to an offset for older clients. Pass ``sort_column``
+    as ``None`` to keep the query's own ordering and page by offset cursors.
+    NULL sort values are kept in the order MySQL and SQLite give them: first
+    when ascending, last when descending.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    payload = decode_cursor(cursor) if cursor else None
+    if payload and payload[0] != ("o" if sort_column is None else "k"):
+        raise _invalid_cursor()
+
+    if sort_column is None:
+        offset = payload[1] if payload and payload[0] == "o" else start
+        results = query.offset(offset).limit(limit + 1).all()
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_cursor = encode_cursor(["o", offset + limit])
+        return results, next_cursor
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column, id_column)
+
+    if payload:
+        query = query.filter(_after(sort_column, id_column, descending, payload[1], payload[2]))
+    elif start:
+        query = query.offset(start)
+
+    results = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        next_cursor = encode_cursor(
+            ["k", getattr(last, sort_column.key), getattr(last, id_column.key)]
+        )
+    return results, next_cursor
@@ -0,0 +1,86 @@
+import asyncio
+import math
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from time import perf_counter
+
+from fastapi import HTTPException, status
+
+
+class PasswordPool:
+    """Dedicated, bounded thread pool for bcrypt work.
+
+    bcrypt releases the GIL, so a small pool gives real parallelism. ``run``
+    is awaited from async handlers, so neither the queue wait nor the hash
+    holds one of Starlette's threadpool threads. Calls beyond
+    ``max_workers + max_queue`` are rejected with a 503.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 16):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password"
+        )
+        self._slots = BoundedSemaphore(max_workers + max_queue)
+        self._lock = Lock()
+        self._stats = {
+            "completed": 0,
+            "rejected": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+            "hash_total": 0.0,
+            "hash_max": 0.0,
+        }
+
+    def _record(self, wait: float, elapsed: float):
+        with self._lock:
+            self._stats["completed"] += 1
+            self._stats["wait_total"] += wait
+            self._stats["wait_max"] = max(self._stats["wait_max"], wait)
+            self._stats["hash_total"] += elapsed
+            self._stats["hash_max"] = max(self._stats["hash_max"], elapsed)
+
+    def _retry_after(self):
+        with self._lock:
+            completed = self._stats["completed"]
+            average = self._stats["hash_total"] / completed if completed else 0.25
+        backlog = (self.max_workers + self.max_queue) / self.max_workers
+        return max(1, math.ceil(average * backlog))
+
+    async def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry.",
+                headers={"Retry-After": str(self._retry_after())},
+            )
+        submitted = perf_counter()
+
+        def task():
+            started = perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self._record(started - submitted, perf_counter() - started)
+
+        try:
+            future = self._executor.submit(task)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        completed = data["completed"]
+        data["wait_avg"] = data["wait_total"] / completed if completed else 0.0
+        data["hash_avg"] = data["hash_total"] / completed if completed else 0.0
+        data["max_workers"] = self.max_workers
+        data["max_queue"] = self.max_queue
+        return data
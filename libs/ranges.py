@@ -0,0 +1,183 @@
+import os
+import stat
+
+from email.utils import formatdate, parsedate_to_datetime
+from secrets import token_hex
+
+import aiofiles
+from aiofiles.os import stat as aio_stat
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+
+
+MAX_RANGES = 16
+ZEROCOPY = "http.response.zerocopysend"
+
+
+def parse_range(header: str, size: int):
+    """Parse a ``Range`` header into sorted, merged ``[(start, end)]`` pairs (end exclusive).
+
+    Returns ``None`` when the header should be ignored (bad syntax, another
+    unit, too many ranges) and ``[]`` when no range overlaps the file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(","):
+        first, dash, last = part.strip().partition("-")
+        if not dash or not (first + last).isdigit():
+            return None
+        if first:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            end = int(last) + 1 if last else size
+        else:
+            # Suffix range: the last N bytes
+            if not int(last):
+                continue
+            start, end = max(0, size - int(last)), size
+        if start < size:
+            ranges.append((start, min(end, size)))
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _timestamp(value: str):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _etag_matches(header: str, etag: str):
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+class RangeFileResponse(FileResponse):
+    """``FileResponse`` that answers ``Range``, ``If-Range`` and conditional requests.
+
+    The request headers are read from the ASGI scope, so it is a drop-in
+    replacement. File data goes out through the server's ``zerocopysend``
+    extension (``os.sendfile``) when it offers one, otherwise in
+    ``chunk_size`` reads.
+    """
+
+    chunk_size = 256 * 1024
+
+    def set_stat_headers(self, stat_result: os.stat_result):
+        self.headers.setdefault("content-length", str(stat_result.st_size))
+        self.headers.setdefault("last-modified", formatdate(stat_result.st_mtime, usegmt=True))
+        self.headers.setdefault("etag", f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"')
+        self.headers.setdefault("accept-ranges", "bytes")
+
+    def _not_modified(self, request: Headers, mtime: float):
+        if "if-none-match" in request:
+            return _etag_matches(request["if-none-match"], self.headers["etag"])
+        since = _timestamp(request.get("if-modified-since"))
+        return since is not None and int(mtime) <= since
+
+    def _ranges(self, request: Headers, size: int, mtime: float):
+        if "range" not in request:
+            return None
+        if_range = request.get("if-range")
+        if if_range is not None:
+            if if_range.startswith(('"', "W/")):
+                # Only a strong, exactly matching validator lets a partial response through
+                if if_range != self.headers["etag"]:
+                    return None
+            elif _timestamp(if_range) != int(mtime):
+                return None
+        return parse_range(request["range"], size)
+
+    async def __call__(self, scope, receive, send):
+        stat_result = self.stat_result
+        if stat_result is None:
+            try:
+                stat_result = await aio_stat(self.path)
+            except FileNotFoundError:
+                raise RuntimeError(f"File at path {self.path} does not exist.")
+            if not stat.S_ISREG(stat_result.st_mode):
+                raise RuntimeError(f"File at path {self.path} is not a file.")
+            self.set_stat_headers(stat_result)
+        size, mtime = stat_result.st_size, stat_result.st_mtime
+
+        request = Headers(scope=scope)
+        ranges = None
+        if scope["method"] in ("GET", "HEAD") and self.status_code == 200:
+            if self._not_modified(request, mtime):
+                self.status_code = 304
+                del self.headers["content-length"]
+                del self.headers["content-type"]
+            elif scope["method"] == "GET":
+                ranges = self._ranges(request, size, mtime)
+
+        parts = []
+        tail = b""
+        if ranges == []:
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{size}"
+            self.headers["content-length"] = "0"
+        elif ranges and len(ranges) == 1:
+            start, end = ranges[0]
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+            self.headers["content-length"] = str(end - start)
+            parts = [(b"", start, end)]
+        elif ranges:
+            boundary = token_hex(13)
+            for start, end in ranges:
+                head = (
+                    f"--{boundary}\r\n"
+                    f"Content-Type: {self.media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n"
+                ).encode("latin-1")
+                parts.append(((b"\r\n" if parts else b"") + head, start, end))
+            tail = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            self.status_code = 206
+            self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+            self.headers["content-length"] = str(
+                sum(len(head) + end - start for head, start, end in parts) + len(tail)
+            )
+        elif self.status_code == 200:
+            parts = [(b"", 0, size)]
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] != "HEAD" and parts:
+            if ZEROCOPY in scope.get("extensions", {}):
+                with open(self.path, "rb") as file:
+                    await self._send_parts(send, parts, file, zerocopy=True)
+            else:
+                async with aiofiles.open(self.path, "rb") as file:
+                    await self._send_parts(send, parts, file, zerocopy=False)
+            if tail:
+                await send({"type": "http.response.body", "body": tail, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+    async def _send_parts(self, send, parts, file, zerocopy: bool):
+        for head, start, end in parts:
+            if head:
+                await send({"type": "http.response.body", "body": head, "more_body": True})
+            if zerocopy:
+                await send({"type": ZEROCOPY, "file": file, "offset": start, "count": end - start, "more_body": True})
+                continue
+            await file.seek(start)
+            remaining = end - start
+            while remaining:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
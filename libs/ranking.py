@@ -0,0 +1,68 @@
+from bisect import bisect_right, insort
+from threading import Lock
+
+from fastapi import HTTPException, status
+
+from libs.pagination import decode_cursor, encode_cursor
+
+
+class RankedList:
+    """Ids kept sorted by score, best first, with keyset cursors.
+
+    Entries are stored as ``(-score, id)`` tuples in a plain sorted list, so
+    a single update is one ``bisect`` removal plus one ``insort``.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._scores = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _discard(self, item_id):
+        score = self._scores.pop(item_id, None)
+        if score is None:
+            return
+        key = (-score, item_id)
+        position = bisect_right(self._keys, key) - 1
+        if position >= 0 and self._keys[position] == key:
+            del self._keys[position]
+
+    def update(self, item_id, score: float = None):
+        """Set the score of ``item_id``; ``None`` removes it."""
+        with self._lock:
+            self._discard(item_id)
+            if score is not None:
+                self._scores[item_id] = score
+                insort(self._keys, (-score, item_id))
+
+    def replace(self, scores: dict):
+        keys = sorted((-score, item_id) for item_id, score in scores.items())
+        with self._lock:
+            self._keys = keys
+            self._scores = dict(scores)
+
+    def score(self, item_id):
+        return self._scores.get(item_id)
+
+    def page(self, limit: int, cursor: str = None):
+        """Return ``([(id, score), ...], next_cursor)`` after ``cursor``."""
+        with self._lock:
+            position = 0
+            if cursor:
+                payload = decode_cursor(cursor)
+                try:
+                    if payload[0] == "k":
+                        position = bisect_right(self._keys, (float(payload[1]), str(payload[2])))
+                except (TypeError, ValueError, IndexError):
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid cursor"
+                    )
+            keys = self._keys[position:position + limit + 1]
+        next_cursor = None
+        if len(keys) > limit:
+            keys = keys[:limit]
+            next_cursor = encode_cursor(["k", keys[-1][0], keys[-1][1]])
+        return [(item_id, -score) for score, item_id in keys], next_cursor
@@ -0,0 +1,119 @@
+import importlib
+import math
+import sqlite3
+import time
+
+from collections import OrderedDict
+from threading import Lock, local
+
+from fastapi import HTTPException, status
+
+
+class MemoryBackend:
+    """Token buckets for the current process, evicting least recently used keys."""
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def consume(self, key: str, rate: float, capacity: float, cost: float = 1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        retry_after = 0 if allowed else (cost - tokens) / rate
+        return allowed, retry_after
+
+
+class SqliteBackend:
+    """Token buckets in a local SQLite file shared by every worker on the host."""
+
+    def __init__(self, path: str, prune_every: int = 1000):
+        self.path = path
+        self.prune_every = prune_every
+        self._calls = 0
+        self._local = local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL, updated REAL, idle REAL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key: str, rate: float, capacity: float, cost: float = 1):
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)",
+                (key, tokens, now, now + capacity / rate),
+            )
+            self._calls += 1
+            if self._calls % self.prune_every == 0:
+                # A bucket idle for a full refill is indistinguishable from a new one
+                conn.execute("DELETE FROM buckets WHERE idle < ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        retry_after = 0 if allowed else (cost - tokens) / rate
+        return allowed, retry_after
+
+
+def load_backend(name: str = None):
+    if not name or name == "memory":
+        return MemoryBackend()
+    if name.startswith("sqlite:"):
+        return SqliteBackend(name[len("sqlite:"):])
+    module_name, class_name = name.split(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class RateLimiter:
+    """Applies ``rules`` of ``{scope: {key_name: (requests, seconds)}}``."""
+
+    def __init__(self, backend, rules: dict):
+        self.backend = backend
+        self.rules = rules
+
+    def check(self, scope: str, **keys):
+        rules = self.rules.get(scope, {})
+        for key_name, value in keys.items():
+            if value is None or key_name not in rules:
+                continue
+            requests, seconds = rules[key_name]
+            allowed, retry_after = self.backend.consume(
+                f"{scope}:{key_name}:{value}",
+                rate=requests / seconds,
+                capacity=requests,
+            )
+            if not allowed:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests, please retry later.",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+        return
@@ -0,0 +1,173 @@
+import hashlib
+import time
+
+from collections import OrderedDict, defaultdict
+from threading import Lock
+
+from fastapi import Request, Response, status
+
+from config import config
+from libs.invalidation import channel
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "tags", "expires_at")
+
+    def __init__(self, body: bytes, tags, ttl: float):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.tags = frozenset(tags)
+        self.expires_at = time.monotonic() + ttl
+
+
+class ResponseCache:
+    """Serialized response bodies kept under an LRU byte budget.
+
+    Every entry carries tags ("movies", "movie:<id>", ...) and is dropped as
+    soon as a write path invalidates one of them. ``ttl`` only bounds how
+    long an entry can outlive a missed invalidation from another worker.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: float = 300, max_age: int = 0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_age = max_age
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+        self._entries = OrderedDict()
+        self._tags = defaultdict(set)
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, body: bytes, tags, version: int):
+        entry = CachedResponse(body, tags, self.ttl)
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            # An invalidation ran while the body was being built
+            if version != self.version:
+                return entry
+            self._remove(key)
+            self._entries[key] = entry
+            self.size += len(body)
+            for tag in entry.tags:
+                self._tags[tag].add(key)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, *tags):
+        with self._lock:
+            self.version += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._tags.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+response_cache = ResponseCache(
+    max_bytes=config.get("response_cache_bytes", 32 * 1024 * 1024),
+    ttl=config.get("response_cache_ttl", 300),
+    max_age=config.get("response_cache_max_age", 0),
+)
+
+
+def _cache_key(request: Request):
+    return (request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+
+def _etag_matches(header: str, etag: str):
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cached_response(request: Request, model, loader, tags):
+    """Serve ``loader()`` serialized through ``model``, from the cache when possible.
+
+    ``tags`` is either an iterable of tags or a callable building them from
+    the loaded data.
+    """
+    key = _cache_key(request)
+    entry = response_cache.get(key)
+    if entry is None:
+        version = response_cache.version
+        data = loader()
+        body = model.validate(data).json(separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        entry = response_cache.set(key, body, tags(data) if callable(tags) else tags, version)
+
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": f"public, max-age={response_cache.max_age}, must-revalidate",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def _on_responses_invalidated(tags: str):
+    if tags == "*":
+        response_cache.clear()
+    else:
+        response_cache.invalidate(*tags.split(" "))
+
+
+def invalidate_responses(*tags: str):
+    channel.publish("responses", " ".join(tags))
+
+
+def get_response_cache_stats():
+    return response_cache.stats()
+
+
+channel.subscribe("responses", _on_responses_invalidated)
@@ -0,0 +1,122 @@
+import math
+import re
+import unicodedata
+
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from threading import RLock
+
+from sqlalchemy import Float, literal
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text: str):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return text.lower()
+
+
+def tokenize(text: str):
+    return TOKEN_RE.findall(normalize(text))
+
+
+class InvertedIndex:
+    """In-process inverted index with BM25 ranking.
+
+    The last query term is also matched as a prefix so partially typed
+    words still find results.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict)
+        self._lengths = {}
+        self._doc_terms = {}
+        self._total_length = 0
+        self._terms = None
+        self._lock = RLock()
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, doc_id: str, text: str):
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self.remove(doc_id)
+            for term, frequency in terms.items():
+                if term not in self._postings:
+                    self._terms = None
+                self._postings[term][doc_id] = frequency
+            length = sum(terms.values())
+            self._lengths[doc_id] = length
+            self._doc_terms[doc_id] = tuple(terms)
+            self._total_length += length
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            length = self._lengths.pop(doc_id, None)
+            if length is None:
+                return
+            self._total_length -= length
+            for term in self._doc_terms.pop(doc_id):
+                del self._postings[term][doc_id]
+                if not self._postings[term]:
+                    del self._postings[term]
+                    self._terms = None
+
+    def _expand_prefix(self, prefix: str):
+        if self._terms is None:
+            self._terms = sorted(self._postings)
+        position = bisect_left(self._terms, prefix)
+        terms = []
+        while position < len(self._terms) and self._terms[position].startswith(prefix):
+            terms.append(self._terms[position])
+            position += 1
+        return terms
+
+    def search(self, query: str, limit: int = None):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        scores = defaultdict(float)
+        with self._lock:
+            documents = len(self._lengths)
+            if documents == 0:
+                return []
+            average_length = self._total_length / documents
+            expanded = [[term] for term in terms[:-1]]
+            expanded.append(self._expand_prefix(terms[-1]))
+            for group in expanded:
+                for term in group:
+                    docs = self._postings.get(term)
+                    if not docs:
+                        continue
+                    idf = math.log(1 + (documents - len(docs) + 0.5) / (len(docs) + 0.5))
+                    for doc_id, frequency in docs.items():
+                        norm = 1 - self.b + self.b * self._lengths[doc_id] / average_length
+                        scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
+
+
+class Match(ColumnElement):
+    """MySQL ``MATCH (...) AGAINST (... IN NATURAL LANGUAGE MODE)`` relevance."""
+
+    type = Float()
+    inherit_cache = False
+
+    def __init__(self, columns, against: str):
+        self.columns = columns
+        self.against = literal(against)
+
+
+@compiles(Match)
+def _compile_match(element, compiler, **kw):
+    columns = ", ".join(compiler.process(column, **kw) for column in element.columns)
+    against = compiler.process(element.against, **kw)
+    return f"MATCH ({columns}) AGAINST ({against} IN NATURAL LANGUAGE MODE)"
@@ -0,0 +1,157 @@
+import os
+import time
+
+from threading import Lock
+
+import numpy as np
+from scipy import sparse
+
+
+def rating_matrix(user_index, movie_index, scores, n_users: int, n_movies: int, adjusted: bool = True):
+    """Build the column-normalised users x movies matrix used for cosine similarity.
+
+    With ``adjusted`` each rating is centred on its user's mean first, which
+    turns plain cosine into adjusted cosine.
+    """
+    user_index = np.asarray(user_index, dtype=np.int32)
+    movie_index = np.asarray(movie_index, dtype=np.int32)
+    data = np.asarray(scores, dtype=np.float32)
+    if adjusted and len(data):
+        counts = np.bincount(user_index, minlength=n_users)
+        sums = np.bincount(user_index, weights=data, minlength=n_users)
+        means = (sums / np.maximum(counts, 1)).astype(np.float32)
+        data = data - means[user_index]
+
+    norms = np.sqrt(np.bincount(movie_index, weights=data.astype(np.float64) ** 2, minlength=n_movies))
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0).astype(np.float32)
+    data = data * inverse[movie_index]
+    matrix = sparse.csc_matrix((data, (user_index, movie_index)), shape=(n_users, n_movies), dtype=np.float32)
+    matrix.sum_duplicates()
+    return matrix
+
+
+def chunk_size(n_movies: int, memory_budget: int):
+    # Per chunk row: the sparse product (up to 12 bytes per cell), its dense
+    # float32 copy, the negated copy for argpartition and the int64 indices
+    per_row = max(n_movies, 1) * (12 + 4 + 4 + 8)
+    return max(1, min(n_movies, memory_budget // per_row))
+
+
+def top_k_similar(matrix, k: int, rows=None, memory_budget: int = 256 * 1024 * 1024):
+    """Return ``(neighbours, scores)`` arrays of shape ``(len(rows), k)``.
+
+    Similarities are computed ``chunk_size`` movies at a time as one sparse
+    product each, so peak memory stays near ``memory_budget``. Missing
+    neighbours are ``-1`` with a score of ``0``.
+    """
+    n_movies = matrix.shape[1]
+    rows = np.arange(n_movies) if rows is None else np.asarray(rows, dtype=np.int64)
+    k = max(1, min(k, n_movies - 1)) if n_movies > 1 else 1
+    neighbours = np.full((len(rows), k), -1, dtype=np.int32)
+    scores = np.zeros((len(rows), k), dtype=np.float32)
+    transposed = matrix.T.tocsr()
+    step = chunk_size(n_movies, memory_budget)
+
+    for start in range(0, len(rows), step):
+        chunk = rows[start:start + step]
+        block = (transposed[chunk] @ matrix).toarray()
+        block[np.arange(len(chunk)), chunk] = -np.inf
+        if n_movies > k:
+            candidates = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(n_movies), (len(chunk), 1))
+        values = np.take_along_axis(block, candidates, axis=1)
+        order = np.argsort(-values, axis=1, kind="stable")
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        values = np.take_along_axis(values, order, axis=1)
+        keep = values > 0
+        neighbours[start:start + len(chunk)] = np.where(keep, candidates, -1)
+        scores[start:start + len(chunk)] = np.where(keep, values, 0)
+    return neighbours, scores
+
+
+class SimilarityStore:
+    """Precomputed top-k neighbours per movie kept in flat NumPy arrays."""
+
+    def __init__(self, movie_ids, titles, neighbours, scores, built_at: float = None):
+        self.movie_ids = np.asarray(movie_ids, dtype=str)
+        self.titles = np.asarray(titles, dtype=str)
+        self.neighbours = np.asarray(neighbours, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.built_at = built_at or time.time()
+        self._index = {movie_id: row for row, movie_id in enumerate(self.movie_ids.tolist())}
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    def index_of(self, movie_id: str):
+        return self._index.get(movie_id)
+
+    def similar(self, movie_id: str, limit: int = 10):
+        row = self._index.get(movie_id)
+        if row is None:
+            return []
+        neighbours = self.neighbours[row, :limit]
+        found = neighbours >= 0
+        neighbours = neighbours[found]
+        return [
+            {"id": movie_id, "title": title, "score": score}
+            for movie_id, title, score in zip(
+                self.movie_ids[neighbours].tolist(),
+                self.titles[neighbours].tolist(),
+                self.scores[row, :limit][found].tolist(),
+            )
+        ]
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = path + ".tmp.npz"
+        np.savez(
+            temporary,
+            movie_ids=self.movie_ids,
+            titles=self.titles,
+            neighbours=self.neighbours,
+            scores=self.scores,
+            built_at=np.array(self.built_at),
+        )
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            return cls(
+                data["movie_ids"],
+                data["titles"],
+                data["neighbours"],
+                data["scores"],
+                float(data["built_at"]),
+            )
+
+
+class StoreLoader:
+    """Loads a store file lazily and reloads it when a rebuild replaces it."""
+
+    def __init__(self, path: str, check_interval: float = 30):
+        self.path = path
+        self.check_interval = check_interval
+        self._store = None
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = Lock()
+
+    def get(self):
+        if time.monotonic() < self._next_check:
+            return self._store
+        with self._lock:
+            if time.monotonic() >= self._next_check:
+                self._next_check = time.monotonic() + self.check_interval
+                try:
+                    mtime = os.stat(self.path).st_mtime
+                except OSError:
+                    return self._store
+                if mtime != self._mtime:
+                    self._store = SimilarityStore.load(self.path)
+                    self._mtime = mtime
+        return self._store
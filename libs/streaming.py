@@ -0,0 +1,26 @@
+from fastapi.responses import StreamingResponse
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_lines(rows, model, batch_size: int = 500):
+    """Serialise ``rows`` with ``model`` one JSON document per line.
+
+    Lines are sent ``batch_size`` at a time so a sync iterator does not cost a
+    thread pool hop per row.
+    """
+    batch = []
+    for row in rows:
+        batch.append(model.from_orm(row).json())
+        if len(batch) >= batch_size:
+            batch.append("")
+            yield "\n".join(batch)
+            batch = []
+    if batch:
+        batch.append("")
+        yield "\n".join(batch)
+
+
+def ndjson_response(rows, model, batch_size: int = 500):
+    return StreamingResponse(ndjson_lines(rows, model, batch_size), media_type=NDJSON_MEDIA_TYPE)
@@ -1,12 +1,16 @@
+import hashlib
 import shutil
 
-from os import remove
+from os import pwrite, remove
 from uuid import uuid4
 from datetime import datetime
 
-from fastapi import UploadFile
+import aiofiles
+from fastapi import HTTPException, UploadFile, status
 from sqlalchemy import inspect
 
+from libs.filetype import EXTENSIONS, SNIFF_BYTES, sniff
+
 
 def now():
     return datetime.now()
@@ -27,6 +31,62 @@ def save_file(file: UploadFile, name: str):
     return name
 
 
+async def save_stream(chunks, directory: str, content_types: set, max_bytes: int, buffer_size: int = 1024 * 1024):
+    """Write an async byte stream to a new file under ``directory``.
+
+    The type is taken from the first bytes and must be in ``content_types``;
+    the file name gets the matching extension. Data is written in
+    ``buffer_size`` blocks while the sha256 and size are computed. Returns
+    ``(path, content_type, size, sha256)``; a partial file is removed on error.
+    """
+    hasher = hashlib.sha256()
+    buffer = bytearray()
+    size = 0
+    path = content_type = out = None
+
+    async def open_file():
+        nonlocal path, content_type, out
+        content_type = sniff(bytes(buffer[:SNIFF_BYTES]))
+        if content_type not in content_types:
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported file type")
+        path = directory + generate_id() + EXTENSIONS[content_type]
+        out = await aiofiles.open(path, "wb")
+
+    try:
+        async for data in chunks:
+            size += len(data)
+            if size > max_bytes:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File is too large")
+            hasher.update(data)
+            buffer += data
+            if out is None and len(buffer) >= SNIFF_BYTES:
+                await open_file()
+            while out is not None and len(buffer) >= buffer_size:
+                await out.write(bytes(buffer[:buffer_size]))
+                del buffer[:buffer_size]
+        if not size:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="File is empty")
+        if out is None:
+            await open_file()
+        await out.write(bytes(buffer))
+        await out.close()
+    except BaseException:
+        if out is not None:
+            await out.close()
+            remove_file(path)
+        raise
+    return path, content_type, size, hasher.hexdigest()
+
+
+def write_at(fd: int, data: bytes, position: int):
+    """``pwrite`` all of ``data`` at ``position``, retrying short writes."""
+    view = memoryview(data)
+    while view:
+        written = pwrite(fd, view, position)
+        view = view[written:]
+        position += written
+
+
 def remove_file(path):
     try:
         remove(path)
@@ -1,5 +1,7 @@
 import logging.config
 
+from threading import Thread
+
 from fastapi import FastAPI, Request, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
@@ -7,6 +9,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from routers.admin.v1 import api as admin_v1
+from routers.admin.v1.crud import movies
 
 app = FastAPI(
     title="Movies",
@@ -28,6 +31,19 @@ app.add_middleware(
 app.include_router(admin_v1.router)
 
 
+def _warm_autocomplete_index():
+    try:
+        movies.load_autocomplete_index()
+    except Exception:
+        # The first autocomplete request retries once the database is reachable
+        logger.exception("Could not load the autocomplete index")
+
+
+@app.on_event("startup")
+def load_indexes():
+    Thread(target=_warm_autocomplete_index, name="autocomplete-index", daemon=True).start()
+
+
 
 logging.config.fileConfig('logging.conf', disable_existing_loggers=False)
 logger = logging.getLogger(__name__)
@@ -1,10 +1,13 @@
 from datetime import datetime
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
     DateTime,
+    Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
@@ -22,12 +25,15 @@ class UserModel(Base):
     last_name = Column(String(50))
     email = Column(String(50))
     password = Column(String(255), nullable=False)
+    permission_version = Column(Integer, nullable=False, default=0, server_default="0")
     is_deleted = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now)
 
     user_role = relationship("UserRoleModel", backref="user")
 
+    __table_args__ = (Index("ix_users_email", "email", unique=True),)
+
 
 class UserRoleModel(Base):
     __tablename__ = "user_roles"
@@ -38,6 +44,8 @@ class UserRoleModel(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now)
 
+    __table_args__ = (Index("ix_user_roles_user_id", "user_id"),)
+
 
 class RoleModel(Base):
     __tablename__ = "roles"
@@ -77,6 +85,10 @@ class OperationModel(Base):
 
     role_operation = relationship("RoleOperationModel", backref="operation")
 
+    __table_args__ = (
+        Index("ix_operations_parent_id_order_index", "parent_id", "order_index"),
+    )
+
 
 class MovieModel(Base):
     __tablename__ = "movies"
@@ -87,12 +99,32 @@ class MovieModel(Base):
     path = Column(String(80))
     year = Column(Integer)
     user_id = Column(String(36), ForeignKey("users.id"))
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_histogram = Column(Text(), nullable=True, default="{}")  # JSON {score: count}
+    rating_average = Column(Float, nullable=False, default=0, server_default="0")
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
     is_deleted = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now)
 
     user = relationship("UserModel", backref="movies")
 
+    __table_args__ = (
+        Index(
+            "ix_movies_title_description",
+            "title",
+            "description",
+            mysql_prefix="FULLTEXT",
+        ),
+        Index("ix_movies_is_deleted_created_at", "is_deleted", "created_at"),
+        Index("ix_movies_is_deleted_year", "is_deleted", "year"),
+        Index("ix_movies_is_deleted_title", "is_deleted", "title"),
+        Index("ix_movies_is_deleted_rating_average", "is_deleted", "rating_average"),
+        Index("ix_movies_user_id_is_deleted_created_at", "user_id", "is_deleted", "created_at"),
+        Index("ix_movies_user_id_is_deleted_year", "user_id", "is_deleted", "year"),
+    )
+
 
 class MovieImageModel(Base):
     __tablename__ = "movie_images"
@@ -108,6 +140,39 @@ class MovieImageModel(Base):
 
     movie = relationship("MovieModel", backref="movie_images")
 
+    __table_args__ = (
+        Index(
+            "ix_movie_images_movie_id_is_deleted_is_thumbnail",
+            "movie_id",
+            "is_deleted",
+            "is_thumbnail",
+        ),
+    )
+
+
+class MovieUploadModel(Base):
+    __tablename__ = "movie_uploads"
+
+    id = Column(String(36), primary_key=True)
+    movie_id = Column(String(36), ForeignKey("movies.id"))
+    user_id = Column(String(36), ForeignKey("users.id"))
+    path = Column(String(80))
+    content_type = Column(String(100))
+    size = Column(BigInteger, nullable=False)
+    upload_offset = Column(BigInteger, nullable=False, default=0, server_default="0")
+    lease_id = Column(String(36), nullable=True)
+    leased_until = Column(DateTime, nullable=True)
+    is_completed = Column(Boolean, default=False)
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now)
+
+    movie = relationship("MovieModel", backref="movie_uploads")
+
+    __table_args__ = (
+        Index("ix_movie_uploads_is_completed_expires_at", "is_completed", "expires_at"),
+    )
+
 
 class MovieRatingModel(Base):
     __tablename__ = "movie_ratings"
@@ -124,6 +189,15 @@ class MovieRatingModel(Base):
     movie = relationship("MovieModel", backref="movie_ratings")
     user = relationship("UserModel", backref="movie_ratings")
 
+    __table_args__ = (
+        Index(
+            "ix_movie_ratings_movie_id_is_deleted_created_at",
+            "movie_id",
+            "is_deleted",
+            "created_at",
+        ),
+    )
+
 
 
 class MovieCommentModel(Base):
@@ -140,3 +214,14 @@ class MovieCommentModel(Base):
 
     movie = relationship("MovieModel", backref="movie_comments")
     user = relationship("UserModel", backref="movie_comments")
+
+    __table_args__ = (
+        Index(
+            "ix_movie_comments_movie_id_parent_id_is_deleted_created_at",
+            "movie_id",
+            "parent_id",
+            "is_deleted",
+            "created_at",
+        ),
+        Index("ix_movie_comments_parent_id_is_deleted", "parent_id", "is_deleted"),
+    )
@@ -1,15 +1,22 @@
 
 from datetime import datetime
-from genericpath import exists
-from fastapi import APIRouter, BackgroundTasks, File, Form, Header, Response, UploadFile
+from os.path import isfile, normpath, splitext
+from fastapi import APIRouter, BackgroundTasks, File, Form, Header, Request, Response, UploadFile
 from fastapi import HTTPException, status, Depends, Path, Query
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Union
 
 from routers.admin.v1 import schemas
-from dependencies import get_db
-from routers.admin.v1.crud import comments, movies, operations, ratings, roles, users
+from dependencies import get_current_user, get_db, require_operation
+from libs.filetype import CONTENT_TYPES, VIDEO_TYPES
+from libs.pagination import MAX_PAGE_SIZE
+from libs.ranges import RangeFileResponse
+from libs.response_cache import cached_response
+from libs.streaming import ndjson_response
+from models import UserModel
+from routers.admin.v1.crud import comments, movies, operations, ratings, recommendations, roles, uploads, users
 
 router = APIRouter()
 
@@ -20,11 +27,23 @@ router = APIRouter()
     response_model=schemas.UserLoginResponse,
     tags=["Authentication"],
 )
-def sign_in(user: schemas.UserLogin, db: Session = Depends(get_db)):
-    db_user = users.sign_in(db, user)
+async def sign_in(request: Request, user: schemas.UserLogin, db: Session = Depends(get_db)):
+    await run_in_threadpool(users.throttle, "login", ip=request.client.host, email=user.email)
+    db_user = await users.sign_in(db, user)
     return db_user
 
 
+@router.post(
+    "/token/refresh",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.TokenResponse,
+    tags=["Authentication"],
+)
+def refresh_token(token: schemas.TokenRefresh, db: Session = Depends(get_db)):
+    data = users.refresh_token(db, token=token)
+    return data
+
+
 # Users
 
 @router.post(
@@ -33,11 +52,13 @@ def sign_in(user: schemas.UserLogin, db: Session = Depends(get_db)):
     status_code=status.HTTP_201_CREATED,
     tags=["Users"],
 )
-def sign_up(
+async def sign_up(
+    request: Request,
     user: schemas.UserSignUp,
     db: Session = Depends(get_db)
 ):
-    data = users.sign_up(db, user=user)
+    await run_in_threadpool(users.throttle, "sign-up", ip=request.client.host, email=user.email)
+    data = await users.sign_up(db, user=user)
     return data
 
 @router.post(
@@ -45,12 +66,14 @@ def sign_up(
     status_code=status.HTTP_200_OK,
     tags=["Users"]
 )
-def change_password(
+async def change_password(
+    request: Request,
     user: schemas.ChangePassword,
     token: str = Header(None),
     db: Session = Depends(get_db),
 ):
-    users.change_password(db, user=user, token=token)
+    await run_in_threadpool(users.throttle, "change-password", ip=request.client.host, token=token)
+    await users.change_password(db, user=user, token=token)
     return Response(status_code=status.HTTP_200_OK)
 
 
@@ -87,18 +110,25 @@ def update_profile(
     tags=["Admin - Users"]
 )
 def get_users(
-    token: str = Header(None),
-    start: int = 0,
-    limit: int = 10,
+    db_user: UserModel = Depends(require_operation("List Users")),
+    start: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, max_length=512),
+    count: str = Query("exact", regex="^(exact|estimate|none)$"),
     sort_by: str = Query("all", min_length=3, max_length=10),
     order: str = Query("all", min_length=3, max_length=4),
     search: str = Query("all", min_length=1, max_length=50),
     db: Session = Depends(get_db),
 ):
-    db_user = users.verify_token(db, token=token)
-    operations.verify_user_operation(db, user_id=db_user.id, operation="List Users")
     data = users.get_users(
-        db, start=start, limit=limit, sort_by=sort_by, order=order, search=search
+        db,
+        start=start,
+        limit=limit,
+        sort_by=sort_by,
+        order=order,
+        search=search,
+        cursor=cursor,
+        count_mode=count,
     )
     return data
 
@@ -108,14 +138,12 @@ def get_users(
     status_code=status.HTTP_201_CREATED,
     tags=["Admin - Users"]
 )
-def add_user(
+async def add_user(
     user: schemas.UserAdd,
-    token: str = Header(None),
+    db_user: UserModel = Depends(require_operation("Add User")),
     db: Session = Depends(get_db)
 ):
-    db_user = users.verify_token(db, token=token)
-    operations.verify_user_operation(db, db_user.id, "Add User")
-    user_id = users.add_user(db, user=user)
+    user_id = await users.add_user(db, user=user)
     return user_id
 
 
@@ -125,11 +153,10 @@ def add_user(
     tags=["Admin - Users"]
 )
 def get_my_profile(
-    token: str = Header(None),
+    current_user: UserModel = Depends(get_current_user),
     user_id: str = Path(..., min_length=36, max_length=36),
     db: Session = Depends(get_db)
 ):
-    users.verify_token(db, token=token)
     db_user = users.get_user_profile(db, user_id=user_id)
     return db_user
 
@@ -141,11 +168,10 @@ def get_my_profile(
 )
 def update_profile(
     user: schemas.UserUpdate,
-    token: str = Header(None),
+    current_user: UserModel = Depends(get_current_user),
     user_id: str = Path(..., min_length=36, max_length=36),
     db: Session = Depends(get_db),
 ):
-    users.verify_token(db, token=token)
     db_user = users.update_user_profile(db, user=user, user_id=user_id)
     return db_user
 
@@ -156,11 +182,10 @@ def update_profile(
     tags=["Admin - Users"]
 )
 def delete_user(
-    token: str = Header(None),
+    current_user: UserModel = Depends(get_current_user),
     user_id: str = Path(..., title="User ID", min_length=36, max_length=36),
     db: Session = Depends(get_db),
 ):
-    users.verify_token(db, token=token)
     users.delete_user(db, user_id=user_id)
     return Response(status_code=status.HTTP_200_OK)
 
@@ -170,18 +195,24 @@ def delete_user(
 # Operations
 @router.get("/operations/verify", status_code=status.HTTP_200_OK, tags=["Operations"])
 def check_user_operation(
-    token: str = Header(None),
+    current_user: UserModel = Depends(get_current_user),
     operation: str = Query("all", min_length=3, max_length=50),
     db: Session = Depends(get_db),
 ):
-    db_user = users.verify_token(db, token=token)
-    operations.verify_user_operation(db, user_id=db_user.id, operation=operation)
+    operations.verify_user_operation(
+        db,
+        user_id=current_user.id,
+        operation=operation,
+        claims=current_user.token_claims,
+        version=current_user.permission_version,
+    )
     return
 
 
 @router.get("/operations/all", tags=["Operations"])
-def get_all_operations(token: str = Header(None), db: Session = Depends(get_db)):
-    users.verify_token(db, token=token)
+def get_all_operations(
+    current_user: UserModel = Depends(get_current_user), db: Session = Depends(get_db)
+):
     data = operations.get_all_operations(db)
     return data
 
@@ -192,35 +223,43 @@ def get_all_operations(token: str = Header(None), db: Session = Depends(get_db))
 # Roles
 @router.get("/roles", response_model=schemas.RoleList, tags=["Roles"])
 def get_roles(
-    token: str = Header(None),
-    start: int = 0,
-    limit: int = 10,
+    db_user: UserModel = Depends(require_operation("List Roles")),
+    start: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, max_length=512),
+    count: str = Query("exact", regex="^(exact|estimate|none)$"),
     sort_by: str = Query("all", min_length=3, max_length=50),
     order: str = Query("all", min_length=3, max_length=4),
     search: str = Query("all", min_length=1, max_length=50),
     db: Session = Depends(get_db),
 ):
-    db_user = users.verify_token(db, token=token)
-    operations.verify_user_operation(db, user_id=db_user.id, operation="List Roles")
     data = roles.get_roles(
-        db, start=start, limit=limit, sort_by=sort_by, order=order, search=search
+        db,
+        start=start,
+        limit=limit,
+        sort_by=sort_by,
+        order=order,
+        search=search,
+        cursor=cursor,
+        count_mode=count,
     )
     return data
 
 
 @router.get("/roles/all", response_model=List[schemas.Role], tags=["Roles"])
-def get_all_roles(token: str = Header(None), db: Session = Depends(get_db)):
-    users.verify_token(db, token=token)
+def get_all_roles(
+    current_user: UserModel = Depends(get_current_user), db: Session = Depends(get_db)
+):
     data = roles.get_all_roles(db)
     return data
 
 
 @router.post("/roles", status_code=status.HTTP_201_CREATED, tags=["Roles"])
 def add_role(
-    role: schemas.RoleAdd, token: str = Header(None), db: Session = Depends(get_db)
+    role: schemas.RoleAdd,
+    db_user: UserModel = Depends(require_operation("Add Role")),
+    db: Session = Depends(get_db),
 ):
-    db_user = users.verify_token(db, token=token)
-    operations.verify_user_operation(db, user_id=db_user.id, operation="Add Role")
     role = roles.add_role(db, role=role)
     return
 
@@ -228,11 +267,9 @@ def add_role(
 @router.get("/roles/{role_id}", response_model=schemas.RoleDetails, tags=["Roles"])
 def get_role(
     role_id: str = Path(..., title="Role ID", min_length=36, max_length=36),
-    token: str = Header(None),
+    db_user: UserModel = Depends(require_operation("Update Role")),
     db: Session = Depends(get_db),
 ):
-    db_user = users.verify_token(db, token=token)
-    operations.verify_user_operation(db, user_id=db_user.id, operation="Update Role")
     role = roles.get_role_details(db, role_id=role_id)
     return role
 
@@ -240,12 +277,10 @@ def get_role(
 @router.put("/roles/{role_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Roles"])
 def update_role(
     role: schemas.RoleAdd,
-    token: str = Header(None),
+    db_user: UserModel = Depends(require_operation("Update Role")),
     role_id: str = Path(..., title="Role ID", min_length=36, max_length=36),
     db: Session = Depends(get_db),
 ):
-    db_user = users.verify_token(db, token=token)
-    operations.verify_user_operation(db, user_id=db_user.id, operation="Update Role")
     role = roles.update_role(db, role_id=role_id, role=role)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -254,12 +289,10 @@ def update_role(
     "/roles/{role_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Roles"]
 )
 def delete_role(
-    token: str = Header(None),
+    db_user: UserModel = Depends(require_operation("Delete Role")),
     role_id: str = Path(..., title="Role ID", min_length=36, max_length=36),
     db: Session = Depends(get_db),
 ):
-    db_user = users.verify_token(db, token=token)
-    operations.verify_user_operation(db, user_id=db_user.id, operation="Delete Role")
     roles.delete_role(db, role_id=role_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -273,16 +306,30 @@ def delete_role(
     tags=["Movies"]
 )
 def get_movies_list(
-    start: int = 0,
-    limit: int = 10,
+    request: Request,
+    start: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, max_length=512),
+    count: str = Query("exact", regex="^(exact|estimate|none)$"),
     search: str = Query("all", min_length=3, max_length=50),
     sort_by: str = Query("all", min_length=3, max_length=20),
     order: str = Query("all", min_length=3, max_length=5),
     user_id: str = Query("all", min_length=3, max_length=36),
+    year_from: Optional[int] = Query(None, ge=1800, le=2200),
+    year_to: Optional[int] = Query(None, ge=1800, le=2200),
+    has_video: Optional[bool] = Query(None),
+    min_rating: Optional[float] = Query(None, ge=0),
     db: Session = Depends(get_db),
 ):
-    data = movies.get_movie_list(db, start, limit, search, sort_by, order, user_id)
-    return data
+    return cached_response(
+        request,
+        schemas.MovieList,
+        lambda: movies.get_movie_list(
+            db, start, limit, search, sort_by, order, user_id, cursor, count,
+            year_from=year_from, year_to=year_to, has_video=has_video, min_rating=min_rating,
+        ),
+        lambda data: {"movies"} | {f"user:{movie.user_id}" for movie in data["list"]},
+    )
 
 
 @router.post(
@@ -293,10 +340,8 @@ def get_movies_list(
 def add_movie(
     movie: schemas.MovieAdd,
     db: Session = Depends(get_db),
-    token: str = Header(None)
+    db_user: UserModel = Depends(require_operation("add movies"))
 ):
-    db_user = users.verify_token(db, token)
-    operations.verify_user_operation(db, db_user.id, "add movies")
     data = movies.add_movie_detail(db=db, user_id=db_user.id, movie=movie)
     return data
 
@@ -310,15 +355,135 @@ def upload_movie(
     background_tasks: BackgroundTasks,
     movie_id: str = Path(..., min_length=36, max_length=36),
     file: UploadFile = File(...),
-    token: str = Header(None),
+    db_user: UserModel = Depends(require_operation("add movies")),
     db: Session = Depends(get_db),
 ):
-    db_user = users.verify_token(db, token)
-    operations.verify_user_operation(db, db_user.id, "add movies")
     movies.get_movie(db=db, movie_id=movie_id)
-    background_tasks.add_task(movies.add_movie, file, movie_id)
+    content_type = movies.sniff_upload(file, VIDEO_TYPES)
+    background_tasks.add_task(movies.add_movie, file, movie_id, content_type)
     return Response(status_code=status.HTTP_200_OK)
 
+@router.put(
+    "/movies/{movie_id}/video",
+    response_model=schemas.StoredFile,
+    tags=["Movies"]
+)
+async def put_movie_video(
+    request: Request,
+    movie_id: str = Path(..., min_length=36, max_length=36),
+    content_length: Optional[int] = Header(None, ge=0),
+    db_user: UserModel = Depends(require_operation("add movies")),
+    db: Session = Depends(get_db),
+):
+    data = await uploads.put_movie_video(db, movie_id, request.stream(), content_length)
+    return data
+
+
+@router.put(
+    "/movies/{movie_id}/images/raw",
+    status_code=status.HTTP_201_CREATED,
+    response_model=schemas.StoredFile,
+    tags=["Movies"]
+)
+async def put_movie_image(
+    request: Request,
+    movie_id: str = Path(..., min_length=36, max_length=36),
+    is_thumbnail: bool = Query(False),
+    name: Optional[str] = Query(None, max_length=60),
+    content_length: Optional[int] = Header(None, ge=0),
+    db_user: UserModel = Depends(require_operation("add movies")),
+    db: Session = Depends(get_db),
+):
+    data = await uploads.put_movie_image(db, movie_id, request.stream(), is_thumbnail, name, content_length)
+    return data
+
+
+@router.post(
+    "/movies/{movie_id}/uploads",
+    status_code=status.HTTP_201_CREATED,
+    response_model=schemas.MovieUpload,
+    tags=["Movies"]
+)
+def create_upload(
+    upload: schemas.UploadCreate,
+    movie_id: str = Path(..., min_length=36, max_length=36),
+    db_user: UserModel = Depends(require_operation("add movies")),
+    db: Session = Depends(get_db),
+):
+    data = uploads.create_upload(db, movie_id, db_user.id, upload)
+    return data
+
+
+@router.get(
+    "/movies/{movie_id}/uploads/{upload_id}",
+    response_model=schemas.MovieUpload,
+    tags=["Movies"]
+)
+def get_upload(
+    movie_id: str = Path(..., min_length=36, max_length=36),
+    upload_id: str = Path(..., min_length=36, max_length=36),
+    db_user: UserModel = Depends(require_operation("add movies")),
+    db: Session = Depends(get_db),
+):
+    data = uploads.get_upload(db, movie_id, upload_id, db_user.id)
+    return data
+
+
+@router.head(
+    "/movies/{movie_id}/uploads/{upload_id}",
+    tags=["Movies"]
+)
+def get_upload_offset(
+    movie_id: str = Path(..., min_length=36, max_length=36),
+    upload_id: str = Path(..., min_length=36, max_length=36),
+    db_user: UserModel = Depends(require_operation("add movies")),
+    db: Session = Depends(get_db),
+):
+    db_upload = uploads.get_upload(db, movie_id, upload_id, db_user.id)
+    headers = {
+        "Upload-Offset": str(db_upload.upload_offset),
+        "Upload-Length": str(db_upload.size),
+        "Cache-Control": "no-store",
+    }
+    return Response(status_code=status.HTTP_200_OK, headers=headers)
+
+
+@router.patch(
+    "/movies/{movie_id}/uploads/{upload_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    tags=["Movies"]
+)
+async def upload_chunk(
+    request: Request,
+    movie_id: str = Path(..., min_length=36, max_length=36),
+    upload_id: str = Path(..., min_length=36, max_length=36),
+    upload_offset: int = Header(..., ge=0),
+    upload_checksum: Optional[str] = Header(None, max_length=200),
+    db_user: UserModel = Depends(require_operation("add movies")),
+    db: Session = Depends(get_db),
+):
+    offset = await uploads.write_chunk(
+        db, movie_id, upload_id, db_user.id, upload_offset, upload_checksum, request.stream()
+    )
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers={"Upload-Offset": str(offset)})
+
+
+@router.post(
+    "/movies/{movie_id}/uploads/{upload_id}/finalize",
+    response_model=schemas.Movie,
+    tags=["Movies"]
+)
+def finalize_upload(
+    movie_id: str = Path(..., min_length=36, max_length=36),
+    upload_id: str = Path(..., min_length=36, max_length=36),
+    db_user: UserModel = Depends(require_operation("add movies")),
+    db: Session = Depends(get_db),
+):
+    uploads.finalize_upload(db, movie_id, upload_id, db_user.id)
+    data = movies.get_movie(db, movie_id)
+    return data
+
+
 @router.post(
     "/movies/{movie_id}/images",
     status_code=status.HTTP_200_OK,
@@ -328,25 +493,176 @@ def add_movie_image(
     movie_id: str = Path(..., min_length=36, max_length=36),
     is_thumbnail: bool = Form(False),
     file: UploadFile = File(...),
-    token: str = Header(None),
+    db_user: UserModel = Depends(require_operation("add movies")),
     db: Session = Depends(get_db),
 ):
-    db_user = users.verify_token(db, token)
-    operations.verify_user_operation(db, db_user.id, "add movies")    
     movies.add_movie_image(db, file, movie_id, is_thumbnail)
     return Response(status_code=status.HTTP_200_OK)
 
 
+@router.get(
+    "/movies/comments",
+    response_model=schemas.CommentList,
+    tags=["Movies"]
+)
+def get_comment_list(
+    start: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, max_length=512),
+    count: str = Query("exact", regex="^(exact|estimate|none)$"),
+    search: str = Query("all", min_length=3, max_length=30),
+    sort_by: str = Query("all", min_length=3, max_length=30),
+    order: str = Query("all", min_length=3, max_length=4),
+    movie_id: str = Query("all", min_length=3, max_length=36),
+    replies_limit: int = Query(5, ge=0, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    data = comments.get_comment_list(
+        db=db,
+        start=start,
+        limit=limit,
+        search=search,
+        sort_by=sort_by,
+        order=order,
+        movie_id=movie_id,
+        cursor=cursor,
+        count_mode=count,
+        replies_limit=replies_limit,
+    )
+    return data
+
+
+@router.get(
+    "/movies/ratings",
+    response_model=Union[schemas.RatingList, schemas.RatingSummaryList],
+    tags=["Movies"]
+)
+def get_rating_list(
+    start: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, max_length=512),
+    count: str = Query("exact", regex="^(exact|estimate|none)$"),
+    search: str = Query("all", min_length=3, max_length=40),
+    sort_by: str = Query("all", min_length=3, max_length=40),
+    order: str = Query("all", min_length=3, max_length=4),
+    movie_id: str = Query("all", min_length=3, max_length=36),
+    expand: Optional[str] = Query(None, regex="^movie$"),
+    db: Session = Depends(get_db)
+):
+    data = ratings.get_rating_list(
+        db=db,
+        start=start,
+        limit=limit,
+        search=search,
+        sort_by=sort_by,
+        order=order,
+        movie_id=movie_id,
+        cursor=cursor,
+        count_mode=count,
+        expand=expand,
+    )
+    # Build the model here so the summary form never touches ``rating.movie``
+    model = schemas.RatingList if expand == "movie" else schemas.RatingSummaryList
+    return model(**data)
+
+
+@router.get(
+    "/movies/facets",
+    response_model=schemas.MovieFacets,
+    tags=["Movies"]
+)
+def get_movie_facets(
+    request: Request,
+    search: str = Query("all", min_length=3, max_length=50),
+    user_id: str = Query("all", min_length=3, max_length=36),
+    year_from: Optional[int] = Query(None, ge=1800, le=2200),
+    year_to: Optional[int] = Query(None, ge=1800, le=2200),
+    has_video: Optional[bool] = Query(None),
+    min_rating: Optional[float] = Query(None, ge=0),
+    uploaders_limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    return cached_response(
+        request,
+        schemas.MovieFacets,
+        lambda: movies.get_movie_facets(
+            db, search, user_id, year_from, year_to, has_video, min_rating, uploaders_limit
+        ),
+        lambda data: {"movies"} | {f"user:{uploader['id']}" for uploader in data["uploaders"]},
+    )
+
+
+@router.get(
+    "/movies/autocomplete",
+    response_model=schemas.MovieSuggestionList,
+    tags=["Movies"]
+)
+def autocomplete_movies(
+    q: str = Query(..., min_length=1, max_length=50),
+    limit: int = Query(10, ge=1, le=20),
+    db: Session = Depends(get_db)
+):
+    data = movies.get_autocomplete(db, q, limit)
+    return data
+
+
+@router.get(
+    "/movies/top",
+    response_model=schemas.RankedMovieList,
+    tags=["Movies"]
+)
+def get_top_movies(
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, max_length=512),
+    db: Session = Depends(get_db)
+):
+    data = movies.get_ranked_movies(db, "top", limit, cursor)
+    return data
+
+
+@router.get(
+    "/movies/trending",
+    response_model=schemas.RankedMovieList,
+    tags=["Movies"]
+)
+def get_trending_movies(
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, max_length=512),
+    db: Session = Depends(get_db)
+):
+    data = movies.get_ranked_movies(db, "trending", limit, cursor)
+    return data
+
+
 @router.get(
     "/movies/{movie_id}",
     response_model=schemas.Movie,
     tags=["Movies"]
 )
 def get_movie(
+    request: Request,
     movie_id: str = Path(..., min_length=36, max_length=36),
     db: Session = Depends(get_db)
 ):
-    data = movies.get_movie(db, movie_id)
+    return cached_response(
+        request,
+        schemas.Movie,
+        lambda: movies.get_movie(db, movie_id),
+        lambda data: {f"movie:{movie_id}", f"user:{data.user_id}"},
+    )
+
+
+@router.get(
+    "/movies/{movie_id}/similar",
+    response_model=schemas.SimilarMovieList,
+    tags=["Movies"]
+)
+def get_similar_movies(
+    movie_id: str = Path(..., min_length=36, max_length=36),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    data = recommendations.get_similar_movies(db, movie_id, limit)
     return data
 
 
@@ -363,6 +679,21 @@ def download_movie(
     return data
 
 
+@router.api_route(
+    "/movies/{movie_id}/stream",
+    methods=["GET", "HEAD"],
+    tags=["Movies"]
+)
+def stream_movie(
+    movie_id: str = Path(..., min_length=36, max_length=36),
+    db: Session = Depends(get_db)
+):
+    db_movie = movies.download_movie(db, movie_id)
+    if not db_movie.path or not isfile(db_movie.path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video is not found")
+    return RangeFileResponse(db_movie.path, media_type=CONTENT_TYPES.get(splitext(db_movie.path)[1]))
+
+
 @router.put(
     "/movies/{movie_id}",
     response_model=schemas.Movie,
@@ -372,10 +703,8 @@ def update_movie_details(
     movie: schemas.MovieAdd,
     movie_id: str = Path(..., min_length=36, max_length=36),
     db: Session = Depends(get_db),
-    token: str = Header(None)
+    db_user: UserModel = Depends(require_operation("update movies"))
 ):
-    db_user = users.verify_token(db, token)
-    operations.verify_user_operation(db, db_user.id, "update movies")
     data = movies.update_movie_details(db, movie_id, movie)
     return data
 
@@ -390,10 +719,8 @@ def update_movie_image(
     image_id: str = Path(..., min_length=36, max_length=36),
     is_thumbnail: bool = Query(False),
     db: Session = Depends(get_db),
-    token: str = Header(None)
+    db_user: UserModel = Depends(require_operation("update movies"))
 ):
-    db_user = users.verify_token(db, token)
-    operations.verify_user_operation(db, db_user.id, "update movies")
     data = movies.update_movie_image(db, movie_id, image_id, is_thumbnail)
     return data
 
@@ -406,10 +733,8 @@ def update_movie_image(
 def delete_movie(
     movie_id: str = Path(..., min_length=36, max_length=36),
     db: Session = Depends(get_db),
-    token: str = Header(None)
+    db_user: UserModel = Depends(require_operation("delete movies"))
 ):
-    db_user = users.verify_token(db, token)
-    operations.verify_user_operation(db, db_user.id, "delete movies") 
     movies.delete_movie(db, movie_id)
     return Response(status_code=status.HTTP_200_OK)
 
@@ -423,40 +748,12 @@ def delete_movie_image(
     movie_id: str = Path(..., min_length=36, max_length=36),
     image_id: str = Path(..., min_length=36, max_length=36),
     db: Session = Depends(get_db),
-    token: str = Header(None)
+    db_user: UserModel = Depends(require_operation("delete movies"))
 ):
-    db_user = users.verify_token(db, token)
-    operations.verify_user_operation(db, db_user.id, "delete movies") 
     movies.delete_movie_images(db, movie_id, image_id)
     return Response(status_code=status.HTTP_200_OK)
 
 
-@router.get(
-    "/movies/comments",
-    response_model=schemas.CommentList,
-    tags=["Movies"]
-)
-def get_comment_list(
-    start: int = 0,
-    limit: int = 10,
-    search: str = Query("all", min_length=3, max_length=30),
-    sort_by: str = Query("all", min_length=3, max_length=30),
-    order: str = Query("all", min_length=3, max_length=4),
-    movie_id: str = Query("all", min_length=3, max_length=36),
-    db: Session = Depends(get_db)
-):
-    data = comments.get_comment_list(
-        db=db,
-        start=start,
-        limit=limit,
-        search=search,
-        sort_by=sort_by,
-        order=order,
-        movie_id=movie_id
-    )
-    return data
-
-
 @router.post(
     "/movies/comments",
     status_code=status.HTTP_201_CREATED,
@@ -466,10 +763,8 @@ def get_comment_list(
 def add_comment(
     comment: schemas.CommentAdd,
     db: Session = Depends(get_db),
-    token: str = Header(None)
+    db_user: UserModel = Depends(require_operation("add comments"))
 ):
-    db_user = users.verify_token(db, token)
-    operations.verify_user_operation(db, db_user.id, "add comments")
     data = comments.add_comment(db, comment, db_user.id)
     return data
 
@@ -480,11 +775,44 @@ def add_comment(
     tags=["Movies"]
 )
 def get_all_comments(
+    request: Request,
     db: Session = Depends(get_db),
     movie_id: str = Path(..., min_length=36, max_length=36),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, max_length=512),
+    replies_limit: int = Query(5, ge=0, le=MAX_PAGE_SIZE),
+):
+    def tags(data):
+        users = {data.user_id}
+        pending = list(data.comments)
+        while pending:
+            comment = pending.pop()
+            users.add(comment.user_id)
+            pending.extend(comment.replies)
+        return {f"movie:{movie_id}", f"comments:{movie_id}"} | {f"user:{user_id}" for user_id in users}
+
+    return cached_response(
+        request,
+        schemas.MovieComment,
+        lambda: comments.get_all_comments(
+            db=db, movie_id=movie_id, limit=limit, cursor=cursor, replies_limit=replies_limit
+        ),
+        tags,
+    )
+
+
+@router.get(
+    "/movies/{movie_id}/comments/stream",
+    response_class=StreamingResponse,
+    tags=["Movies"]
+)
+def stream_comments(
+    movie_id: str = Path(..., min_length=36, max_length=36),
+    db: Session = Depends(get_db),
 ):
-    data = comments.get_all_comments(db=db, movie_id=movie_id)
-    return data
+    if movies.get_movie_by_id(db, movie_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie is not found")
+    return ndjson_response(comments.stream_comments(movie_id), schemas.CommentRow)
 
 
 @router.get(
@@ -495,9 +823,34 @@ def get_all_comments(
 def get_comment(
     movie_id: str = Path(..., min_length=36, max_length=36),
     comment_id: str = Path(..., min_length=36, max_length=36),
+    replies_limit: int = Query(5, ge=0, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db)
 ):
-    data = comments.get_comment(db=db, movie_id=movie_id, comment_id=comment_id)
+    data = comments.get_comment(db=db, movie_id=movie_id, comment_id=comment_id, replies_limit=replies_limit)
+    return data
+
+
+@router.get(
+    "/movies/{movie_id}/comments/{comment_id}/replies",
+    response_model=schemas.ReplyList,
+    tags=["Movies"]
+)
+def get_comment_replies(
+    movie_id: str = Path(..., min_length=36, max_length=36),
+    comment_id: str = Path(..., min_length=36, max_length=36),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, max_length=512),
+    replies_limit: int = Query(5, ge=0, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    data = comments.get_comment_replies(
+        db=db,
+        movie_id=movie_id,
+        comment_id=comment_id,
+        limit=limit,
+        cursor=cursor,
+        replies_limit=replies_limit,
+    )
     return data
 
 
@@ -511,10 +864,8 @@ def update_comment(
     movie_id: str = Path(..., min_length=36, max_length=36),
     comment_id: str = Path(..., min_length=36, max_length=36),
     db: Session = Depends(get_db),
-    token: str = Header(None)
+    db_user: UserModel = Depends(require_operation("update comments"))
 ):
-    db_user = users.verify_token(db, token)
-    operations.verify_user_operation(db, db_user.id, "update comments")
     data = comments.update_comment(db=db, movie_id=movie_id, comment_id=comment_id, comment=comment)
     return data
 
@@ -528,40 +879,12 @@ def delete_comment(
     movie_id: str = Path(..., min_length=36, max_length=36),
     comment_id: str = Path(..., min_length=36, max_length=36),
     db: Session = Depends(get_db),
-    token: str = Header(None)
+    db_user: UserModel = Depends(require_operation("delete comments"))
 ):
-    db_user = users.verify_token(db, token)
-    operations.verify_user_operation(db, db_user.id, "delete comments")
     comments.delete_comment(db=db, movie_id=movie_id, comment_id=comment_id)
     return Response(status_code=status.HTTP_200_OK)
 
 
-@router.get(
-    "/movies/ratings",
-    response_model=schemas.RatingList,
-    tags=["Movies"]
-)
-def get_rating_list(
-    start: int = 0,
-    limit: int = 10,
-    search: str = Query("all", min_length=3, max_length=40),
-    sort_by: str = Query("all", min_length=3, max_length=40),
-    order: str = Query("all", min_length=3, max_length=4),
-    movie_id: str = Query("all", min_length=3, max_length=36),
-    db: Session = Depends(get_db)
-):
-    data = ratings.get_rating_list(
-        db=db,
-        start=start,
-        limit=limit,
-        search=search,
-        sort_by=sort_by,
-        order=order,
-        movie_id=movie_id
-    )
-    return data
-
-
 @router.post(
     "/movies/ratings",
     response_model=schemas.Rating,
@@ -570,26 +893,50 @@ def get_rating_list(
 )
 def add_rating(
     rating: schemas.RatingAdd,
-    token: str = Header(None),
+    db_user: UserModel = Depends(require_operation("add ratings")),
     db: Session = Depends(get_db)
 ):
-    db_user = users.verify_token(db, token)
-    operations.verify_user_operation(db, db_user.id, "add ratings")
     data = ratings.add_rating(db, db_user.id, rating)
     return data
 
 
 @router.get(
     "/movies/{movie_id}/ratings/all",
-    response_model=schemas.MovieRatings,
+    response_model=Union[schemas.MovieRatings, schemas.MovieRatingSummaries],
     tags=["Movies"]
 )
 def get_all_ratings(
+    request: Request,
     movie_id: str = Path(..., min_length=36, max_length=36),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, max_length=512),
+    expand: Optional[str] = Query(None, regex="^movie$"),
     db: Session = Depends(get_db)
 ):
-    data = ratings.get_all_ratings(db, movie_id)
-    return data
+    def tags(data):
+        users = {data.user_id} | {rating.user_id for rating in data.ratings}
+        return {f"movie:{movie_id}", f"ratings:{movie_id}"} | {f"user:{user_id}" for user_id in users}
+
+    return cached_response(
+        request,
+        schemas.MovieRatings if expand == "movie" else schemas.MovieRatingSummaries,
+        lambda: ratings.get_all_ratings(db, movie_id, limit, cursor),
+        tags,
+    )
+
+
+@router.get(
+    "/movies/{movie_id}/ratings/stream",
+    response_class=StreamingResponse,
+    tags=["Movies"]
+)
+def stream_ratings(
+    movie_id: str = Path(..., min_length=36, max_length=36),
+    db: Session = Depends(get_db),
+):
+    if movies.get_movie_by_id(db, movie_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie is not found")
+    return ndjson_response(ratings.stream_ratings(movie_id), schemas.RatingSummary)
 
 
 @router.get(
@@ -616,10 +963,8 @@ def update_rating(
     movie_id: str = Path(..., min_length=36, max_length=36),
     rating_id: str = Path(..., min_length=36, max_length=36),
     db: Session = Depends(get_db),
-    token: str = Header(None)
+    db_user: UserModel = Depends(require_operation("update ratings"))
 ):
-    db_user = users.verify_token(db, token)
-    operations.verify_user_operation(db, db_user.id, "update ratings")
     data = ratings.update_rating(db=db, movie_id=movie_id, rating_id=rating_id, rating=rating)
     return data
 
@@ -633,23 +978,23 @@ def delete_rating(
     movie_id: str = Path(..., min_length=36, max_length=36),
     rating_id: str = Path(..., min_length=36, max_length=36),
     db: Session = Depends(get_db),
-    token: str = Header(None)
+    db_user: UserModel = Depends(require_operation("delete ratings"))
 ):
-    db_user = users.verify_token(db, token)
-    operations.verify_user_operation(db, db_user.id, "delete ratings")
     ratings.delete_rating(db=db, movie_id=movie_id, rating_id=rating_id)
     return Response(status_code=status.HTTP_200_OK)
 
 
-@router.get(
+@router.api_route(
     "/files",
+    methods=["GET", "HEAD"],
     tags=["Files"],
 )
 async def get_files(
     f: str = Query(..., max_length=100),
 ):
-    if f.startswith("uploads/") and exists(f):
-        data = FileResponse(f)
+    path = normpath(f)
+    if path.startswith("uploads/") and isfile(path):
+        data = RangeFileResponse(path, media_type=CONTENT_TYPES.get(splitext(path)[1]))
     else:
-        data = FileResponse("uploads/default.png")
+        data = RangeFileResponse("uploads/default.png")
     return data
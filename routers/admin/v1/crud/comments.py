@@ -1,20 +1,124 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, joinedload
 from fastapi import HTTPException, status
 
+from config import config
+from database import SessionLocal
+from libs.counting import counts
+from libs.pagination import encode_cursor, get_sort, paginate
+from libs.response_cache import invalidate_responses
 from libs.utils import generate_id, now
-from routers.admin.v1.crud.movies import get_movie_by_id
+from routers.admin.v1.crud import leaderboards
+from routers.admin.v1.crud.movies import (
+    apply_comment_change,
+    get_movie_by_id,
+    lock_movie,
+    movie_popularity,
+    update_popularity,
+)
 from routers.admin.v1.schemas import CommentAdd, CommentUpdate
 from models import MovieCommentModel
 
 
+COMMENT_SORT_COLUMNS = {
+    "text": MovieCommentModel.text,
+    "created_at": MovieCommentModel.created_at,
+}
+MAX_REPLY_DEPTH = config.get("comment_max_depth", 2)
+REPLY_BUDGET = config.get("comment_reply_budget", 200)
+
 def get_comment_by_id(db: Session, comment_id: str):
     return db.query(MovieCommentModel).filter(
         MovieCommentModel.id == comment_id,
         MovieCommentModel.is_deleted == False
     ).first()
 
-def get_comment_replies(db: Session, comment_id: str):
-    return db.query(MovieCommentModel).filter(MovieCommentModel.parent_id == comment_id, MovieCommentModel.is_deleted == False).all()
+def _reply_cursor(reply: MovieCommentModel = None):
+    if reply is None:
+        # Before every reply: NULL created_at sorts first and no id is below ""
+        return encode_cursor(["k", None, ""])
+    return encode_cursor(["k", reply.created_at, reply.id])
+
+
+def _first_replies(db: Session, parent_ids: list, per_parent: int, limit: int):
+    """Up to ``per_parent`` oldest replies of each parent, ``(reply, position)``
+    ordered so every parent gets its first reply before any gets a second."""
+    ranked = (
+        select(
+            MovieCommentModel.id,
+            func.row_number()
+            .over(
+                partition_by=MovieCommentModel.parent_id,
+                order_by=(MovieCommentModel.created_at, MovieCommentModel.id),
+            )
+            .label("position"),
+        )
+        .where(MovieCommentModel.parent_id.in_(parent_ids), MovieCommentModel.is_deleted == False)
+        .subquery()
+    )
+    return (
+        db.query(MovieCommentModel, ranked.c.position)
+        .join(ranked, ranked.c.id == MovieCommentModel.id)
+        .filter(ranked.c.position <= per_parent)
+        .options(joinedload(MovieCommentModel.user))
+        .order_by(ranked.c.position, MovieCommentModel.created_at, MovieCommentModel.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def attach_replies(db: Session, comments: list, replies_limit: int):
+    """Load the first replies under ``comments``, one windowed query per level.
+
+    Each comment gets at most ``replies_limit`` replies per level, oldest
+    first, down to ``MAX_REPLY_DEPTH`` levels and ``REPLY_BUDGET`` replies in
+    all. Only the replies that are kept are expanded, so a cut-off subtree is
+    never read. A comment with more replies than it shows, including one at
+    the last level, gets a ``replies_cursor`` for the replies endpoint.
+    """
+    for comment in comments:
+        comment.replies = []
+        comment.replies_cursor = None
+    if not comments or replies_limit <= 0:
+        return comments
+
+    parents = {comment.id: comment for comment in comments}
+    budget = REPLY_BUDGET
+    for _ in range(MAX_REPLY_DEPTH):
+        if not parents or budget <= 0:
+            break
+        rows = _first_replies(db, list(parents), replies_limit + 1, budget + 1)
+        cut = rows[budget][1] if len(rows) > budget else None
+        rows = rows[:budget]
+        budget -= len(rows)
+
+        children = {}
+        for reply, position in rows:
+            parent = parents[reply.parent_id]
+            if position > replies_limit:
+                parent.replies_cursor = _reply_cursor(parent.replies[-1])
+                continue
+            reply.replies = []
+            reply.replies_cursor = None
+            parent.replies.append(reply)
+            children[reply.id] = reply
+        if cut is not None:
+            # Rows come by position, so a parent may be missing replies from ``cut`` on
+            for parent in parents.values():
+                if parent.replies_cursor is None and len(parent.replies) >= cut - 1:
+                    parent.replies_cursor = _reply_cursor(parent.replies[-1] if parent.replies else None)
+        parents = children
+
+    if parents:
+        # Replies below the last loaded level are left to the replies endpoint
+        replied = (
+            db.query(MovieCommentModel.parent_id)
+            .filter(MovieCommentModel.parent_id.in_(list(parents)), MovieCommentModel.is_deleted == False)
+            .distinct()
+        )
+        for (parent_id,) in replied:
+            parents[parent_id].replies_cursor = _reply_cursor()
+    return comments
 
 
 def get_comment_list(
@@ -24,9 +128,16 @@ def get_comment_list(
     search: str,
     sort_by: str,
     order: str,
-    movie_id: str
+    movie_id: str,
+    cursor: str = None,
+    count_mode: str = "exact",
+    replies_limit: int = 5,
 ):
-    query = db.query(MovieCommentModel).filter(MovieCommentModel.is_deleted == False, MovieCommentModel.parent_id == "0")
+    query = (
+        db.query(MovieCommentModel)
+        .filter(MovieCommentModel.is_deleted == False, MovieCommentModel.parent_id == "0")
+        .options(joinedload(MovieCommentModel.user))
+    )
 
     if movie_id != "all":
         query = query.filter(MovieCommentModel.movie_id == movie_id)
@@ -35,27 +146,16 @@ def get_comment_list(
         text = f"""%{search}%"""
         query = query.filter(MovieCommentModel.text.like(text))
 
-    if sort_by == "text":
-        if order == "desc":
-            query = query.order_by(MovieCommentModel.text.desc())
-        else:
-            query = query.order_by(MovieCommentModel.text)
-    elif sort_by == "created_at":
-        if order == "desc":
-            query = query.order_by(MovieCommentModel.created_at.desc())
-        else:
-            query = query.order_by(MovieCommentModel.created_at)
-    else:
-        query = query.order_by(MovieCommentModel.created_at.desc())
-
-    count = query.count()
-    results = query.offset(start).limit(limit).all()
-
-    for result in results:
-        comment_replies = get_comment_replies(db=db, comment_id=result.id)
-        result.replies = comment_replies
-    
-    data = {"count": count, "list": results}
+    filters = {
+        "movie_id": movie_id if movie_id != "all" else None,
+        "search": search.strip().lower() if search != "all" else None,
+    }
+    count = counts.count(db, query, "movie_comments", filters, mode=count_mode)
+    sort_column, descending = get_sort(COMMENT_SORT_COLUMNS, sort_by, order, MovieCommentModel.created_at)
+    results, next_cursor = paginate(query, sort_column, MovieCommentModel.id, descending, limit, cursor, start)
+    attach_replies(db, results, replies_limit)
+
+    data = {"count": count, "list": results, "next_cursor": next_cursor}
     return data
 
 
@@ -72,12 +172,20 @@ def add_comment(db: Session, comment: CommentAdd, user_id: str):
         user_id=user_id,
     )
     db.add(db_comment)
+    db_movie = lock_movie(db, comment.movie_id)
+    apply_comment_change(db_movie, 1)
+    popularity = movie_popularity(db_movie)
     db.commit()
     db.refresh(db_comment)
+    if db_comment.parent_id == "0":
+        counts.incr("movie_comments")
+    update_popularity(db_comment.movie_id, popularity)
+    leaderboards.record_activity(db_comment.movie_id, "comment", db_comment.created_at)
+    invalidate_responses(f"comments:{db_comment.movie_id}", "movies", f"movie:{db_comment.movie_id}")
     return db_comment
 
 
-def get_comment(db: Session, movie_id: str, comment_id: str):
+def get_comment(db: Session, movie_id: str, comment_id: str, replies_limit: int = 5):
     db_movie = get_movie_by_id(db=db, movie_id=movie_id)
     if db_movie is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie is not found")
@@ -86,33 +194,73 @@ def get_comment(db: Session, movie_id: str, comment_id: str):
     if db_comment is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment is not found")
 
-    comment_replies = get_comment_replies(db=db, comment_id=comment_id)
-    db_comment.replies = comment_replies
+    attach_replies(db, [db_comment], replies_limit)
     return db_comment
 
 
-def get_all_comments(db: Session, movie_id: str):
+def get_comment_replies(
+    db: Session,
+    movie_id: str,
+    comment_id: str,
+    limit: int,
+    cursor: str = None,
+    replies_limit: int = 5,
+):
+    """Page the direct replies of a comment, each with its own first replies."""
+    db_comment = get_comment_by_id(db=db, comment_id=comment_id)
+    if db_comment is None or db_comment.movie_id != movie_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment is not found")
+
+    query = (
+        db.query(MovieCommentModel)
+        .filter(MovieCommentModel.parent_id == comment_id, MovieCommentModel.is_deleted == False)
+        .options(joinedload(MovieCommentModel.user))
+    )
+    results, next_cursor = paginate(query, MovieCommentModel.created_at, MovieCommentModel.id, False, limit, cursor)
+    attach_replies(db, results, replies_limit)
+    data = {"list": results, "next_cursor": next_cursor}
+    return data
+
+
+def get_all_comments(db: Session, movie_id: str, limit: int, cursor: str = None, replies_limit: int = 5):
     db_movie = get_movie_by_id(db, movie_id)
     if db_movie is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie is not found")
 
-    db_comments = (
+    query = (
         db.query(MovieCommentModel)
         .filter(
             MovieCommentModel.movie_id == movie_id,
             MovieCommentModel.is_deleted == False,
             MovieCommentModel.parent_id == "0"
         )
-        .all()
+        .options(joinedload(MovieCommentModel.user))
     )
-    for comment in db_comments:
-        comment_replies = get_comment_replies(db=db, comment_id=comment.id)
-        comment.replies = comment_replies
-    
+    db_comments, next_cursor = paginate(query, MovieCommentModel.created_at, MovieCommentModel.id, True, limit, cursor)
+    attach_replies(db, db_comments, replies_limit)
+
     db_movie.comments = db_comments
+    db_movie.next_cursor = next_cursor
     return db_movie
 
 
+def stream_comments(movie_id: str, batch_size: int = 1000):
+    """Yield every comment and reply of a movie, oldest first, from its own session."""
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(MovieCommentModel)
+            .filter(MovieCommentModel.movie_id == movie_id, MovieCommentModel.is_deleted == False)
+            .options(joinedload(MovieCommentModel.user))
+            .order_by(MovieCommentModel.created_at, MovieCommentModel.id)
+            .execution_options(stream_results=True)
+            .yield_per(batch_size)
+        )
+        yield from query
+    finally:
+        db.close()
+
+
 def update_comment(db: Session, movie_id: str, comment_id: str, comment: CommentUpdate):
     db_movie = get_movie_by_id(db=db, movie_id=movie_id)
     if db_movie is None:
@@ -126,6 +274,7 @@ def update_comment(db: Session, movie_id: str, comment_id: str, comment: Comment
     db_comment.updated_at = now()
     db.commit()
     db.refresh(db_comment)
+    invalidate_responses(f"comments:{db_comment.movie_id}")
     return db_comment
 
 
@@ -138,7 +287,19 @@ def delete_comment(db: Session, movie_id:str, comment_id: str):
     if db_comment is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment is not found")
     
+    db_movie = lock_movie(db, db_comment.movie_id)
+    db.refresh(db_comment, with_for_update=True)
+    if db_comment.is_deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment is not found")
+    apply_comment_change(db_movie, -1)
+    popularity = movie_popularity(db_movie)
+    created_at = db_comment.created_at
     db_comment.is_deleted = True
     db_comment.updated_at = now()
     db.commit()
+    if db_comment.parent_id == "0":
+        counts.incr("movie_comments", -1)
+    update_popularity(db_comment.movie_id, popularity)
+    leaderboards.record_activity(db_comment.movie_id, "comment", created_at, removed=True)
+    invalidate_responses(f"comments:{db_comment.movie_id}", "movies", f"movie:{db_comment.movie_id}")
     return
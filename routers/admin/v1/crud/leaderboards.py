@@ -0,0 +1,141 @@
+import math
+import time
+
+from datetime import datetime, timedelta
+from threading import Lock
+
+from sqlalchemy.orm import Session
+
+from config import config
+from libs.ranking import RankedList
+from models import MovieCommentModel, MovieModel, MovieRatingModel
+
+
+PRIOR_WEIGHT = config.get("leaderboard_prior_weight", 10)
+RESCORE_INTERVAL = config.get("leaderboard_rescore_interval", 300)
+TRENDING_HALF_LIFE = config.get("trending_half_life", 24) * 3600
+TRENDING_WINDOW = config.get("trending_window", 14)
+TRENDING_WEIGHTS = config.get("trending_weights", {"rating": 1.0, "comment": 0.5})
+
+# Decay rate per second; trending scores are stored as
+# log(sum(weight * exp(DECAY * t))) so they never need to be decayed in place
+DECAY = math.log(2) / TRENDING_HALF_LIFE
+
+top_rated = RankedList()
+trending = RankedList()
+
+_trending_scores = {}
+_global_mean = 0.0
+_next_rescore = 0.0
+_state_lock = Lock()
+_rescore_lock = Lock()
+
+
+def bayesian_average(rating_count: int, rating_sum: int, mean: float):
+    return (PRIOR_WEIGHT * mean + rating_sum) / (PRIOR_WEIGHT + rating_count)
+
+
+def _log_activity(weight: float, timestamp: datetime):
+    return math.log(weight) + DECAY * timestamp.timestamp()
+
+
+def _add_log(current: float, value: float):
+    if current is None:
+        return value
+    high, low = max(current, value), min(current, value)
+    return high + math.log1p(math.exp(low - high))
+
+
+def _subtract_log(current: float, value: float):
+    if current is None or value >= current:
+        return None
+    return current + math.log1p(-math.exp(value - current))
+
+
+def rescore(db: Session):
+    """Rebuild both boards from the movie aggregates and recent activity."""
+    global _global_mean, _next_rescore
+    rows = (
+        db.query(MovieModel.id, MovieModel.rating_count, MovieModel.rating_sum)
+        .filter(MovieModel.is_deleted == False, MovieModel.rating_count > 0)
+        .all()
+    )
+    total_count = sum(row.rating_count for row in rows)
+    mean = sum(row.rating_sum for row in rows) / total_count if total_count else 0.0
+    top_scores = {row.id: bayesian_average(row.rating_count, row.rating_sum, mean) for row in rows}
+
+    since = datetime.now() - timedelta(days=TRENDING_WINDOW)
+    trending_scores = {}
+    for kind, model in (("rating", MovieRatingModel), ("comment", MovieCommentModel)):
+        activity = (
+            db.query(model.movie_id, model.created_at)
+            .join(MovieModel, MovieModel.id == model.movie_id)
+            .filter(model.is_deleted == False, model.created_at >= since, MovieModel.is_deleted == False)
+            .yield_per(1000)
+        )
+        for movie_id, created_at in activity:
+            value = _log_activity(TRENDING_WEIGHTS[kind], created_at)
+            trending_scores[movie_id] = _add_log(trending_scores.get(movie_id), value)
+
+    with _state_lock:
+        _global_mean = mean
+        _trending_scores.clear()
+        _trending_scores.update(trending_scores)
+        top_rated.replace(top_scores)
+        trending.replace(trending_scores)
+        _next_rescore = time.monotonic() + RESCORE_INTERVAL
+
+
+def _ensure_fresh(db: Session):
+    if time.monotonic() < _next_rescore:
+        return
+    # First load blocks; later rescoring is done by one request while others read the old boards
+    blocking = _next_rescore == 0.0
+    if not _rescore_lock.acquire(blocking=blocking):
+        return
+    try:
+        if time.monotonic() >= _next_rescore:
+            rescore(db)
+    finally:
+        _rescore_lock.release()
+
+
+def update_top_rated(movie_id: str, rating_count: int, rating_sum: int):
+    if _next_rescore == 0.0:
+        return
+    score = bayesian_average(rating_count, rating_sum, _global_mean) if rating_count else None
+    top_rated.update(movie_id, score)
+
+
+def record_activity(movie_id: str, kind: str, timestamp: datetime, removed: bool = False):
+    if _next_rescore == 0.0:
+        return
+    value = _log_activity(TRENDING_WEIGHTS[kind], timestamp)
+    with _state_lock:
+        current = _trending_scores.get(movie_id)
+        score = _subtract_log(current, value) if removed else _add_log(current, value)
+        if score is None:
+            _trending_scores.pop(movie_id, None)
+        else:
+            _trending_scores[movie_id] = score
+        trending.update(movie_id, score)
+
+
+def remove_movie(movie_id: str):
+    top_rated.update(movie_id, None)
+    with _state_lock:
+        _trending_scores.pop(movie_id, None)
+        trending.update(movie_id, None)
+
+
+def get_top_rated(db: Session, limit: int, cursor: str = None):
+    _ensure_fresh(db)
+    return top_rated.page(limit, cursor)
+
+
+def get_trending(db: Session, limit: int, cursor: str = None):
+    _ensure_fresh(db)
+    entries, next_cursor = trending.page(limit, cursor)
+    # Report the decayed activity as of now rather than the stored log score
+    now = DECAY * time.time()
+    return [(movie_id, math.exp(score - now)) for movie_id, score in entries], next_cursor
@@ -1,20 +1,357 @@
+import json
+
+from collections import Counter
+from threading import Lock
+from types import SimpleNamespace
 from typing import List
 from fastapi import UploadFile, HTTPException, status
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import Session, joinedload
 
+from config import config
 from database import SessionLocal
+from libs.autocomplete import PrefixIndex
+from libs.catalogue import MovieSnapshot
+from libs.counting import counts
+from libs.filetype import EXTENSIONS, IMAGE_TYPES, SNIFF_BYTES, sniff
+from libs.invalidation import channel
+from libs.pagination import get_sort, paginate
+from libs.response_cache import invalidate_responses
+from libs.search import InvertedIndex, Match
 from libs.utils import generate_id, now, remove_file, save_file
-from models import MovieImageModel, MovieModel
+from models import MovieCommentModel, MovieImageModel, MovieModel, MovieRatingModel, UserModel
+from routers.admin.v1.crud import leaderboards
 from routers.admin.v1.schemas import MovieAdd
 
 
+MOVIE_SORT_COLUMNS = {
+    "title": MovieModel.title,
+    "year": MovieModel.year,
+    "rating": MovieModel.rating_average,
+    "created_at": MovieModel.created_at,
+}
+
+# Filter/sort combinations served by an index on movies: the equality
+# filters form the index prefix (after is_deleted) and the sort key is the
+# next column, so a range filter is only allowed on that same column.
+# has_video is checked row by row while walking the index.
+MOVIE_ACCESS_PATHS = {
+    (): {"created_at", "year", "title", "rating"},
+    ("user_id",): {"created_at", "year"},
+}
+MOVIE_RANGE_SORTS = {"year": "year", "min_rating": "rating"}
+
+# (upper bound of rating_average, label) for the rating facet; band 0 holds unrated movies
+RATING_BANDS = [(None, "unrated"), (2, "below 2"), (3, "2 to 3"), (4, "3 to 4"), (None, "4 and above")]
+
+search_index = InvertedIndex()
+_search_index_loaded = False
+_search_index_lock = Lock()
+
+
+autocomplete_index = PrefixIndex()
+_autocomplete_loaded = False
+_autocomplete_lock = Lock()
+
+
+catalogue = MovieSnapshot()
+_catalogue_loaded = False
+_catalogue_dirty = set()
+_catalogue_users = {}
+_catalogue_lock = Lock()
+
+
+def _search_backend(db: Session):
+    backend = config.get("search_backend", "auto")
+    if backend == "auto":
+        backend = "fulltext" if db.bind.dialect.name == "mysql" else "memory"
+    return backend
+
+
+def _movie_document(title: str, description: str):
+    # Title is repeated so its terms outweigh the description
+    return f"{title} {title} {description or ''}"
+
+
+def _load_search_index(db: Session):
+    global _search_index_loaded
+    if _search_index_loaded:
+        return
+    with _search_index_lock:
+        if _search_index_loaded:
+            return
+        rows = (
+            db.query(MovieModel.id, MovieModel.title, MovieModel.description)
+            .filter(MovieModel.is_deleted == False)
+            .yield_per(1000)
+        )
+        for row in rows:
+            search_index.add(row.id, _movie_document(row.title, row.description))
+        _search_index_loaded = True
+
+
+def _index_movie(db_movie: MovieModel):
+    if not _search_index_loaded:
+        return
+    if db_movie.is_deleted:
+        search_index.remove(db_movie.id)
+    else:
+        search_index.add(db_movie.id, _movie_document(db_movie.title, db_movie.description))
+
+
+def load_autocomplete_index(db: Session = None):
+    global _autocomplete_loaded
+    if _autocomplete_loaded:
+        return
+    with _autocomplete_lock:
+        if _autocomplete_loaded:
+            return
+        session = db or SessionLocal()
+        try:
+            rows = (
+                session.query(MovieModel.id, MovieModel.title, MovieModel.rating_count, MovieModel.comment_count)
+                .filter(MovieModel.is_deleted == False)
+                .yield_per(1000)
+            )
+            # Read everything first so a dropped connection can't leave a half-built index
+            items = [(row.id, row.title, row.rating_count + row.comment_count) for row in rows]
+            autocomplete_index.extend(items)
+        finally:
+            if db is None:
+                session.close()
+        _autocomplete_loaded = True
+
+
+def _index_title(db_movie: MovieModel):
+    if not _autocomplete_loaded:
+        return
+    if db_movie.is_deleted:
+        autocomplete_index.remove(db_movie.id)
+    else:
+        autocomplete_index.add(db_movie.id, db_movie.title, movie_popularity(db_movie))
+
+
+def get_autocomplete(db: Session, q: str, limit: int):
+    load_autocomplete_index(db)
+    results = autocomplete_index.search(q, limit)
+    data = {"list": [{"id": movie_id, "title": title} for movie_id, title in results]}
+    return data
+
+
+def _catalogue_record(db_movie: MovieModel, db_image: MovieImageModel = None):
+    thumbnail = None
+    if db_image is not None:
+        thumbnail = {
+            "id": db_image.id,
+            "name": db_image.name,
+            "path": db_image.path,
+            "is_thumbnail": db_image.is_thumbnail,
+            "movie_id": db_image.movie_id,
+        }
+    return {
+        "id": db_movie.id,
+        "title": db_movie.title,
+        "description": db_movie.description,
+        "year": db_movie.year,
+        "created_at": db_movie.created_at,
+        "user_id": db_movie.user_id,
+        "has_video": db_movie.path is not None,
+        "rating_count": db_movie.rating_count,
+        "rating_sum": db_movie.rating_sum,
+        "rating_histogram": db_movie.rating_histogram,
+        "rating_average": db_movie.rating_average,
+        "comment_count": db_movie.comment_count,
+        "thumbnail": thumbnail,
+    }
+
+
+def _load_catalogue_rows(db: Session, query, batch_size: int = 1000):
+    # Keyset pages fetched in full: the caller queries the same connection
+    # between batches, which a streamed (unbuffered) result can't survive
+    last_id = ""
+    while True:
+        batch = query.filter(MovieModel.id > last_id).order_by(MovieModel.id).limit(batch_size).all()
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+def _sync_catalogue(db: Session):
+    """Load the snapshot on first use, then re-read only movies invalidated since."""
+    global _catalogue_loaded
+    with _catalogue_lock:
+        if _catalogue_loaded:
+            movie_ids = list(_catalogue_dirty)
+            _catalogue_dirty.difference_update(movie_ids)
+            if not movie_ids:
+                return
+            query = db.query(MovieModel).filter(MovieModel.id.in_(movie_ids))
+        else:
+            _catalogue_dirty.clear()
+            catalogue.clear()
+            query = db.query(MovieModel).filter(MovieModel.is_deleted == False)
+            movie_ids = []
+        seen = set()
+        for db_movies in _load_catalogue_rows(db, query):
+            thumbnails = get_movie_thumbnails(db, [db_movie.id for db_movie in db_movies])
+            for db_movie in db_movies:
+                seen.add(db_movie.id)
+                if db_movie.is_deleted:
+                    catalogue.remove(db_movie.id)
+                else:
+                    catalogue.upsert(_catalogue_record(db_movie, thumbnails.get(db_movie.id)))
+        for movie_id in movie_ids:
+            if movie_id not in seen:
+                catalogue.remove(movie_id)
+        _catalogue_loaded = True
+
+
+def _on_catalogue_invalidated(tags: str):
+    global _catalogue_loaded
+    for tag in tags.split(" "):
+        if tag == "*":
+            _catalogue_loaded = False
+            _catalogue_users.clear()
+        elif tag.startswith("movie:"):
+            _catalogue_dirty.add(tag[len("movie:"):])
+        elif tag.startswith("user:"):
+            _catalogue_users.pop(tag[len("user:"):], None)
+
+
+def _catalogue_movie_list(db: Session, sort_by: str, order: str, limit: int, cursor: str, start: int, count_mode: str, **filters):
+    _sync_catalogue(db)
+    descending = order == "desc" if sort_by in MOVIE_SORT_COLUMNS else True
+    records, count, next_cursor = catalogue.query(
+        sort_key=sort_by, descending=descending, limit=limit, cursor=cursor, start=start, **filters
+    )
+    missing = {record["user_id"] for record in records} - set(_catalogue_users)
+    if missing:
+        for db_user in db.query(UserModel).filter(UserModel.id.in_(missing)):
+            _catalogue_users[db_user.id] = {
+                "id": db_user.id,
+                "first_name": db_user.first_name,
+                "last_name": db_user.last_name,
+                "email": db_user.email,
+            }
+    results = [SimpleNamespace(user=_catalogue_users.get(record["user_id"]), **record) for record in records]
+    data = {"count": count if count_mode != "none" else None, "list": results, "next_cursor": next_cursor}
+    return data
+
+
+def _search_filter(db: Session, query, search: str, sort_by: str):
+    year = int(search) if search.isdigit() else None
+    if _search_backend(db) == "fulltext":
+        relevance = Match([MovieModel.title, MovieModel.description], search)
+        condition = relevance > 0
+        if year is not None:
+            condition = or_(condition, MovieModel.year == year)
+        query = query.filter(condition)
+        if sort_by == "relevance":
+            query = query.order_by(relevance.desc())
+        return query
+
+    _load_search_index(db)
+    ranked = search_index.search(search, limit=config.get("search_max_results", 1000))
+    movie_ids = [movie_id for movie_id, _ in ranked]
+    condition = MovieModel.id.in_(movie_ids)
+    if year is not None:
+        condition = or_(condition, MovieModel.year == year)
+    query = query.filter(condition)
+    if sort_by == "relevance" and movie_ids:
+        ranks = {movie_id: rank for rank, movie_id in enumerate(movie_ids)}
+        query = query.order_by(case(ranks, value=MovieModel.id, else_=len(ranks)))
+    return query
 
 
 def get_movie_by_id(db: Session, movie_id: str):
     return db.query(MovieModel).filter(MovieModel.id == movie_id, MovieModel.is_deleted == False).first()
 
 
+def lock_movie(db: Session, movie_id: str):
+    """Reload the movie row under ``SELECT ... FOR UPDATE`` before touching its aggregates."""
+    return (
+        db.query(MovieModel)
+        .filter(MovieModel.id == movie_id)
+        .with_for_update()
+        .populate_existing()
+        .first()
+    )
+
+
+def apply_rating_change(db_movie: MovieModel, old_score: int = None, new_score: int = None):
+    histogram = json.loads(db_movie.rating_histogram or "{}")
+    if old_score is not None:
+        db_movie.rating_count -= 1
+        db_movie.rating_sum -= old_score
+        histogram[str(old_score)] = histogram.get(str(old_score), 0) - 1
+        if histogram[str(old_score)] <= 0:
+            del histogram[str(old_score)]
+    if new_score is not None:
+        db_movie.rating_count += 1
+        db_movie.rating_sum += new_score
+        histogram[str(new_score)] = histogram.get(str(new_score), 0) + 1
+    db_movie.rating_histogram = json.dumps(histogram, sort_keys=True)
+    db_movie.rating_average = db_movie.rating_sum / db_movie.rating_count if db_movie.rating_count else 0
+
+
+def apply_comment_change(db_movie: MovieModel, delta: int):
+    db_movie.comment_count = max(0, db_movie.comment_count + delta)
+
+
+def movie_popularity(db_movie: MovieModel):
+    return db_movie.rating_count + db_movie.comment_count
+
+
+def update_popularity(movie_id: str, popularity: int):
+    """Rank ``movie_id`` in autocomplete by ``popularity``; call after the commit."""
+    autocomplete_index.set_popularity(movie_id, popularity)
+
+
+def rebuild_movie_aggregates(db: Session, movie_ids: List[str]):
+    """Recompute the aggregates of ``movie_ids`` with one grouped query per table."""
+    db_movies = (
+        db.query(MovieModel)
+        .filter(MovieModel.id.in_(movie_ids))
+        .with_for_update()
+        .populate_existing()
+        .all()
+    )
+    ratings = (
+        db.query(MovieRatingModel.movie_id, MovieRatingModel.score, func.count(MovieRatingModel.id))
+        .filter(MovieRatingModel.movie_id.in_(movie_ids), MovieRatingModel.is_deleted == False)
+        .group_by(MovieRatingModel.movie_id, MovieRatingModel.score)
+        .all()
+    )
+    comments = dict(
+        db.query(MovieCommentModel.movie_id, func.count(MovieCommentModel.id))
+        .filter(MovieCommentModel.movie_id.in_(movie_ids), MovieCommentModel.is_deleted == False)
+        .group_by(MovieCommentModel.movie_id)
+        .all()
+    )
+    histograms = {}
+    for movie_id, score, total in ratings:
+        histograms.setdefault(movie_id, {})[str(score)] = total
+
+    changed = 0
+    for db_movie in db_movies:
+        histogram = histograms.get(db_movie.id, {})
+        rating_count = sum(histogram.values())
+        rating_sum = sum(int(score) * total for score, total in histogram.items())
+        values = {
+            "rating_count": rating_count,
+            "rating_sum": rating_sum,
+            "rating_histogram": json.dumps(histogram, sort_keys=True),
+            "rating_average": rating_sum / rating_count if rating_count else 0,
+            "comment_count": comments.get(db_movie.id, 0),
+        }
+        if any(getattr(db_movie, key) != value for key, value in values.items()):
+            for key, value in values.items():
+                setattr(db_movie, key, value)
+            changed += 1
+    return changed
+
+
 def get_movie_images(db: Session, movie_id: str):
     db_images = db.query(MovieImageModel).filter(MovieImageModel.movie_id == movie_id, MovieImageModel.is_deleted == False).all()
     return db_images
@@ -24,6 +361,48 @@ def get_movie_thumbnail(db: Session, movie_id: str):
     return db_image
 
 
+def get_movies_by_ids(db: Session, movie_ids: List[str]):
+    """Load movies with their uploader and images in one query each, keyed by id.
+
+    Deleted movies are included since ratings and comments still point at them.
+    """
+    if not movie_ids:
+        return {}
+    db_movies = {
+        db_movie.id: db_movie
+        for db_movie in db.query(MovieModel).filter(MovieModel.id.in_(movie_ids)).options(joinedload(MovieModel.user))
+    }
+    for db_movie in db_movies.values():
+        db_movie.images = []
+    db_images = (
+        db.query(MovieImageModel)
+        .filter(MovieImageModel.movie_id.in_(list(db_movies)), MovieImageModel.is_deleted == False)
+        .all()
+    )
+    for db_image in db_images:
+        db_movies[db_image.movie_id].images.append(db_image)
+    return db_movies
+
+
+def get_movie_thumbnails(db: Session, movie_ids: List[str]):
+    if not movie_ids:
+        return {}
+    db_images = (
+        db.query(MovieImageModel)
+        .filter(
+            MovieImageModel.movie_id.in_(movie_ids),
+            MovieImageModel.is_deleted == False,
+            MovieImageModel.is_thumbnail == True
+        )
+        .order_by(MovieImageModel.created_at)
+        .all()
+    )
+    thumbnails = {}
+    for db_image in db_images:
+        thumbnails.setdefault(db_image.movie_id, db_image)
+    return thumbnails
+
+
 def get_movie_image_by_id(db: Session, movie_id: str, image_id: str):
     db_image = (
         db.query(MovieImageModel)
@@ -36,6 +415,51 @@ def get_movie_image_by_id(db: Session, movie_id: str, image_id: str):
     return db_image
 
 
+def _movie_sort_key(sort_by: str, user_id: str, year_from: int, year_to: int, min_rating: float):
+    """Pick the sort for a filtered list, rejecting combinations no index serves."""
+    ranges = []
+    if year_from is not None or year_to is not None:
+        ranges.append("year")
+    if min_rating is not None:
+        ranges.append("min_rating")
+    if len(ranges) > 1:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="year_from/year_to and min_rating can not be combined",
+        )
+    sort_key = sort_by if sort_by in MOVIE_SORT_COLUMNS else None
+    if ranges:
+        range_sort = MOVIE_RANGE_SORTS[ranges[0]]
+        if sort_key not in (None, range_sort):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"{ranges[0]} filter can only be sorted by {range_sort}",
+            )
+        sort_key = range_sort
+    sort_key = sort_key or "created_at"
+    equality = ("user_id",) if user_id != "all" else ()
+    if sort_key not in MOVIE_ACCESS_PATHS[equality]:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Sorting by {sort_key} is not supported with these filters",
+        )
+    return sort_key
+
+
+def _filter_movies(query, user_id: str, year_from: int, year_to: int, has_video: bool, min_rating: float):
+    if user_id != "all":
+        query = query.filter(MovieModel.user_id == user_id)
+    if year_from is not None:
+        query = query.filter(MovieModel.year >= year_from)
+    if year_to is not None:
+        query = query.filter(MovieModel.year <= year_to)
+    if min_rating is not None:
+        query = query.filter(MovieModel.rating_average >= min_rating)
+    if has_video is not None:
+        query = query.filter(MovieModel.path.isnot(None) if has_video else MovieModel.path.is_(None))
+    return query
+
+
 def get_movie_list(
     db: Session,
     start: int,
@@ -43,58 +467,167 @@ def get_movie_list(
     search: str,
     sort_by: str,
     order: str,
-    user_id: str
+    user_id: str,
+    cursor: str = None,
+    count_mode: str = "exact",
+    year_from: int = None,
+    year_to: int = None,
+    has_video: bool = None,
+    min_rating: float = None,
 ):
-    query = db.query(MovieModel).filter(MovieModel.is_deleted == False)
+    query = (
+        db.query(MovieModel)
+        .options(joinedload(MovieModel.user))
+        .filter(MovieModel.is_deleted == False)
+    )
+    if search == "all":
+        requested = sort_by
+        sort_by = _movie_sort_key(sort_by, user_id, year_from, year_to, min_rating)
+        if requested not in MOVIE_SORT_COLUMNS and order == "all":
+            order = "desc" if sort_by in ("created_at", "rating") else "asc"
+        if config.get("movie_list_engine", "sql") == "snapshot":
+            return _catalogue_movie_list(
+                db, sort_by, order, limit, cursor, start, count_mode,
+                user_id=user_id if user_id != "all" else None,
+                year_from=year_from, year_to=year_to, has_video=has_video, min_rating=min_rating,
+            )
 
-    if user_id != "all":
-        query = query.filter(MovieModel.user_id == user_id)
-    
+    query = _filter_movies(query, user_id, year_from, year_to, has_video, min_rating)
     if search != "all":
-        text = f"""%{search}%"""
-        query = query.filter(
-            or_(
-                MovieModel.title.like(text),
-                MovieModel.description.like(text),
-                MovieModel.year.like(text)
-            )
-        )
+        query = _search_filter(db, query, search, sort_by)
     
-    if sort_by == "title":
-        if order == "desc":
-            query = query.order_by(MovieModel.title.desc())
-        else:
-            query = query.order_by(MovieModel.title)
-    elif sort_by == "year":
-        if order == "desc":
-            query = query.order_by(MovieModel.year.desc())
-        else:
-            query = query.order_by(MovieModel.year)
-    if sort_by == "created_at":
-        if order == "desc":
-            query = query.order_by(MovieModel.created_at.desc())
-        else:
-            query = query.order_by(MovieModel.created_at)
+    filters = {
+        "user_id": user_id if user_id != "all" else None,
+        "search": search.strip().lower() if search != "all" else None,
+        "year_from": year_from,
+        "year_to": year_to,
+        "has_video": has_video,
+        "min_rating": min_rating,
+    }
+    count = counts.count(db, query, "movies", filters, mode=count_mode)
+    if search != "all" and sort_by == "relevance":
+        query = query.order_by(MovieModel.id)
+        results, next_cursor = paginate(query, None, MovieModel.id, False, limit, cursor, start)
     else:
-        query = query.order_by(MovieModel.created_at.desc())
-    
-    count = query.count()
-    results = query.offset(start).limit(limit).all()
+        sort_column, descending = get_sort(MOVIE_SORT_COLUMNS, sort_by, order, MovieModel.created_at)
+        results, next_cursor = paginate(query, sort_column, MovieModel.id, descending, limit, cursor, start)
+    thumbnails = get_movie_thumbnails(db, [result.id for result in results])
     for result in results:
-        result.thumbnail = get_movie_thumbnail(db, result.id)
+        result.thumbnail = thumbnails.get(result.id)
+
+    data = {"count": count, "list": results, "next_cursor": next_cursor}
+    return data
+
+
+def get_movie_facets(
+    db: Session,
+    search: str,
+    user_id: str,
+    year_from: int = None,
+    year_to: int = None,
+    has_video: bool = None,
+    min_rating: float = None,
+    uploaders_limit: int = 10,
+):
+    decade = MovieModel.year - MovieModel.year % 10
+    band = case(
+        (MovieModel.rating_count == 0, 0),
+        *[(MovieModel.rating_average < upper, index) for index, (upper, _) in enumerate(RATING_BANDS[1:-1], start=1)],
+        else_=len(RATING_BANDS) - 1,
+    )
+    query = db.query(decade, MovieModel.user_id, band, func.count(MovieModel.id)).filter(
+        MovieModel.is_deleted == False
+    )
+    query = _filter_movies(query, user_id, year_from, year_to, has_video, min_rating)
+    if search != "all":
+        query = _search_filter(db, query, search, None)
+    rows = query.group_by(decade, MovieModel.user_id, band).all()
+
+    years, uploaders, bands = Counter(), Counter(), Counter()
+    for year, movie_user_id, rating_band, total in rows:
+        years[year] += total
+        uploaders[movie_user_id] += total
+        bands[rating_band] += total
+
+    top_uploaders = uploaders.most_common(uploaders_limit)
+    names = {}
+    if top_uploaders:
+        names = {
+            db_user.id: db_user
+            for db_user in db.query(UserModel.id, UserModel.first_name, UserModel.last_name)
+            .filter(UserModel.id.in_([uploader for uploader, _ in top_uploaders]))
+        }
+    data = {
+        "count": sum(years.values()),
+        "years": [
+            {"value": f"{year}s" if year is not None else "unknown", "count": total}
+            for year, total in sorted(years.items(), key=lambda item: (item[0] is None, item[0]))
+        ],
+        "uploaders": [
+            {
+                "id": uploader,
+                "first_name": names[uploader].first_name if uploader in names else None,
+                "last_name": names[uploader].last_name if uploader in names else None,
+                "count": total,
+            }
+            for uploader, total in top_uploaders
+        ],
+        "ratings": [
+            {"value": RATING_BANDS[index][1], "count": bands[index]}
+            for index in range(len(RATING_BANDS))
+            if bands[index]
+        ],
+    }
+    return data
+
 
-    data = {"count": count, "list": results}
+def get_ranked_movies(db: Session, board: str, limit: int, cursor: str = None):
+    if board == "top":
+        entries, next_cursor = leaderboards.get_top_rated(db, limit, cursor)
+    else:
+        entries, next_cursor = leaderboards.get_trending(db, limit, cursor)
+    movie_ids = [movie_id for movie_id, _ in entries]
+    db_movies = {}
+    if movie_ids:
+        db_movies = {
+            db_movie.id: db_movie
+            for db_movie in db.query(MovieModel)
+            .options(joinedload(MovieModel.user))
+            .filter(MovieModel.id.in_(movie_ids), MovieModel.is_deleted == False)
+        }
+    thumbnails = get_movie_thumbnails(db, list(db_movies))
+    results = []
+    for movie_id, score in entries:
+        db_movie = db_movies.get(movie_id)
+        if db_movie is None:
+            continue
+        db_movie.score = score
+        db_movie.thumbnail = thumbnails.get(movie_id)
+        results.append(db_movie)
+    data = {"list": results, "next_cursor": next_cursor}
     return data
 
 
-def add_movie(file: UploadFile, movie_id: str):
+def video_path(content_type: str):
+    return "uploads/movies/" + generate_id() + EXTENSIONS[content_type]
+
+
+def sniff_upload(file: UploadFile, content_types: set):
+    """Return the type named by the file's first bytes, 415 unless it is in ``content_types``."""
+    content_type = sniff(file.file.read(SNIFF_BYTES))
+    file.file.seek(0)
+    if content_type not in content_types:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported file type")
+    return content_type
+
+
+def add_movie(file: UploadFile, movie_id: str, content_type: str):
     db = SessionLocal()
     db_movie = get_movie_by_id(db, movie_id)
     if db_movie.path:
         remove_file(db_movie.path)
     try:
-        extention = ".mkv" if file.content_type == "video/x-matroska" else f".{file.content_type.split('/')[1]}"
-        path = "uploads/movies/" + generate_id() + extention
+        path = video_path(content_type)
         save_file(file, path)
     except Exception as e:
         print(e)
@@ -104,6 +637,7 @@ def add_movie(file: UploadFile, movie_id: str):
     db_movie.updated_at = now()
     db.commit()
     db.refresh(db_movie)
+    invalidate_responses("movies", f"movie:{movie_id}")
     return
 
 
@@ -118,6 +652,10 @@ def add_movie_detail(db: Session, user_id: str, movie: MovieAdd):
     db.add(db_movie)
     db.commit()
     db.refresh(db_movie)
+    counts.incr("movies")
+    _index_movie(db_movie)
+    _index_title(db_movie)
+    invalidate_responses("movies", f"movie:{db_movie.id}")
     return db_movie
 
 
@@ -154,9 +692,9 @@ def add_movie_image(db: Session, file: UploadFile, movie_id: str, is_thumbnail:
     if len(db_images) >= 6:
         raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail="maximum 6 images allowed")
     file_name = file.filename
+    content_type = sniff_upload(file, IMAGE_TYPES)
     try:
-        extention = ".jpg" if file.content_type == "image/jpeg" else f".{file.content_type.split('/')[1]}"
-        path = "uploads/images/" + generate_id() + extention
+        path = "uploads/images/" + generate_id() + EXTENSIONS[content_type]
         save_file(file, path)
     except Exception as e:
         print(e)
@@ -170,6 +708,7 @@ def add_movie_image(db: Session, file: UploadFile, movie_id: str, is_thumbnail:
     )
     db.add(db_imgs)
     db.commit()
+    invalidate_responses("movies", f"movie:{movie_id}")
     return
 
 
@@ -198,6 +737,9 @@ def update_movie_details(db: Session, movie_id: str, movie: MovieAdd):
     db_movie.year = movie.year
     db.commit()
     db.refresh(db_movie)
+    _index_movie(db_movie)
+    _index_title(db_movie)
+    invalidate_responses("movies", f"movie:{movie_id}")
     return db_movie
 
 
@@ -214,6 +756,7 @@ def update_movie_image(db: Session, movie_id: str, image_id: str, is_thumbnail:
     db_image.updated_at = now()
     db.commit()
     db.refresh(db_image)
+    invalidate_responses("movies", f"movie:{movie_id}")
     return db_image
 
 
@@ -228,6 +771,7 @@ def delete_movie_images(db: Session, movie_id: str, image_id: str):
     remove_file(db_image.path)
     db.delete(db_image)
     db.commit()
+    invalidate_responses("movies", f"movie:{movie_id}")
     return
 
 
@@ -240,4 +784,12 @@ def delete_movie(db: Session, movie_id: str):
     db_movie.is_deleted = True
     db_movie.updated_at = now()
     db.commit()
+    counts.incr("movies", -1)
+    search_index.remove(movie_id)
+    autocomplete_index.remove(movie_id)
+    leaderboards.remove_movie(movie_id)
+    invalidate_responses("movies", f"movie:{movie_id}")
     return
+
+
+channel.subscribe("responses", _on_catalogue_invalidated)
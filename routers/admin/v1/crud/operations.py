@@ -1,10 +1,40 @@
+from threading import Lock
+
 from fastapi import HTTPException, status
+from sqlalchemy import and_, exists
 from sqlalchemy.orm import Session
 
+from config import config
+from libs.cache import TTLCache
+from libs.invalidation import channel
+from libs.counting import counts
+from libs.pagination import get_sort, paginate
 from libs.utils import object_as_dict
-from models import OperationModel, RoleModel, RoleOperationModel, UserRoleModel
+from models import (
+    OperationModel,
+    RoleModel,
+    RoleOperationModel,
+    UserModel,
+    UserRoleModel,
+)
+
+from .permissions import (
+    SUPER_ADMIN,
+    check_claims,
+    get_operation_catalogue,
+    get_user_permissions,
+    reset_operation_catalogue,
+)
+
 
-from .users import is_super_admin
+OPERATION_SORT_COLUMNS = {"name": OperationModel.name}
+
+permission_cache = TTLCache(
+    maxsize=config.get("permission_cache_size", 4096),
+    ttl=config.get("permission_cache_ttl", 300),
+)
+_permission_version = 0
+_permission_lock = Lock()
 
 
 def get_operation(db: Session, operation_id: str):
@@ -32,7 +62,14 @@ def get_operation_by_slug(db: Session, operation_slug: str, parent_id: str):
     return db_operation
 
 def get_operations(
-    db: Session, start: int, limit: int, sort_by: str, order: str, search: str
+    db: Session,
+    start: int,
+    limit: int,
+    sort_by: str,
+    order: str,
+    search: str,
+    cursor: str = None,
+    count_mode: str = "exact",
 ):
     query = db.query(OperationModel)
 
@@ -40,17 +77,11 @@ def get_operations(
         text = f"""%{search}%"""
         query = query.filter(OperationModel.name.like(text))
 
-    if sort_by == "name":
-        if order == "desc":
-            query = query.order_by(OperationModel.name.desc())
-        else:
-            query = query.order_by(OperationModel.name)
-    else:
-        query = query.order_by(OperationModel.updated_at.desc())
-
-    results = query.offset(start).limit(limit).all()
-    count = query.count()
-    data = {"count": count, "list": results}
+    filters = {"search": search.strip().lower() if search != "all" else None}
+    count = counts.count(db, query, "operations", filters, mode=count_mode)
+    sort_column, descending = get_sort(OPERATION_SORT_COLUMNS, sort_by, order, OperationModel.updated_at)
+    results, next_cursor = paginate(query, sort_column, OperationModel.id, descending, limit, cursor, start)
+    data = {"count": count, "list": results, "next_cursor": next_cursor}
     return data
 
 
@@ -75,86 +106,116 @@ def get_all_operations(db: Session):
     return data
 
 
-def verify_user_operation(db: Session, user_id: str, operation: str):
-    super_admin = is_super_admin(db, user_id=user_id)
-    if not super_admin:
-        db_operations = (
-            db.query(UserRoleModel)
-            .filter(UserRoleModel.user_id == user_id)
-            .join(RoleModel)
-            .join(RoleOperationModel)
-            .join(OperationModel)
-            .filter(OperationModel.slug == operation)
-            .first()
+def _on_permissions_invalidated(user_id: str):
+    global _permission_version
+    with _permission_lock:
+        _permission_version += 1
+        if user_id == "*":
+            permission_cache.clear()
+            reset_operation_catalogue()
+        else:
+            permission_cache.pop(user_id)
+
+
+def invalidate_user_permissions(user_id: str = None):
+    channel.publish("permissions", user_id or "*")
+
+
+def get_cached_user_permissions(db: Session, user_id: str):
+    permissions = permission_cache.get(user_id)
+    if permissions is None:
+        version = _permission_version
+        permissions = get_user_permissions(db, user_id=user_id)
+        with _permission_lock:
+            # Skip caching if an invalidation raced with the load
+            if version == _permission_version:
+                permission_cache.set(user_id, permissions)
+    return permissions
+
+
+def get_permission_cache_stats():
+    return permission_cache.stats()
+
+
+def verify_user_multiple_operation(
+    db: Session, user_id: str, operation: str, claims: dict = None, version: int = None
+):
+    allowed = check_claims(db, claims, operation, version)
+    if allowed is None:
+        permissions = get_cached_user_permissions(db, user_id=user_id)
+        allowed = permissions["super_admin"] or any(
+            operations in permissions["operations"] for operations in operation
+        )
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="You don't have permission.",
         )
-        if db_operations is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="You don't have permission.",
-            )
     return
 
 
-def verify_user_multiple_operation(db: Session, user_id: str, operation: str):
-    super_admin = is_super_admin(db, user_id=user_id)
-    if not super_admin:
-        db_operations = []
-        for operations in operation:
-
-            db_operation = (
-                db.query(UserRoleModel)
-                .filter(UserRoleModel.user_id == user_id)
-                .join(RoleModel)
-                .join(RoleOperationModel)
-                .join(OperationModel)
-                .filter(OperationModel.slug == operations)
-                .first()
-            )
-            db_operations.append(db_operation)
-
-        if all(element is None for element in db_operations):
-            raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="You don't have permission.",
-            )
+def verify_user_operation(
+    db: Session, user_id: str, operation: str, claims: dict = None, version: int = None
+):
+    verify_user_multiple_operation(
+        db, user_id=user_id, operation=[operation], claims=claims, version=version
+    )
     return
 
 
+def get_user_with_operation(db: Session, user_id: str, operation: str):
+    """Load the user, role and whether the role grants ``operation`` at once."""
+    has_operation = exists().where(
+        and_(
+            RoleOperationModel.role_id == UserRoleModel.role_id,
+            RoleOperationModel.operation_id == OperationModel.id,
+            OperationModel.slug == operation,
+        )
+    )
+    row = (
+        db.query(UserModel, RoleModel.id, RoleModel.slug, has_operation)
+        .outerjoin(UserRoleModel, UserRoleModel.user_id == UserModel.id)
+        .outerjoin(RoleModel, RoleModel.id == UserRoleModel.role_id)
+        .filter(UserModel.id == user_id)
+        .first()
+    )
+    if row is None:
+        return None
+    db_user, role_id, role_slug, allowed = row
+    data = {
+        "user": db_user,
+        "role_id": role_id,
+        "super_admin": role_slug == SUPER_ADMIN,
+        "allowed": bool(allowed),
+    }
+    return data
+
+
 def get_user_operation(db: Session, user_id: str):
-    super_admin = is_super_admin(db, user_id=user_id)
-    headings = (
-        db.query(OperationModel)
-        .filter(OperationModel.parent_id == "0")
-        .order_by(OperationModel.order_index)
-        .all()
+    permissions = get_cached_user_permissions(db, user_id=user_id)
+    super_admin = permissions["super_admin"]
+    catalogue = get_operation_catalogue(db)
+    headings = sorted(
+        (row for row in catalogue["rows"] if row.parent_id == "0"),
+        key=lambda row: row.order_index,
     )
     all_operations = []
     allowed_menu = []
     for heading in headings:
-        if super_admin:
-            rows = (
-                db.query(OperationModel)
-                .filter(OperationModel.parent_id == heading.id)
-                .order_by(OperationModel.order_index)
-                .all()
-            )
-        else:
-            rows = (
-                db.query(OperationModel)
-                .filter(OperationModel.parent_id == heading.id)
-                .order_by(OperationModel.order_index)
-                .join(RoleOperationModel)
-                .join(RoleModel)
-                .join(UserRoleModel)
-                .filter(UserRoleModel.user_id == user_id)
-                .all()
-            )
+        rows = sorted(
+            (row for row in catalogue["rows"] if row.parent_id == heading.id),
+            key=lambda row: row.order_index,
+        )
         operations = []
         for row in rows:
-            operations.append(row.slug)
+            if super_admin or row.slug in permissions["operations"]:
+                operations.append(row.slug)
         all_operations.extend(operations)
         if len(operations) == 0:
             continue
         allowed_menu.append(heading.slug)
     data = {"operations": all_operations, "menu": allowed_menu}
     return data
+
+
+channel.subscribe("permissions", _on_permissions_invalidated)
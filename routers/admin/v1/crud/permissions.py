@@ -0,0 +1,141 @@
+import base64
+import hashlib
+import time
+
+from threading import Lock
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from config import config
+from models import OperationModel, RoleModel, RoleOperationModel, UserModel, UserRoleModel
+
+
+SUPER_ADMIN = "Super Admin"
+# Operations are only changed by migrations, which may run in another process
+CATALOGUE_TTL = config.get("permission_cache_ttl", 300)
+
+_catalogue = None
+_catalogue_lock = Lock()
+
+
+def get_operation_catalogue(db: Session):
+    """Return every operation in a stable order, versioned by its slugs."""
+    global _catalogue
+    if _catalogue is None or _catalogue["expires_at"] < time.monotonic():
+        with _catalogue_lock:
+            if _catalogue is None or _catalogue["expires_at"] < time.monotonic():
+                rows = (
+                    db.query(
+                        OperationModel.id,
+                        OperationModel.slug,
+                        OperationModel.parent_id,
+                        OperationModel.order_index,
+                    )
+                    .order_by(
+                        OperationModel.parent_id,
+                        OperationModel.order_index,
+                        OperationModel.id,
+                    )
+                    .all()
+                )
+                slugs = [row.slug for row in rows]
+                version = hashlib.sha1("\n".join(slugs).encode("utf-8")).hexdigest()
+                _catalogue = {
+                    "version": version[:8],
+                    "rows": rows,
+                    "slugs": slugs,
+                    "index": {slug: no for no, slug in enumerate(slugs)},
+                    "expires_at": time.monotonic() + CATALOGUE_TTL,
+                }
+    return _catalogue
+
+
+def reset_operation_catalogue():
+    global _catalogue
+    _catalogue = None
+
+
+def encode_operations(catalogue: dict, operations: Iterable[str]):
+    bits = 0
+    for operation in operations:
+        no = catalogue["index"].get(operation)
+        if no is not None:
+            bits |= 1 << no
+    size = (len(catalogue["slugs"]) + 7) // 8
+    encoded = base64.urlsafe_b64encode(bits.to_bytes(size, "little"))
+    return encoded.decode("ascii").rstrip("=")
+
+
+def decode_operations(catalogue: dict, encoded: str):
+    padding = "=" * (-len(encoded) % 4)
+    bits = int.from_bytes(base64.urlsafe_b64decode(encoded + padding), "little")
+    return frozenset(
+        slug for no, slug in enumerate(catalogue["slugs"]) if bits >> no & 1
+    )
+
+
+def bump_permission_version(db: Session, user_id: str = None, role_id: str = None):
+    """Make access tokens issued before this change stale for the affected users.
+
+    Runs in the caller's transaction, so commit it together with the change.
+    """
+    query = db.query(UserModel)
+    if user_id is not None:
+        query = query.filter(UserModel.id == user_id)
+    else:
+        members = select(UserRoleModel.user_id).where(UserRoleModel.role_id == role_id)
+        query = query.filter(UserModel.id.in_(members))
+    query.update(
+        {UserModel.permission_version: UserModel.permission_version + 1},
+        synchronize_session=False,
+    )
+
+
+def get_user_permissions(db: Session, user_id: str):
+    rows = (
+        db.query(UserModel.permission_version, UserRoleModel.role_id, RoleModel.slug, OperationModel.slug)
+        .outerjoin(UserRoleModel, UserRoleModel.user_id == UserModel.id)
+        .outerjoin(RoleModel, RoleModel.id == UserRoleModel.role_id)
+        .outerjoin(RoleOperationModel, RoleOperationModel.role_id == RoleModel.id)
+        .outerjoin(OperationModel, OperationModel.id == RoleOperationModel.operation_id)
+        .filter(UserModel.id == user_id)
+        .all()
+    )
+    version = rows[0][0] if rows else None
+    role_id = rows[0][1] if rows else None
+    super_admin = any(row[2] == SUPER_ADMIN for row in rows)
+    operations = frozenset(row[3] for row in rows if row[3] is not None)
+    return {"role_id": role_id, "super_admin": super_admin, "operations": operations, "version": version}
+
+
+def get_permission_claims(db: Session, user_id: str):
+    catalogue = get_operation_catalogue(db)
+    permissions = get_user_permissions(db, user_id=user_id)
+    return {
+        "role": permissions["role_id"],
+        "sa": permissions["super_admin"],
+        "ops": encode_operations(catalogue, permissions["operations"]),
+        "cv": catalogue["version"],
+        "pv": permissions["version"],
+    }
+
+
+def check_claims(db: Session, claims: dict, operations: Iterable[str], version: int = None):
+    """Answer from token claims; ``None`` means the claims can't decide.
+
+    ``version`` is the user's current ``permission_version``; claims issued
+    under another version are stale and never decide.
+    """
+    if not claims or "ops" not in claims:
+        return None
+    if version is None or claims.get("pv") != version:
+        return None
+    if claims.get("sa"):
+        return True
+    catalogue = get_operation_catalogue(db)
+    if claims.get("cv") != catalogue["version"]:
+        return None
+    allowed = decode_operations(catalogue, claims["ops"])
+    return any(operation in allowed for operation in operations)
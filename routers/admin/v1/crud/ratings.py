@@ -1,12 +1,31 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from fastapi import HTTPException, status
 
+from database import SessionLocal
+
+from libs.counting import counts
+from libs.pagination import get_sort, paginate
+from libs.response_cache import invalidate_responses
 from libs.utils import generate_id, now
 from models import MovieRatingModel
-from routers.admin.v1.crud.movies import get_movie_by_id
+from routers.admin.v1.crud import leaderboards
+from routers.admin.v1.crud.movies import (
+    apply_rating_change,
+    get_movie_by_id,
+    get_movies_by_ids,
+    lock_movie,
+    movie_popularity,
+    update_popularity,
+)
 from routers.admin.v1.schemas import RatingAdd, RatingUpdate
 
 
+RATING_SORT_COLUMNS = {
+    "rating": MovieRatingModel.score,
+    "created_at": MovieRatingModel.created_at,
+}
+
 
 def get_rating_by_id(db: Session, rating_id: str):
     return db.query(MovieRatingModel).filter(MovieRatingModel.id == rating_id, MovieRatingModel.is_deleted == False).first()
@@ -19,9 +38,16 @@ def get_rating_list(
     search: str,
     sort_by: str,
     order: str,
-    movie_id: str
+    movie_id: str,
+    cursor: str = None,
+    count_mode: str = "exact",
+    expand: str = None,
 ):
-    query = db.query(MovieRatingModel).filter(MovieRatingModel.is_deleted == False)
+    query = (
+        db.query(MovieRatingModel)
+        .filter(MovieRatingModel.is_deleted == False)
+        .options(joinedload(MovieRatingModel.user))
+    )
 
     if movie_id != "all":
         query = query.filter(MovieRatingModel.movie_id == movie_id)
@@ -31,22 +57,18 @@ def get_rating_list(
         query = query.filter(MovieRatingModel.text.like(text))
     
 
-    if sort_by == "rating":
-        if order=="desc":
-            query = query.order_by(MovieRatingModel.score.desc())
-        else:
-            query = query.order_by(MovieRatingModel.score)
-    elif sort_by == "created_at":
-        if order=="desc":
-            query = query.order_by(MovieRatingModel.created_at.desc())
-        else:
-            query = query.order_by(MovieRatingModel.created_at)
-    else:
-        query = query.order_by(MovieRatingModel.created_at.desc())
-    
-    count = query.count()
-    results = query.offset(start).limit(limit).all()
-    data = {"count": count, "list": results}
+    filters = {
+        "movie_id": movie_id if movie_id != "all" else None,
+        "search": search.strip().lower() if search != "all" else None,
+    }
+    count = counts.count(db, query, "movie_ratings", filters, mode=count_mode)
+    sort_column, descending = get_sort(RATING_SORT_COLUMNS, sort_by, order, MovieRatingModel.created_at)
+    results, next_cursor = paginate(query, sort_column, MovieRatingModel.id, descending, limit, cursor, start)
+    if expand == "movie":
+        db_movies = get_movies_by_ids(db, list({result.movie_id for result in results}))
+        for result in results:
+            set_committed_value(result, "movie", db_movies[result.movie_id])
+    data = {"count": count, "list": results, "next_cursor": next_cursor}
     return data
 
 
@@ -63,8 +85,17 @@ def add_rating(db: Session, user_id: str, rating: RatingAdd):
         user_id=user_id
     )
     db.add(db_rating)
+    db_movie = lock_movie(db, rating.movie_id)
+    apply_rating_change(db_movie, new_score=rating.score)
+    aggregates = (db_movie.rating_count, db_movie.rating_sum)
+    popularity = movie_popularity(db_movie)
     db.commit()
     db.refresh(db_rating)
+    counts.incr("movie_ratings")
+    update_popularity(rating.movie_id, popularity)
+    leaderboards.update_top_rated(rating.movie_id, *aggregates)
+    leaderboards.record_activity(rating.movie_id, "rating", db_rating.created_at)
+    invalidate_responses(f"ratings:{rating.movie_id}", "movies", f"movie:{rating.movie_id}")
     return db_rating
 
 
@@ -80,23 +111,46 @@ def get_rating(db: Session, movie_id: str, rating_id: str):
     return db_rating
 
 
-def get_all_ratings(db: Session, movie_id: str):
-    db_movie = get_movie_by_id(db=db, movie_id=movie_id)
-    if db_movie is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie is not found")
-    
-    db_rating = (
+def _movie_ratings(db: Session, movie_id: str):
+    return (
         db.query(MovieRatingModel)
-        .filter(
-            MovieRatingModel.is_deleted == False
-        )
-        .order_by(MovieRatingModel.created_at.desc())
-        .all()
+        .filter(MovieRatingModel.movie_id == movie_id, MovieRatingModel.is_deleted == False)
+        .options(joinedload(MovieRatingModel.user))
     )
-    db_movie.ratings = db_rating
+
+
+def get_all_ratings(db: Session, movie_id: str, limit: int, cursor: str = None):
+    db_movie = get_movies_by_ids(db, [movie_id]).get(movie_id)
+    if db_movie is None or db_movie.is_deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie is not found")
+
+    results, next_cursor = paginate(
+        _movie_ratings(db, movie_id), MovieRatingModel.created_at, MovieRatingModel.id, True, limit, cursor
+    )
+    db_movie.ratings = results
+    db_movie.next_cursor = next_cursor
     return db_movie
 
 
+def stream_ratings(movie_id: str, batch_size: int = 1000):
+    """Yield every rating of a movie, newest first, through a server-side cursor.
+
+    Uses its own session because the rows are read while the response is
+    being sent, after the request's session may have been closed.
+    """
+    db = SessionLocal()
+    try:
+        query = (
+            _movie_ratings(db, movie_id)
+            .order_by(MovieRatingModel.created_at.desc(), MovieRatingModel.id.desc())
+            .execution_options(stream_results=True)
+            .yield_per(batch_size)
+        )
+        yield from query
+    finally:
+        db.close()
+
+
 def update_rating(db: Session, movie_id: str, rating_id: str, rating: RatingUpdate):
     db_movie = get_movie_by_id(db=db, movie_id=movie_id)
     if db_movie is None:
@@ -106,11 +160,20 @@ def update_rating(db: Session, movie_id: str, rating_id: str, rating: RatingUpda
     if db_rating is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rating is not found")
     
+    db_movie = lock_movie(db, db_rating.movie_id)
+    db.refresh(db_rating, with_for_update=True)
+    if db_rating.is_deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rating is not found")
+    if db_rating.score != rating.score:
+        apply_rating_change(db_movie, db_rating.score, rating.score)
+    aggregates = (db_movie.rating_count, db_movie.rating_sum)
     db_rating.score = rating.score
     db_rating.text = rating.text
     db_rating.updated_at = now()
     db.add(db_rating)
     db.commit()
+    leaderboards.update_top_rated(db_rating.movie_id, *aggregates)
+    invalidate_responses(f"ratings:{db_rating.movie_id}", "movies", f"movie:{db_rating.movie_id}")
     return db_rating
 
 
@@ -123,7 +186,20 @@ def delete_rating(db: Session, movie_id: str, rating_id: str):
     if db_rating is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rating is not found")
     
+    db_movie = lock_movie(db, db_rating.movie_id)
+    db.refresh(db_rating, with_for_update=True)
+    if db_rating.is_deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rating is not found")
+    apply_rating_change(db_movie, old_score=db_rating.score)
+    aggregates = (db_movie.rating_count, db_movie.rating_sum)
+    popularity = movie_popularity(db_movie)
+    created_at = db_rating.created_at
     db_rating.is_deleted = True
     db_rating.updated_at = now()
     db.commit()
+    counts.incr("movie_ratings", -1)
+    update_popularity(db_rating.movie_id, popularity)
+    leaderboards.update_top_rated(db_rating.movie_id, *aggregates)
+    leaderboards.record_activity(db_rating.movie_id, "rating", created_at, removed=True)
+    invalidate_responses(f"ratings:{db_rating.movie_id}", "movies", f"movie:{db_rating.movie_id}")
     return
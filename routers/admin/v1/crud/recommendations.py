@@ -0,0 +1,146 @@
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from config import config
+from libs.similarity import SimilarityStore, StoreLoader, rating_matrix, top_k_similar
+from models import MovieModel, MovieRatingModel
+
+
+SIMILARITY_STORE = config.get("similarity_store", "uploads/similar_movies.npz")
+
+store_loader = StoreLoader(SIMILARITY_STORE)
+
+
+def _lookup(sorted_ids: np.ndarray, ids: list):
+    """Positions of ``ids`` in ``sorted_ids``, ``-1`` where missing."""
+    ids = np.asarray(ids, dtype=str)
+    if len(sorted_ids) == 0:
+        return np.full(len(ids), -1, dtype=np.int64)
+    positions = np.searchsorted(sorted_ids, ids)
+    clipped = np.minimum(positions, len(sorted_ids) - 1)
+    return np.where(sorted_ids[clipped] == ids, clipped, -1)
+
+
+def _load_ratings(db: Session, movie_ids: np.ndarray, batch_size: int = 50000):
+    """Stream live ratings into index arrays aligned with the sorted ``movie_ids``."""
+    users = {}
+    user_index, movie_index, scores = [], [], []
+    batch_users, batch_movies, batch_scores = [], [], []
+
+    def flush():
+        positions = _lookup(movie_ids, batch_movies)
+        known = positions >= 0
+        user_index.append(np.asarray(batch_users, dtype=np.int32)[known])
+        movie_index.append(positions[known].astype(np.int32))
+        scores.append(np.asarray(batch_scores, dtype=np.float32)[known])
+        batch_users.clear()
+        batch_movies.clear()
+        batch_scores.clear()
+
+    rows = (
+        db.query(MovieRatingModel.user_id, MovieRatingModel.movie_id, MovieRatingModel.score)
+        .filter(MovieRatingModel.is_deleted == False)
+        .yield_per(batch_size)
+    )
+    for user_id, movie_id, score in rows:
+        batch_users.append(users.setdefault(user_id, len(users)))
+        batch_movies.append(movie_id)
+        batch_scores.append(score)
+        if len(batch_movies) >= batch_size:
+            flush()
+    flush()
+    return np.concatenate(user_index), np.concatenate(movie_index), np.concatenate(scores), len(users)
+
+
+def _touched_movies(db: Session, since: float):
+    changed_at = datetime.fromtimestamp(since)
+    rows = (
+        db.query(MovieRatingModel.movie_id)
+        .filter(or_(MovieRatingModel.created_at >= changed_at, MovieRatingModel.updated_at >= changed_at))
+        .distinct()
+    )
+    return [row.movie_id for row in rows]
+
+
+def build_similarity_store(
+    db: Session,
+    k: int = 20,
+    memory_budget: int = 256 * 1024 * 1024,
+    adjusted: bool = True,
+    previous: SimilarityStore = None,
+):
+    """Compute the top-``k`` similar movies for the whole catalogue.
+
+    With ``previous`` only movies that are new, had ratings changed since it
+    was built, or list such a movie or a deleted one as a neighbour are
+    recomputed; the other rows are carried over.
+    """
+    built_at = datetime.now().timestamp()
+    movies = (
+        db.query(MovieModel.id, MovieModel.title)
+        .filter(MovieModel.is_deleted == False)
+        .order_by(MovieModel.id)
+        .all()
+    )
+    movie_ids = np.asarray([movie.id for movie in movies], dtype=str)
+    titles = np.asarray([movie.title for movie in movies], dtype=str)
+    user_index, movie_index, scores, n_users = _load_ratings(db, movie_ids)
+    matrix = rating_matrix(user_index, movie_index, scores, n_users, len(movie_ids), adjusted=adjusted)
+
+    if previous is None:
+        neighbours, similarities = top_k_similar(matrix, k, memory_budget=memory_budget)
+        return SimilarityStore(movie_ids, titles, neighbours, similarities, built_at)
+
+    # Carry the previous rows over, re-pointed at the new movie positions
+    width = max(1, min(k, len(movie_ids) - 1))
+    neighbours = np.full((len(movie_ids), width), -1, dtype=np.int32)
+    similarities = np.zeros((len(movie_ids), width), dtype=np.float32)
+    old_to_new = _lookup(movie_ids, previous.movie_ids)
+    kept = old_to_new >= 0
+    carried = previous.neighbours[kept, :width]
+    columns = carried.shape[1]
+    remapped = np.where(carried >= 0, old_to_new[np.maximum(carried, 0)], -1)
+    neighbours[old_to_new[kept], :columns] = remapped
+    similarities[old_to_new[kept], :columns] = np.where(remapped >= 0, previous.scores[kept, :width], 0)
+
+    stale = np.ones(len(movie_ids), dtype=bool)
+    stale[old_to_new[kept]] = False
+    # Rows that lost a neighbour to a deleted movie would come back short
+    lost = ((carried >= 0) & (remapped < 0)).any(axis=1)
+    stale[old_to_new[kept][lost]] = True
+    touched = _lookup(movie_ids, _touched_movies(db, previous.built_at))
+    touched = touched[touched >= 0]
+    stale[touched] = True
+    # A changed movie's similarity to its old neighbours changed on their side too
+    stale[np.isin(neighbours, touched).any(axis=1)] = True
+    rows = np.flatnonzero(stale)
+    if len(rows):
+        fresh, fresh_scores = top_k_similar(matrix, width, rows=rows, memory_budget=memory_budget)
+        neighbours[rows, :fresh.shape[1]] = fresh
+        similarities[rows, :fresh.shape[1]] = fresh_scores
+    return SimilarityStore(movie_ids, titles, neighbours, similarities, built_at)
+
+
+def get_similar_movies(db: Session, movie_id: str, limit: int):
+    store = store_loader.get()
+    if store is None:
+        return {"list": []}
+    # The store is only as fresh as its last build; drop movies deleted since
+    candidates = store.similar(movie_id, store.neighbours.shape[1])
+    titles = dict(
+        db.query(MovieModel.id, MovieModel.title)
+        .filter(
+            MovieModel.id.in_([candidate["id"] for candidate in candidates]),
+            MovieModel.is_deleted == False,
+        )
+        .all()
+    ) if candidates else {}
+    similar = []
+    for candidate in candidates:
+        if candidate["id"] in titles:
+            similar.append(dict(candidate, title=titles[candidate["id"]]))
+    data = {"list": similar[:limit]}
+    return data
@@ -3,15 +3,27 @@ from typing import List
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 
+from libs.counting import counts
+from libs.pagination import get_sort, paginate
 from libs.utils import generate_id, now, object_as_dict
 from models import RoleModel, RoleOperationModel
 from routers.admin.v1.schemas import RoleAdd
 
-from .operations import get_operation
+from .operations import get_operation, invalidate_user_permissions
+from .permissions import bump_permission_version
 
 
+ROLE_SORT_COLUMNS = {"name": RoleModel.name}
+
 def get_roles(
-    db: Session, start: int, limit: int, sort_by: str, order: str, search: str
+    db: Session,
+    start: int,
+    limit: int,
+    sort_by: str,
+    order: str,
+    search: str,
+    cursor: str = None,
+    count_mode: str = "exact",
 ):
     query = db.query(RoleModel).filter(RoleModel.is_deleted == False)
 
@@ -19,17 +31,11 @@ def get_roles(
         text = f"""%{search}%"""
         query = query.filter(RoleModel.name.like(text))
 
-    if sort_by == "name":
-        if order == "desc":
-            query = query.order_by(RoleModel.name.desc())
-        else:
-            query = query.order_by(RoleModel.name)
-    else:
-        query = query.order_by(RoleModel.updated_at.desc())
-
-    results = query.offset(start).limit(limit).all()
-    count = query.count()
-    data = {"count": count, "list": results}
+    filters = {"search": search.strip().lower() if search != "all" else None}
+    count = counts.count(db, query, "roles", filters, mode=count_mode)
+    sort_column, descending = get_sort(ROLE_SORT_COLUMNS, sort_by, order, RoleModel.updated_at)
+    results, next_cursor = paginate(query, sort_column, RoleModel.id, descending, limit, cursor, start)
+    data = {"count": count, "list": results, "next_cursor": next_cursor}
     return data
 
 
@@ -81,6 +87,7 @@ def add_role_operations(db: Session, role_id: str, operations: List[str]):
         )
         db.add(db_role_operation)
     db.commit()
+    invalidate_user_permissions()
     return
 
 
@@ -113,6 +120,7 @@ def add_role(db: Session, role: RoleAdd):
     db.add(db_role)
     add_role_operations(db, role_id=id, operations=role.operations)
     db.commit()
+    counts.incr("roles")
     return
 
 
@@ -135,9 +143,11 @@ def update_role(db: Session, role_id: str, role: RoleAdd):
                 status_code=status.HTTP_409_CONFLICT, detail="Role already exist."
             )
     db_role.name = name
+    bump_permission_version(db, role_id=role_id)
     delete_role_operations(db, role_id=role_id)
     add_role_operations(db, role_id=role_id, operations=role.operations)
     db.commit()
+    invalidate_user_permissions()
     return
 
 
@@ -149,5 +159,8 @@ def delete_role(db: Session, role_id: str):
         )
     db_role.is_deleted = True
     db_role.updated_at = now()
+    bump_permission_version(db, role_id=role_id)
     db.commit()
+    counts.incr("roles", -1)
+    invalidate_user_permissions()
     return
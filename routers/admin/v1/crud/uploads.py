@@ -0,0 +1,353 @@
+import base64
+import binascii
+import hashlib
+import os
+import time
+
+from datetime import timedelta
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect
+
+from config import config
+from libs.filetype import IMAGE_TYPES, SNIFF_BYTES, VIDEO_TYPES, sniff
+from libs.response_cache import invalidate_responses
+from libs.utils import generate_id, now, remove_file, save_stream, write_at
+from models import MovieImageModel, MovieUploadModel
+from routers.admin.v1.crud.movies import get_movie_by_id, get_movie_images, lock_movie, video_path
+from routers.admin.v1.schemas import UploadCreate
+
+
+UPLOAD_MAX_BYTES = config.get("upload_max_bytes", 16 * 1024 ** 3)
+UPLOAD_CHUNK_MAX_BYTES = config.get("upload_chunk_max_bytes", 64 * 1024 ** 2)
+UPLOAD_EXPIRY = config.get("upload_expiry", 24 * 3600)
+UPLOAD_MAX_OPEN = config.get("upload_max_open", 3)
+UPLOAD_LEASE = config.get("upload_lease", 60)
+UPLOAD_SWEEP_INTERVAL = config.get("upload_sweep_interval", 600)
+UPLOAD_BUFFER_BYTES = config.get("upload_buffer_bytes", 1024 * 1024)
+IMAGE_MAX_BYTES = config.get("image_max_bytes", 10 * 1024 ** 2)
+CHECKSUM_ALGORITHMS = ("sha256", "sha1", "md5")
+
+_next_sweep = 0.0
+
+
+def _parse_checksum(checksum: str):
+    """Parse an ``Upload-Checksum: <algorithm> <base64 digest>`` header."""
+    try:
+        algorithm, digest = checksum.split(" ", 1)
+        digest = base64.b64decode(digest, validate=True)
+    except (ValueError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid Upload-Checksum")
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Unsupported checksum algorithm")
+    return hashlib.new(algorithm), digest
+
+
+def get_upload(db: Session, movie_id: str, upload_id: str, user_id: str):
+    db_upload = db.query(MovieUploadModel).filter(
+        MovieUploadModel.id == upload_id,
+        MovieUploadModel.movie_id == movie_id,
+        MovieUploadModel.user_id == user_id,
+        MovieUploadModel.is_completed == False,
+    ).first()
+    if db_upload is None or db_upload.expires_at < now():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload is not found")
+    return db_upload
+
+
+def expire_uploads(db: Session):
+    """Delete abandoned upload sessions and their partial files."""
+    global _next_sweep
+    _next_sweep = time.monotonic() + UPLOAD_SWEEP_INTERVAL
+    db_uploads = db.query(MovieUploadModel).filter(
+        MovieUploadModel.is_completed == False,
+        MovieUploadModel.expires_at < now(),
+    ).all()
+    for db_upload in db_uploads:
+        remove_file(db_upload.path)
+        db.delete(db_upload)
+    db.commit()
+    return len(db_uploads)
+
+
+def create_upload(db: Session, movie_id: str, user_id: str, upload: UploadCreate):
+    if time.monotonic() >= _next_sweep:
+        expire_uploads(db)
+
+    db_movie = get_movie_by_id(db, movie_id)
+    if db_movie is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie is not found")
+    if upload.size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Upload is too large")
+    if upload.content_type not in VIDEO_TYPES:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported file type")
+    open_uploads = db.query(MovieUploadModel).filter(
+        MovieUploadModel.user_id == user_id,
+        MovieUploadModel.is_completed == False,
+        MovieUploadModel.expires_at >= now(),
+    ).count()
+    if open_uploads >= UPLOAD_MAX_OPEN:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many unfinished uploads")
+
+    # Chunks arrive in offset order, so the file only grows as data is received
+    path = video_path(upload.content_type)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+    db_upload = MovieUploadModel(
+        id=generate_id(),
+        movie_id=movie_id,
+        user_id=user_id,
+        path=path,
+        content_type=upload.content_type,
+        size=upload.size,
+        upload_offset=0,
+        expires_at=now() + timedelta(seconds=UPLOAD_EXPIRY),
+    )
+    db.add(db_upload)
+    db.commit()
+    db.refresh(db_upload)
+    return db_upload
+
+
+def _write_block(fd: int, data: bytes, position: int, hasher):
+    write_at(fd, data, position)
+    if hasher is not None:
+        hasher.update(data)
+
+
+def _claim_upload(db: Session, movie_id: str, upload_id: str, user_id: str, offset: int, lease_id: str):
+    """Lease the upload to one chunk write so no other writer touches the file meanwhile."""
+    db_upload = get_upload(db, movie_id, upload_id, user_id)
+    if offset != db_upload.upload_offset:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload-Offset does not match")
+    path, size = db_upload.path, db_upload.size
+    claimed = (
+        db.query(MovieUploadModel)
+        .filter(
+            MovieUploadModel.id == upload_id,
+            MovieUploadModel.upload_offset == offset,
+            or_(MovieUploadModel.leased_until == None, MovieUploadModel.leased_until < now()),
+        )
+        .update(
+            {
+                MovieUploadModel.lease_id: lease_id,
+                MovieUploadModel.leased_until: now() + timedelta(seconds=UPLOAD_LEASE),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    if not claimed:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload is being written")
+    return path, size
+
+
+def _renew_lease(db: Session, upload_id: str, lease_id: str):
+    renewed = (
+        db.query(MovieUploadModel)
+        .filter(MovieUploadModel.id == upload_id, MovieUploadModel.lease_id == lease_id)
+        .update(
+            {MovieUploadModel.leased_until: now() + timedelta(seconds=UPLOAD_LEASE)},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return renewed
+
+
+def _release_lease(db: Session, upload_id: str, lease_id: str):
+    db.rollback()
+    db.query(MovieUploadModel).filter(
+        MovieUploadModel.id == upload_id, MovieUploadModel.lease_id == lease_id
+    ).update({MovieUploadModel.lease_id: None, MovieUploadModel.leased_until: None}, synchronize_session=False)
+    db.commit()
+
+
+def _advance_offset(db: Session, upload_id: str, lease_id: str, offset: int, received: int):
+    updated = (
+        db.query(MovieUploadModel)
+        .filter(MovieUploadModel.id == upload_id, MovieUploadModel.lease_id == lease_id)
+        .update(
+            {
+                MovieUploadModel.upload_offset: offset + received,
+                MovieUploadModel.lease_id: None,
+                MovieUploadModel.leased_until: None,
+                MovieUploadModel.expires_at: now() + timedelta(seconds=UPLOAD_EXPIRY),
+                MovieUploadModel.updated_at: now(),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated
+
+
+async def write_chunk(
+    db: Session,
+    movie_id: str,
+    upload_id: str,
+    user_id: str,
+    offset: int,
+    checksum: str,
+    body,
+):
+    """Write one chunk at ``offset`` and return the new offset.
+
+    The upload is leased to this request before any byte is written, so a
+    retried or concurrent chunk gets a 409 instead of writing over it. The
+    lease is renewed while data keeps arriving; a writer that stalls past
+    ``upload_lease`` loses it and stops before its next write. A chunk with
+    a checksum is all or nothing; without one, the bytes received before a
+    disconnect are kept. Database calls and file writes run in the
+    threadpool; only the body is read on the event loop.
+    """
+    hasher, expected = _parse_checksum(checksum) if checksum else (None, None)
+    lease_id = generate_id()
+    path, size = await run_in_threadpool(_claim_upload, db, movie_id, upload_id, user_id, offset, lease_id)
+    limit = min(UPLOAD_CHUNK_MAX_BYTES, size - offset)
+    renew_at = time.monotonic() + UPLOAD_LEASE / 2
+
+    async def write(block: bytes, position: int):
+        nonlocal renew_at
+        if time.monotonic() >= renew_at:
+            if not await run_in_threadpool(_renew_lease, db, upload_id, lease_id):
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload is being written")
+            renew_at = time.monotonic() + UPLOAD_LEASE / 2
+        await run_in_threadpool(_write_block, fd, block, position, hasher)
+
+    received = 0
+    buffer = bytearray()
+    disconnected = False
+    try:
+        fd = await run_in_threadpool(os.open, path, os.O_WRONLY)
+        try:
+            try:
+                async for data in body:
+                    if received + len(buffer) + len(data) > limit:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Chunk is too large"
+                        )
+                    buffer += data
+                    if len(buffer) >= UPLOAD_BUFFER_BYTES:
+                        await write(bytes(buffer), offset + received)
+                        received += len(buffer)
+                        buffer.clear()
+            except ClientDisconnect:
+                disconnected = True
+            if buffer:
+                await write(bytes(buffer), offset + received)
+                received += len(buffer)
+        finally:
+            os.close(fd)
+
+        if hasher is not None and (disconnected or hasher.digest() != expected):
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Checksum does not match")
+        advanced = await run_in_threadpool(_advance_offset, db, upload_id, lease_id, offset, received)
+    except Exception:
+        await run_in_threadpool(_release_lease, db, upload_id, lease_id)
+        raise
+    if not advanced:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload is being written")
+    return offset + received
+
+
+def finalize_upload(db: Session, movie_id: str, upload_id: str, user_id: str):
+    db_upload = get_upload(db, movie_id, upload_id, user_id)
+    if db_upload.upload_offset != db_upload.size:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload is incomplete")
+    # The declared type only picked the extension; the assembled file must agree
+    with open(db_upload.path, "rb") as buffer:
+        if sniff(buffer.read(SNIFF_BYTES)) != db_upload.content_type:
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported file type")
+
+    db_movie = lock_movie(db, movie_id)
+    if db_movie is None or db_movie.is_deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie is not found")
+    old_path = db_movie.path
+    db_movie.path = db_upload.path
+    db_movie.updated_at = now()
+    db_upload.is_completed = True
+    db_upload.updated_at = now()
+    db.commit()
+    if old_path:
+        remove_file(old_path)
+    invalidate_responses("movies", f"movie:{movie_id}")
+    return db_movie
+
+
+def _check_length(content_length: int, max_bytes: int):
+    if content_length is not None and content_length > max_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File is too large")
+
+
+def _check_movie(db: Session, movie_id: str, images: bool = False):
+    if get_movie_by_id(db, movie_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie is not found")
+    if images and len(get_movie_images(db=db, movie_id=movie_id)) >= 6:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail="maximum 6 images allowed")
+
+
+def _set_movie_video(db: Session, movie_id: str, path: str):
+    db_movie = lock_movie(db, movie_id)
+    if db_movie is None or db_movie.is_deleted:
+        db.rollback()
+        remove_file(path)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie is not found")
+    old_path = db_movie.path
+    db_movie.path = path
+    db_movie.updated_at = now()
+    db.commit()
+    if old_path:
+        remove_file(old_path)
+    invalidate_responses("movies", f"movie:{movie_id}")
+
+
+def _add_movie_image(db: Session, movie_id: str, path: str, is_thumbnail: bool, name: str = None):
+    db_image = MovieImageModel(
+        id=generate_id(),
+        name=name or os.path.basename(path),
+        path=path,
+        is_thumbnail=is_thumbnail,
+        movie_id=movie_id,
+    )
+    db.add(db_image)
+    db.commit()
+    invalidate_responses("movies", f"movie:{movie_id}")
+    return db_image.id
+
+
+async def put_movie_video(db: Session, movie_id: str, body, content_length: int = None):
+    """Store a raw request body as the movie's video, replacing any previous one.
+
+    Only the body is streamed on the event loop; database steps run in the
+    threadpool.
+    """
+    await run_in_threadpool(_check_movie, db, movie_id)
+    _check_length(content_length, UPLOAD_MAX_BYTES)
+
+    os.makedirs("uploads/movies", exist_ok=True)
+    path, content_type, size, digest = await save_stream(
+        body, "uploads/movies/", VIDEO_TYPES, UPLOAD_MAX_BYTES, UPLOAD_BUFFER_BYTES
+    )
+    await run_in_threadpool(_set_movie_video, db, movie_id, path)
+    data = {"id": movie_id, "content_type": content_type, "size": size, "sha256": digest}
+    return data
+
+
+async def put_movie_image(
+    db: Session, movie_id: str, body, is_thumbnail: bool, name: str = None, content_length: int = None
+):
+    await run_in_threadpool(_check_movie, db, movie_id, images=True)
+    _check_length(content_length, IMAGE_MAX_BYTES)
+
+    os.makedirs("uploads/images", exist_ok=True)
+    path, content_type, size, digest = await save_stream(
+        body, "uploads/images/", IMAGE_TYPES, IMAGE_MAX_BYTES, UPLOAD_BUFFER_BYTES
+    )
+    image_id = await run_in_threadpool(_add_movie_image, db, movie_id, path, is_thumbnail, name)
+    data = {"id": image_id, "content_type": content_type, "size": size, "sha256": digest}
+    return data
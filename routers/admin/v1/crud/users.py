@@ -1,20 +1,39 @@
+import hashlib
 import json
-import bcrypt
+import time
 import traceback
 
 from uuid import uuid4
 
+import bcrypt
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from jwcrypto import jwk, jwt
+from jwcrypto.jwt import JWTExpired
 from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from config import config
+from libs.cache import TTLCache
+from libs.counting import counts
+from libs.invalidation import channel
+from libs.pagination import get_sort, paginate
+from libs.password_pool import PasswordPool
+from libs.ratelimit import RateLimiter, load_backend
+from libs.response_cache import invalidate_responses
 from libs.utils import generate_id, now, object_as_dict
 from models import RoleModel, UserRoleModel, UserModel
+
+from .operations import (
+    get_user_with_operation,
+    invalidate_user_permissions,
+    verify_user_operation,
+)
+from .permissions import bump_permission_version, check_claims, get_permission_claims
 from routers.admin.v1.schemas import (
     AdminUserUpdate,
     ChangePassword,
+    TokenRefresh,
     UserAdd,
     UserLogin,
     UserSignUp,
@@ -22,6 +41,83 @@ from routers.admin.v1.schemas import (
 )
 
 
+USER_SORT_COLUMNS = {
+    "first_name": UserModel.first_name,
+    "last_name": UserModel.last_name,
+    "email": UserModel.email,
+}
+
+token_cache = TTLCache(
+    maxsize=config.get("token_cache_size", 4096),
+    ttl=config.get("token_cache_ttl", 60),
+)
+
+password_pool = PasswordPool(
+    max_workers=config.get("password_workers", 4),
+    max_queue=config.get("password_queue_size", 16),
+)
+
+rate_limiter = RateLimiter(
+    backend=load_backend(config.get("rate_limit_backend")),
+    rules=config.get(
+        "rate_limits",
+        {
+            "login": {"ip": (20, 60), "email": (5, 60)},
+            "sign-up": {"ip": (5, 60), "email": (3, 60)},
+            "change-password": {"ip": (10, 60), "token": (5, 60)},
+        },
+    ),
+)
+
+_jwt_key = None
+
+
+def _get_jwt_key():
+    global _jwt_key
+    if _jwt_key is None:
+        _jwt_key = jwk.JWK(**config["jwt_key"])
+    return _jwt_key
+
+
+def _token_digest(token: str):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _user_snapshot(db_user: UserModel):
+    snapshot = UserModel(**object_as_dict(db_user))
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+def invalidate_user_tokens(user_id: str):
+    return token_cache.invalidate(lambda entry: entry["claims"]["id"] == user_id)
+
+
+def _on_permissions_invalidated(user_id: str):
+    # Cached users carry the permission_version their claims are checked against
+    if user_id == "*":
+        token_cache.clear()
+    else:
+        invalidate_user_tokens(user_id)
+
+
+def get_token_cache_stats():
+    return token_cache.stats()
+
+
+def get_password_pool_stats():
+    return password_pool.stats()
+
+
+def throttle(scope: str, ip: str, email: str = None, token: str = None):
+    rate_limiter.check(
+        scope,
+        ip=ip,
+        email=email.lower() if email else None,
+        token=_token_digest(token) if token else None,
+    )
+
+
 def get_role_by_name(db: Session, name: str):
     return (
         db.query(RoleModel)
@@ -30,11 +126,30 @@ def get_role_by_name(db: Session, name: str):
     )
 
 
-def get_token(user_id, email):
+def get_token(user_id, email, permissions: dict = None):
     claims = {"id": user_id, "email": email, "time": str(now())}
-
+    if permissions is not None:
+        # Short lived access token carrying the user's permission claims
+        claims.update(permissions)
+        claims["typ"] = "access"
+        claims["exp"] = int(time.time()) + config.get("access_token_ttl", 15) * 60
+    return _make_token(claims)
+
+
+def get_refresh_token(user_id, email):
+    claims = {
+        "id": user_id,
+        "email": email,
+        "time": str(now()),
+        "typ": "refresh",
+        "exp": int(time.time()) + config.get("refresh_token_ttl", 30) * 86400,
+    }
+    return _make_token(claims)
+
+
+def _make_token(claims: dict):
     # Create a signed token with the generated key
-    key = jwk.JWK(**config["jwt_key"])
+    key = _get_jwt_key()
     Token = jwt.JWT(header={"alg": "HS256"}, claims=claims)
     Token.make_signed_token(key)
 
@@ -47,41 +162,150 @@ def get_token(user_id, email):
     return token
 
 
+def _decode_token(token: str):
+    try:
+        key = _get_jwt_key()
+        ET = jwt.JWT(key=key, jwt=token)
+        ST = jwt.JWT(key=key, jwt=ET.claims)
+        claims = ST.claims
+        claims = json.loads(claims)
+    except JWTExpired as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
+        )
+    except Exception as e:
+        print(e)
+        print(traceback.format_exc())
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return claims
+
+
+def get_access_token(db: Session, user_id: str, email: str):
+    permissions = get_permission_claims(db, user_id=user_id)
+    return get_token(user_id, email, permissions=permissions)
+
+
+def _get_cached_user(db: Session, digest: str):
+    entry = token_cache.get(digest)
+    if entry is None:
+        return None
+    db_user = db.merge(entry["user"], load=False)
+    db_user.token_claims = entry["claims"]
+    return db_user
+
+
+def _verify_claims(token: str):
+    claims = _decode_token(token)
+    if claims.get("typ") == "refresh":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
+        )
+    return claims
+
+
+def _cache_user(digest: str, claims: dict, db_user: UserModel):
+    ttl = claims["exp"] - time.time() if "exp" in claims else None
+    token_cache.set(digest, {"claims": claims, "user": _user_snapshot(db_user)}, ttl=ttl)
+    db_user.token_claims = claims
+
+
 def verify_token(db: Session, token: str):
     if not token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
         )
-    else:
-        try:
-            key = jwk.JWK(**config["jwt_key"])
-            ET = jwt.JWT(key=key, jwt=token)
-            ST = jwt.JWT(key=key, jwt=ET.claims)
-            claims = ST.claims
-            claims = json.loads(claims)
-            db_user = get_user_by_id(db, id=claims["id"])
-        except ValueError as e:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
-            )
-        except Exception as e:
-            print(e)
-            print(traceback.format_exc())
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        if db_user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
-            )
+    digest = _token_digest(token)
+    db_user = _get_cached_user(db, digest)
+    if db_user is not None:
         return db_user
+    claims = _verify_claims(token)
+    db_user = get_user_by_id(db, id=claims["id"])
+    if db_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
+        )
+    _cache_user(digest, claims, db_user)
+    return db_user
+
+
+def verify_token_operation(db: Session, token: str, operation: str):
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
+        )
+    digest = _token_digest(token)
+    db_user = _get_cached_user(db, digest)
+    if db_user is not None:
+        verify_user_operation(
+            db,
+            user_id=db_user.id,
+            operation=operation,
+            claims=db_user.token_claims,
+            version=db_user.permission_version,
+        )
+        return db_user
+    claims = _verify_claims(token)
+    data = get_user_with_operation(db, user_id=claims["id"], operation=operation)
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
+        )
+    db_user = data["user"]
+    _cache_user(digest, claims, db_user)
+    allowed = check_claims(db, claims, [operation], db_user.permission_version)
+    if allowed is None:
+        allowed = data["super_admin"] or data["allowed"]
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="You don't have permission.",
+        )
+    return db_user
 
 
-def _create_password(password):
+def refresh_token(db: Session, token: TokenRefresh):
+    claims = _decode_token(token.refresh_token)
+    if claims.get("typ") != "refresh":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
+        )
+    db_user = get_user_by_id(db, id=claims["id"])
+    if db_user is None or db_user.is_deleted:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
+        )
+    data = {
+        "access_token": get_access_token(db, db_user.id, db_user.email),
+        "refresh_token": get_refresh_token(db_user.id, db_user.email),
+    }
+    return data
+
+
+def _hash_password(password):
     password = bytes(password, "utf-8")
-    password = bcrypt.hashpw(password, config["salt"])
+    if config.get("bcrypt_rounds"):
+        salt = bcrypt.gensalt(rounds=config["bcrypt_rounds"])
+    else:
+        salt = config["salt"]
+    password = bcrypt.hashpw(password, salt)
     password = password.decode("utf-8")
     return password
 
 
+async def _create_password(password):
+    return await password_pool.run(_hash_password, password)
+
+
+async def _check_password(password, hashed):
+    password = bytes(password, "utf-8")
+    hashed = bytes(hashed, "utf-8")
+    return await password_pool.run(bcrypt.checkpw, password, hashed)
+
+
 def get_user_by_id(db: Session, id: str):
     return db.query(UserModel).filter(UserModel.id == id).first()
 
@@ -90,48 +314,62 @@ def get_user_by_email(db: Session, email: str):
     return db.query(UserModel).filter(UserModel.email == email).first()
 
 
-def sign_up(db: Session, user: UserSignUp):
-    id = generate_id()
-    user = user.dict()
-    email = user["email"]
-    db_user = get_user_by_email(db, email=email)
-    password = user["password"]
+# The password handlers are async so bcrypt is awaited rather than waited on
+# from a threadpool thread; their database steps still run in the threadpool.
+
+
+async def sign_up(db: Session, user: UserSignUp):
+    db_user = await run_in_threadpool(get_user_by_email, db, email=user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="User already exist."
         )
-    user["password"] = _create_password(password)
+    password = await _create_password(user.password)
+    return await run_in_threadpool(_create_user, db, user, password)
+
+
+def _create_user(db: Session, user: UserSignUp, password: str):
+    id = generate_id()
+    user = user.dict()
+    email = user["email"]
+    user["password"] = password
     db_user = UserModel(id=id, **user)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    counts.incr("users")
     role = get_role_by_name(db=db, name="normal user")
     update_user_role(db, user_id=id, role_id=role.id)
     user["id"] = id
     user["token"] = get_token(id, email)
+    user["access_token"] = get_access_token(db, id, email)
+    user["refresh_token"] = get_refresh_token(id, email)
     return user
 
 
-def sign_in(db: Session, user: UserLogin):
-    db_user = get_user_by_email(db, email=user.email)
+async def sign_in(db: Session, user: UserLogin):
+    db_user = await run_in_threadpool(get_user_by_email, db, email=user.email)
     if db_user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    hashed = db_user.password
-    hashed = bytes(hashed, "utf-8")
-    password = bytes(user.password, "utf-8")
-    if not bcrypt.checkpw(password, hashed):
+    if not await _check_password(user.password, db_user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    return await run_in_threadpool(_login_user, db, db_user)
+
+
+def _login_user(db: Session, db_user: UserModel):
     user = object_as_dict(db_user)
     user["token"] = get_token(db_user.id, db_user.email)
+    user["access_token"] = get_access_token(db, db_user.id, db_user.email)
+    user["refresh_token"] = get_refresh_token(db_user.id, db_user.email)
     return user
 
 
-def change_password(db: Session, user: ChangePassword, token: str):
-    db_user = verify_token(db, token=token)
+async def change_password(db: Session, user: ChangePassword, token: str):
+    db_user = await run_in_threadpool(verify_token, db, token=token)
     try:
-        hashed = bytes(db_user.password, "utf-8")
-        password = bytes(user.old_password, "utf-8")
-        result = bcrypt.checkpw(password, hashed)
+        result = await _check_password(user.old_password, db_user.password)
+    except HTTPException:
+        raise
     except Exception as e:
         print(e)
         print(traceback.format_exc())
@@ -141,24 +379,33 @@ def change_password(db: Session, user: ChangePassword, token: str):
             status_code=status.HTTP_403_FORBIDDEN, detail="Incorrect old password"
         )
     else:
-        password = _create_password(user.new_password)
-        db_user.password = password
-        db_user.updated_at = now()
-        db.commit()
+        password = await _create_password(user.new_password)
+        await run_in_threadpool(_set_password, db, db_user, password)
+
+
+def _set_password(db: Session, db_user: UserModel, password: str):
+    db_user.password = password
+    db_user.updated_at = now()
+    db.commit()
+    invalidate_user_tokens(db_user.id)
+
 
+async def add_user(db: Session, user: UserSignUp):
+    db_user = await run_in_threadpool(get_user_by_email, db, email=user.email)
+    password = None if db_user else await _create_password(user.password)
+    return await run_in_threadpool(_add_user, db, user, db_user, password)
 
-def add_user(db: Session, user: UserSignUp):
+
+def _add_user(db: Session, user: UserSignUp, db_user: UserModel, password: str):
     id = generate_id()
     user = user.dict()
-    email = user["email"]
-    db_user = get_user_by_email(db, email=email)
-    password = user["password"]
     role_id = user["role"]
     if not db_user:
-        user["password"] = _create_password(password)
+        user["password"] = password
         del user["role"]
         db_user = UserModel(id=id, **user)
         db.add(db_user)
+        counts.incr("users")
     db.commit()
     db.refresh(db_user)
     update_user_role(db, user_id=id, role_id=role_id)
@@ -166,7 +413,14 @@ def add_user(db: Session, user: UserSignUp):
 
 
 def get_users(
-    db: Session, start: int, limit: int, sort_by: str, order: str, search: str
+    db: Session,
+    start: int,
+    limit: int,
+    sort_by: str,
+    order: str,
+    search: str,
+    cursor: str = None,
+    count_mode: str = "exact",
 ):
     query = db.query(UserModel).filter(UserModel.is_deleted == False)
 
@@ -179,35 +433,12 @@ def get_users(
                 UserModel.email.like(text),
             )
         )
-        count = query.filter(
-            or_(
-                UserModel.first_name.like(text),
-                UserModel.last_name.like(text),
-                UserModel.email.like(text),
-            )
-        ).count()
-    else:
-        count = db.query(UserModel).count()
-
-    if sort_by == "first_name":
-        if order == "desc":
-            query = query.order_by(UserModel.first_name.desc())
-        else:
-            query = query.order_by(UserModel.first_name)
-    elif sort_by == "last_name":
-        if order == "desc":
-            query = query.order_by(UserModel.last_name.desc())
-        else:
-            query = query.order_by(UserModel.last_name)
-    elif sort_by == "email":
-        if order == "desc":
-            query = query.order_by(UserModel.email.desc())
-        else:
-            query = query.order_by(UserModel.email)
-    else:
-        query = query.order_by(UserModel.created_at.desc())
 
-    results = query.offset(start).limit(limit).all()
+    filters = {"search": search.strip().lower() if search != "all" else None}
+    count = counts.count(db, query, "users", filters, mode=count_mode)
+
+    sort_column, descending = get_sort(USER_SORT_COLUMNS, sort_by, order, UserModel.created_at)
+    results, next_cursor = paginate(query, sort_column, UserModel.id, descending, limit, cursor, start)
     users = []
     for user in results:
         user_role = get_user_role(db, user.id)
@@ -219,7 +450,7 @@ def get_users(
             "role": user_role.role,
         }
         users.append(_user)
-    data = {"count": count, "list": users}
+    data = {"count": count, "list": users, "next_cursor": next_cursor}
     return data
 
 
@@ -233,7 +464,9 @@ def update_user_role(db: Session, user_id: str, role_id: str):
     id = str(uuid4())
     db_user_role = UserRoleModel(id=id, user_id=user_id, role_id=role_id)
     db.add(db_user_role)
+    bump_permission_version(db, user_id=user_id)
     db.commit()
+    invalidate_user_permissions(user_id)
     return
 
 
@@ -262,6 +495,8 @@ def update_profile(db: Session, token: str, user: UserUpdate):
     db_user.last_name = user.last_name
     db_user.updated_at = now()
     db.commit()
+    invalidate_user_tokens(db_user.id)
+    invalidate_responses(f"user:{db_user.id}")
     return db_user
 
 
@@ -271,6 +506,8 @@ def update_user_profile(db: Session, user_id: str, user: AdminUserUpdate):
     db_user.last_name = user.last_name
     db.commit()
     db.refresh(db_user)
+    invalidate_user_tokens(user_id)
+    invalidate_responses(f"user:{user_id}")
     if db_user.user_role[0].role.id != user.role_id:
         update_user_role(db, user_id=user_id, role_id=user.role_id)
     db_user = get_user_profile(db, user_id=user_id)
@@ -279,10 +516,18 @@ def update_user_profile(db: Session, user_id: str, user: AdminUserUpdate):
 
 def delete_user(db: Session, user_id: str):
     db_user = get_user_by_id(db, id=user_id)
-    if db_user is None:
+    if db_user is not None:
+        # Locked so two concurrent deletes can't both decrement the counter
+        db.refresh(db_user, with_for_update=True)
+    if db_user is None or db_user.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found."
         )
     db_user.is_deleted = True
     db.commit()
+    counts.incr("users", -1)
+    invalidate_user_tokens(user_id)
     return
+
+
+channel.subscribe("permissions", _on_permissions_invalidated)
@@ -1,4 +1,6 @@
-from typing import List, Optional
+import json
+
+from typing import Dict, List, Optional
 from fastapi import HTTPException, status
 from pydantic import BaseModel, Field, validator
 from email_validator import EmailNotValidError, validate_email
@@ -17,11 +19,22 @@ class UserLoginResponse(BaseModel):
     last_name: str = Field(min_length=3, max_length=50)
     email: str = Field(min_length=5, max_length=50)
     token: str
+    access_token: Optional[str] = None
+    refresh_token: Optional[str] = None
 
     class Config:
         orm_mode = True
 
 
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
+
+class TokenResponse(BaseModel):
+    access_token: str
+    refresh_token: str
+
+
 class UserLogin(BaseModel):
     email: str = Field(min_length=5, max_length=50)
     password: str = Field(min_length=3, max_length=50)
@@ -94,6 +107,15 @@ class User(BaseModel):
         orm_mode = True
 
 
+class UserSummary(BaseModel):
+    id: str
+    first_name: str
+    last_name: str
+
+    class Config:
+        orm_mode = True
+
+
 class Role(BaseModel):
     id: str
     name: str
@@ -104,8 +126,9 @@ class Role(BaseModel):
 
 
 class RoleList(BaseModel):
-    count: int
+    count: Optional[int] = None
     list: List[Role]
+    next_cursor: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -144,8 +167,9 @@ class AdminUser(BaseModel):
 
 
 class AdminUserList(BaseModel):
-    count: int
+    count: Optional[int] = None
     list: List[AdminUser]
+    next_cursor: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -174,14 +198,52 @@ class MovieAdd(BaseModel):
     year: int
 
 
+class UploadCreate(BaseModel):
+    size: int = Field(..., gt=0)
+    content_type: str = Field(..., max_length=100, regex=r"^video/[\w.+-]+$")
+
+
+class StoredFile(BaseModel):
+    id: str
+    content_type: str
+    size: int
+    sha256: str
+
+
+class MovieUpload(BaseModel):
+    id: str
+    movie_id: str
+    content_type: str
+    size: int
+    upload_offset: int
+    expires_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+def parse_histogram(value):
+    if value is None:
+        return {}
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
 class Movie(BaseModel):
     id: str
     title: str
     description: str
     year: int
     user: User
+    rating_count: int = 0
+    rating_sum: int = 0
+    rating_histogram: Dict[int, int] = {}
+    comment_count: int = 0
     images: List[MovieImage] = []
 
+    _histogram = validator("rating_histogram", pre=True, allow_reuse=True)(parse_histogram)
+
     class Config:
         orm_mode = True
 
@@ -192,12 +254,68 @@ class MovieResponse(BaseModel):
     description: str
     year: int
     user: User
+    rating_count: int = 0
+    rating_sum: int = 0
+    rating_histogram: Dict[int, int] = {}
+    comment_count: int = 0
     thumbnail: Optional[MovieImage] = None
 
+    _histogram = validator("rating_histogram", pre=True, allow_reuse=True)(parse_histogram)
+
+    class Config:
+        orm_mode = True
+
+
+class RankedMovie(MovieResponse):
+    score: float
+
+
+class RankedMovieList(BaseModel):
+    list: List[RankedMovie] = []
+    next_cursor: Optional[str] = None
+
     class Config:
         orm_mode = True
 
 
+class FacetBucket(BaseModel):
+    value: str
+    count: int
+
+
+class UploaderFacet(BaseModel):
+    id: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    count: int
+
+
+class MovieFacets(BaseModel):
+    count: int
+    years: List[FacetBucket] = []
+    uploaders: List[UploaderFacet] = []
+    ratings: List[FacetBucket] = []
+
+
+class MovieSuggestion(BaseModel):
+    id: str
+    title: str
+
+
+class MovieSuggestionList(BaseModel):
+    list: List[MovieSuggestion] = []
+
+
+class SimilarMovie(BaseModel):
+    id: str
+    title: str
+    score: float
+
+
+class SimilarMovieList(BaseModel):
+    list: List[SimilarMovie] = []
+
+
 class MovieDownload(BaseModel):
     id: str
     title: str
@@ -210,8 +328,9 @@ class MovieDownload(BaseModel):
 
 
 class MovieList(BaseModel):
-    count: int
+    count: Optional[int] = None
     list: List[MovieResponse] = []
+    next_cursor: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -228,6 +347,19 @@ class Reply(BaseModel):
     text: str
     created_at: datetime
     user: User
+    replies: List["Reply"] = []
+    replies_cursor: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+
+Reply.update_forward_refs()
+
+
+class ReplyList(BaseModel):
+    list: List[Reply] = []
+    next_cursor: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -239,6 +371,7 @@ class Comment(BaseModel):
     created_at: datetime
     user: User
     replies: List[Reply] = []
+    replies_cursor: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -246,14 +379,27 @@ class Comment(BaseModel):
 
 class MovieComment(Movie):
     comments: List[Comment] = []
+    next_cursor: Optional[str] = None
 
     class Config:
         orm_mode = True
 
 
 class CommentList(BaseModel):
-    count: int
+    count: Optional[int] = None
     list: List[Comment] = []
+    next_cursor: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+
+class CommentRow(BaseModel):
+    id: str
+    text: str
+    parent_id: str
+    created_at: datetime
+    user: User
 
     class Config:
         orm_mode = True
@@ -283,14 +429,45 @@ class Rating(BaseModel):
 
 class MovieRatings(Movie):
     ratings: List[Rating] = []
+    next_cursor: Optional[str] = None
 
     class Config:
         orm_mode = True
 
 
 class RatingList(BaseModel):
-    count: int
+    count: Optional[int] = None
     list: List[Rating] = []
+    next_cursor: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+
+class RatingSummary(BaseModel):
+    id: str
+    score: int
+    text: Optional[str] = None
+    movie_id: str
+    created_at: datetime
+    user: UserSummary
+
+    class Config:
+        orm_mode = True
+
+
+class MovieRatingSummaries(Movie):
+    ratings: List[RatingSummary] = []
+    next_cursor: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+
+class RatingSummaryList(BaseModel):
+    count: Optional[int] = None
+    list: List[RatingSummary] = []
+    next_cursor: Optional[str] = None
 
     class Config:
         orm_mode = True
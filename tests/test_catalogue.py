@@ -0,0 +1,62 @@
+import random
+import unittest
+
+from datetime import datetime
+
+from libs.catalogue import MovieSnapshot
+from libs.utils import generate_id
+
+
+def _record(movie_id: str, year: int):
+    return {
+        "id": movie_id,
+        "title": f"Movie {movie_id[:8]}",
+        "year": year,
+        "created_at": datetime(2020, 1, 1),
+        "rating_average": 0,
+        "has_video": False,
+        "user_id": "user",
+        "description": "Test",
+        "rating_count": 0,
+        "rating_sum": 0,
+        "rating_histogram": None,
+        "comment_count": 0,
+        "thumbnail": None,
+    }
+
+
+class TestMovieSnapshot(unittest.TestCase):
+    def setUp(self):
+        # Mostly ties on year, loaded in a different order by each "worker"
+        self.records = [_record(generate_id(), random.choice([None, 1999, 2000])) for _ in range(40)]
+        self.first, self.second = MovieSnapshot(), MovieSnapshot()
+        self.first.extend(self.records)
+        self.second.extend(random.sample(self.records, len(self.records)))
+
+    def _expected(self, descending: bool):
+        keys = sorted(((-1 if record["year"] is None else record["year"], record["id"]) for record in self.records))
+        ids = [movie_id for _, movie_id in keys]
+        return ids[::-1] if descending else ids
+
+    def test_cursor_continues_on_another_snapshot(self):
+        for descending in (False, True):
+            with self.subTest(descending=descending):
+                ids, cursor = [], None
+                for page in range(20):
+                    snapshot = self.first if page % 2 else self.second
+                    records, _, cursor = snapshot.query(sort_key="year", descending=descending, limit=3, cursor=cursor)
+                    ids.extend(record["id"] for record in records)
+                    if cursor is None:
+                        break
+                self.assertEqual(ids, self._expected(descending))
+
+    def test_cursor_on_a_removed_row_keeps_its_place(self):
+        expected = self._expected(descending=False)
+        _, _, cursor = self.first.query(sort_key="year", descending=False, limit=5)
+        self.second.remove(expected[4])
+        records, _, _ = self.second.query(sort_key="year", descending=False, limit=5, cursor=cursor)
+        self.assertEqual([record["id"] for record in records], expected[5:10])
+
+
+if __name__ == "__main__":
+    unittest.main()
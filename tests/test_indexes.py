@@ -0,0 +1,106 @@
+import unittest
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from libs.utils import generate_id
+from models import (
+    MovieCommentModel,
+    MovieImageModel,
+    MovieModel,
+    MovieRatingModel,
+    RoleModel,
+    UserModel,
+    UserRoleModel,
+)
+from routers.admin.v1.crud import comments, movies, operations, permissions, ratings, users
+
+
+HOT_TABLES = (
+    "users",
+    "user_roles",
+    "operations",
+    "movies",
+    "movie_images",
+    "movie_ratings",
+    "movie_comments",
+)
+
+
+class TestIndexes(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)()
+
+        self.user_id = generate_id()
+        role_id = generate_id()
+        self.movie_id = generate_id()
+        self.db.add(UserModel(id=self.user_id, first_name="Test", last_name="User", email="test@example.com", password="x"))
+        self.db.add(RoleModel(id=role_id, slug="normal user", name="normal user"))
+        self.db.add(UserRoleModel(id=generate_id(), user_id=self.user_id, role_id=role_id))
+        self.db.add(MovieModel(id=self.movie_id, title="Test", description="Test", year=2000, user_id=self.user_id))
+        self.db.add(MovieImageModel(id=generate_id(), name="x", path="x", is_thumbnail=True, movie_id=self.movie_id))
+        self.db.add(MovieRatingModel(id=generate_id(), score=5, movie_id=self.movie_id, user_id=self.user_id))
+        self.comment_id = generate_id()
+        self.db.add(MovieCommentModel(id=self.comment_id, text="Test", movie_id=self.movie_id, user_id=self.user_id))
+        self.db.add(
+            MovieCommentModel(
+                id=generate_id(), text="Reply", parent_id=self.comment_id, movie_id=self.movie_id, user_id=self.user_id
+            )
+        )
+        self.db.commit()
+
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._capture)
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+    def _full_scans(self):
+        event.remove(self.engine, "before_cursor_execute", self._capture)
+        scans = []
+        with self.engine.connect() as conn:
+            for statement, parameters in self.statements:
+                plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+                for row in plan:
+                    detail = row[-1]
+                    for table in HOT_TABLES:
+                        if detail == f"SCAN {table}" or detail.startswith(f"SCAN {table} "):
+                            if "INDEX" not in detail:
+                                scans.append((statement, detail))
+        return scans
+
+    def test_hot_queries_use_indexes(self):
+        users.get_user_by_email(self.db, email="test@example.com")
+        permissions.get_user_permissions(self.db, user_id=self.user_id)
+        operations.get_all_operations(self.db)
+        movies.get_movie_list(self.db, 0, 10, "all", "all", "all", "all")
+        movies.get_movie_list(self.db, 0, 10, "all", "year", "asc", "all", year_from=1990, year_to=2010)
+        movies.get_movie_list(self.db, 0, 10, "all", "all", "all", "all", min_rating=3)
+        movies.get_movie_list(self.db, 0, 10, "all", "title", "asc", "all")
+        movies.get_movie_list(self.db, 0, 10, "all", "all", "all", self.user_id, has_video=True)
+        movies.get_movie_list(self.db, 0, 10, "all", "year", "desc", self.user_id)
+        movies.get_movie_thumbnails(self.db, [self.movie_id])
+        movies.get_movie_images(self.db, movie_id=self.movie_id)
+        comments.get_comment_list(self.db, 0, 10, "all", "all", "all", self.movie_id)
+        comments.get_comment_replies(self.db, self.movie_id, self.comment_id, 10)
+        ratings.get_rating_list(self.db, 0, 10, "all", "all", "all", self.movie_id)
+        ratings.get_all_ratings(self.db, self.movie_id, 10)
+        comments.get_all_comments(self.db, self.movie_id, 10)
+        self.assertEqual(self._full_scans(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from dependencies import get_db
+from libs.utils import generate_id
+from main import app
+from models import MovieImageModel, MovieModel, UserModel
+
+
+class TestMovies(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
+        def override_get_db():
+            db = self.Session()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        self.client = TestClient(app)
+
+        db = self.Session()
+        for no in range(5):
+            user_id = generate_id()
+            db.add(UserModel(id=user_id, first_name="Test", last_name=f"User{no}", email=f"user{no}@example.com", password="x"))
+            for movie_no in range(4):
+                movie_id = generate_id()
+                db.add(MovieModel(id=movie_id, title=f"Movie {no}-{movie_no}", description="Test", year=2000 + no, user_id=user_id))
+                db.add(MovieImageModel(id=generate_id(), name="thumb.png", path="uploads/default.png", is_thumbnail=True, movie_id=movie_id))
+        db.commit()
+        db.close()
+
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._count_statement)
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+        self.engine.dispose()
+
+    def _count_statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def _count_movie_list(self, limit):
+        self.statements.clear()
+        response = self.client.get("/movies", params={"limit": limit, "count": "none"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["list"]), limit)
+        self.assertTrue(all(movie["thumbnail"] for movie in response.json()["list"]))
+        return len(self.statements)
+
+    def test_movie_list_statement_count_is_constant(self):
+        self.assertEqual(self._count_movie_list(1), self._count_movie_list(20))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import base64
+import json
+import unittest
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from libs.pagination import encode_cursor, paginate
+from libs.utils import generate_id
+from models import MovieModel, UserModel
+
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)()
+
+        user_id = generate_id()
+        self.db.add(UserModel(id=user_id, first_name="Test", last_name="User", email="test@example.com", password="x"))
+        # Ties and NULLs in the sort column make page boundaries fall inside groups
+        for no, year in enumerate([None, 1999, None, 2001, 1999, None, 2005, 1999, None, 2001, 2010]):
+            self.db.add(MovieModel(id=generate_id(), title=f"Movie {no}", description="Test", year=year, user_id=user_id))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+
+    def _walk(self, descending: bool, limit: int):
+        ids, cursor = [], None
+        while True:
+            query = self.db.query(MovieModel)
+            results, cursor = paginate(query, MovieModel.year, MovieModel.id, descending, limit, cursor)
+            ids.extend(result.id for result in results)
+            if cursor is None:
+                return ids
+
+    def _expected(self, descending: bool):
+        order = (MovieModel.year.desc(), MovieModel.id.desc()) if descending else (MovieModel.year, MovieModel.id)
+        return [movie.id for movie in self.db.query(MovieModel).order_by(*order)]
+
+    def test_pages_continue_across_ties_and_nulls(self):
+        for descending in (False, True):
+            for limit in (1, 2, 3, 4):
+                with self.subTest(descending=descending, limit=limit):
+                    self.assertEqual(self._walk(descending, limit), self._expected(descending))
+
+    def test_cursor_on_null_value_continues(self):
+        expected = self._expected(descending=False)
+        first_null = self.db.query(MovieModel).get(expected[0])
+        self.assertIsNone(first_null.year)
+        cursor = encode_cursor(["k", None, first_null.id])
+        results, _ = paginate(self.db.query(MovieModel), MovieModel.year, MovieModel.id, False, 3, cursor)
+        self.assertEqual([result.id for result in results], expected[1:4])
+
+    def test_malformed_cursors_are_rejected(self):
+        def raw(payload):
+            data = json.dumps(payload).encode("utf-8")
+            return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+        cursors = [
+            "not a cursor",
+            raw({"k": 1}),
+            raw([]),
+            raw(["x", 1]),
+            raw(["o", "10"]),
+            raw(["o", -1]),
+            raw(["k", 2000]),
+            raw(["k", 2000, "id", "extra"]),
+            raw(["k", [2000], "id"]),
+            raw(["k", {"dt": "yesterday"}, "id"]),
+            raw(["k", 2000, None]),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(HTTPException) as raised:
+                    paginate(self.db.query(MovieModel), MovieModel.year, MovieModel.id, False, 3, cursor)
+                self.assertEqual(raised.exception.status_code, 422)
+
+    def test_cursor_kind_must_match_the_paging_mode(self):
+        with self.assertRaises(HTTPException) as raised:
+            paginate(self.db.query(MovieModel), None, MovieModel.id, False, 3, encode_cursor(["k", 2000, "id"]))
+        self.assertEqual(raised.exception.status_code, 422)
+        with self.assertRaises(HTTPException) as raised:
+            paginate(self.db.query(MovieModel), MovieModel.year, MovieModel.id, False, 3, encode_cursor(["o", 3]))
+        self.assertEqual(raised.exception.status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from fastapi.testclient import TestClient
+
+from libs.ranges import MAX_RANGES, parse_range
+from main import app
+
+
+class TestParseRange(unittest.TestCase):
+    def test_ranges_are_parsed_and_merged(self):
+        self.assertEqual(parse_range("bytes=0-99", 1000), [(0, 100)])
+        self.assertEqual(parse_range("bytes=900-", 1000), [(900, 1000)])
+        self.assertEqual(parse_range("bytes=-100", 1000), [(900, 1000)])
+        self.assertEqual(parse_range("bytes=500-2000", 1000), [(500, 1000)])
+        self.assertEqual(parse_range("bytes=200-299, 0-99, 50-149", 1000), [(0, 150), (200, 300)])
+        self.assertEqual(parse_range("bytes=0-99,100-199", 1000), [(0, 200)])
+
+    def test_unusable_headers_are_ignored(self):
+        for header in ("items=0-99", "bytes=", "bytes=abc", "bytes=99-0", "bytes=0-99,x"):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 1000))
+        many = ",".join(f"{no * 10}-{no * 10 + 1}" for no in range(MAX_RANGES + 1))
+        self.assertIsNone(parse_range(f"bytes={many}", 1000))
+
+    def test_ranges_past_the_end_are_unsatisfiable(self):
+        self.assertEqual(parse_range("bytes=1000-", 1000), [])
+        self.assertEqual(parse_range("bytes=-0", 1000), [])
+
+
+class TestFiles(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.makedirs("uploads/movies")
+        self.data = os.urandom(4096)
+        with open("uploads/movies/clip.mp4", "wb") as file:
+            file.write(self.data)
+        with open("uploads/default.png", "wb") as file:
+            file.write(b"\x89PNG\r\n\x1a\n")
+        with open("config.py", "w") as file:
+            file.write("secret = 'x'\n")
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def _get(self, path, **headers):
+        return self.client.get("/files", params={"f": path}, headers=headers)
+
+    def test_single_and_multiple_ranges(self):
+        response = self._get("uploads/movies/clip.mp4", Range="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers["content-range"], "bytes 100-199/4096")
+        self.assertEqual(response.content, self.data[100:200])
+
+        response = self._get("uploads/movies/clip.mp4", Range="bytes=0-9,20-29")
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.headers["content-type"].startswith("multipart/byteranges"))
+        self.assertIn(self.data[20:30], response.content)
+
+    def test_unsatisfiable_range_is_416(self):
+        response = self._get("uploads/movies/clip.mp4", Range="bytes=5000-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["content-range"], "bytes */4096")
+        self.assertEqual(response.content, b"")
+
+    def test_if_range_with_changed_validator_sends_the_whole_file(self):
+        etag = self._get("uploads/movies/clip.mp4").headers["etag"]
+        response = self._get("uploads/movies/clip.mp4", Range="bytes=0-9", **{"If-Range": etag})
+        self.assertEqual(response.status_code, 206)
+
+        for validator in ('"changed"', f"W/{etag}", "Thu, 01 Jan 1970 00:00:00 GMT"):
+            with self.subTest(validator=validator):
+                response = self._get("uploads/movies/clip.mp4", Range="bytes=0-9", **{"If-Range": validator})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, self.data)
+
+    def test_paths_outside_uploads_are_not_served(self):
+        for path in ("uploads/../config.py", "config.py", "/etc/passwd", "uploads/movies/../../config.py"):
+            with self.subTest(path=path):
+                response = self._get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, b"\x89PNG\r\n\x1a\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import unittest
+
+from unittest import mock
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from libs.utils import generate_id
+from models import MovieModel, MovieRatingModel, UserModel
+from routers.admin.v1.crud import ratings
+from routers.admin.v1.schemas import RatingUpdate
+
+
+class TestRatings(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.db = self.Session()
+
+        user_id = generate_id()
+        self.movie_id = generate_id()
+        self.rating_id = generate_id()
+        self.db.add(UserModel(id=user_id, first_name="Test", last_name="User", email="test@example.com", password="x"))
+        self.db.add(MovieModel(
+            id=self.movie_id, title="Movie", description="Test", year=2000, user_id=user_id,
+            rating_count=1, rating_sum=4, rating_average=4, rating_histogram=json.dumps({"4": 1}),
+        ))
+        self.db.add(MovieRatingModel(id=self.rating_id, score=4, text="Good", movie_id=self.movie_id, user_id=user_id))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+
+    def test_update_of_a_rating_deleted_before_the_lock_is_rejected(self):
+        lock_movie = ratings.lock_movie
+
+        def delete_then_lock(db, movie_id):
+            # Another request deletes the rating after update_rating looked it up
+            other = self.Session()
+            with mock.patch.object(ratings, "lock_movie", lock_movie):
+                ratings.delete_rating(other, self.movie_id, self.rating_id)
+            other.close()
+            return lock_movie(db, movie_id)
+
+        with mock.patch.object(ratings, "lock_movie", delete_then_lock):
+            with self.assertRaises(HTTPException) as raised:
+                ratings.update_rating(self.db, self.movie_id, self.rating_id, RatingUpdate(score=2, text="Bad"))
+        self.assertEqual(raised.exception.status_code, 404)
+
+        self.db.rollback()
+        db_movie = self.db.query(MovieModel).get(self.movie_id)
+        self.assertEqual((db_movie.rating_count, db_movie.rating_sum, db_movie.rating_average), (0, 0, 0))
+        self.assertEqual(json.loads(db_movie.rating_histogram), {})
+        self.assertEqual(self.db.query(MovieRatingModel).get(self.rating_id).score, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+import asyncio
+import base64
+import hashlib
+import os
+import tempfile
+import unittest
+
+from datetime import timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from libs.utils import generate_id, now
+from models import MovieModel, MovieUploadModel, UserModel
+from routers.admin.v1.crud import uploads
+from routers.admin.v1.schemas import UploadCreate
+
+MP4 = b"\x00\x00\x00\x18ftypisom" + b"\x00" * 88
+
+
+async def _body(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def _checksum(data: bytes):
+    return "sha256 " + base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")
+
+
+class TestUploads(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+        self.engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)()
+
+        self.user_id = generate_id()
+        self.movie_id = generate_id()
+        self.db.add(UserModel(id=self.user_id, first_name="Test", last_name="User", email="test@example.com", password="x"))
+        self.db.add(MovieModel(id=self.movie_id, title="Movie", description="Test", year=2000, user_id=self.user_id))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def _create(self, size: int = len(MP4)):
+        upload = UploadCreate(size=size, content_type="video/mp4")
+        return uploads.create_upload(self.db, self.movie_id, self.user_id, upload)
+
+    def _write(self, upload_id: str, offset: int, *chunks, checksum: str = None):
+        return asyncio.run(uploads.write_chunk(
+            self.db, self.movie_id, upload_id, self.user_id, offset, checksum, _body(*chunks)
+        ))
+
+    def _assert_status(self, code: int, call, *args, **kwargs):
+        with self.assertRaises(HTTPException) as raised:
+            call(*args, **kwargs)
+        self.assertEqual(raised.exception.status_code, code)
+
+    def test_chunks_must_start_at_the_current_offset(self):
+        db_upload = self._create()
+        self._assert_status(409, self._write, db_upload.id, 10, MP4[10:20])
+        self.assertEqual(self._write(db_upload.id, 0, MP4[:50]), 50)
+        # A replayed chunk must not move the offset again
+        self._assert_status(409, self._write, db_upload.id, 0, MP4[:50])
+        self.assertEqual(self._write(db_upload.id, 50, MP4[50:]), len(MP4))
+
+        db_movie = uploads.finalize_upload(self.db, self.movie_id, db_upload.id, self.user_id)
+        with open(db_movie.path, "rb") as file:
+            self.assertEqual(file.read(), MP4)
+
+    def test_concurrent_chunk_cannot_write_over_a_leased_upload(self):
+        db_upload = self._create()
+        other = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)()
+
+        async def race():
+            claimed, release = asyncio.Event(), asyncio.Event()
+
+            async def slow_body():
+                claimed.set()
+                await release.wait()
+                yield MP4[:50]
+
+            async def fast_writer():
+                await claimed.wait()
+                try:
+                    return await uploads.write_chunk(
+                        other, self.movie_id, db_upload.id, self.user_id, 0, None, _body(b"Z" * 50)
+                    )
+                except HTTPException as error:
+                    return error.status_code
+                finally:
+                    release.set()
+
+            slow = asyncio.ensure_future(uploads.write_chunk(
+                self.db, self.movie_id, db_upload.id, self.user_id, 0, None, slow_body()
+            ))
+            fast = await fast_writer()
+            return await slow, fast
+
+        self.assertEqual(asyncio.run(race()), (50, 409))
+        other.close()
+        with open(db_upload.path, "rb") as file:
+            self.assertEqual(file.read(), MP4[:50])
+        # The lease is released with the offset, so the next chunk goes through
+        self.assertEqual(self._write(db_upload.id, 50, MP4[50:]), len(MP4))
+
+    def test_checksum_mismatch_keeps_the_offset(self):
+        db_upload = self._create()
+        self._assert_status(422, self._write, db_upload.id, 0, MP4[:50], checksum=_checksum(b"other"))
+        self.db.expire_all()
+        self.assertEqual(uploads.get_upload(self.db, self.movie_id, db_upload.id, self.user_id).upload_offset, 0)
+        self.assertEqual(self._write(db_upload.id, 0, MP4[:50], checksum=_checksum(MP4[:50])), 50)
+
+    def test_expired_uploads_are_gone_and_swept(self):
+        db_upload = self._create()
+        upload_id, path = db_upload.id, db_upload.path
+        db_upload.expires_at = now() - timedelta(seconds=1)
+        self.db.commit()
+
+        self._assert_status(404, uploads.get_upload, self.db, self.movie_id, upload_id, self.user_id)
+        self._assert_status(404, self._write, upload_id, 0, MP4)
+        self.assertEqual(uploads.expire_uploads(self.db), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(self.db.query(MovieUploadModel).get(upload_id))
+
+    def test_open_uploads_are_capped_per_user(self):
+        for _ in range(uploads.UPLOAD_MAX_OPEN):
+            self._create()
+        self._assert_status(429, self._create)
+
+    def test_content_must_match_the_magic_bytes(self):
+        html = b"<html>" + b"x" * 94
+        db_upload = self._create(len(html))
+        self._write(db_upload.id, 0, html)
+        self._assert_status(415, uploads.finalize_upload, self.db, self.movie_id, db_upload.id, self.user_id)
+
+        put = uploads.put_movie_video(self.db, self.movie_id, _body(html))
+        self._assert_status(415, asyncio.run, put)
+        self.assertEqual(os.listdir("uploads/movies"), [os.path.basename(db_upload.path)])
+
+        result = asyncio.run(uploads.put_movie_video(self.db, self.movie_id, _body(MP4[:40], MP4[40:])))
+        self.assertEqual(result["content_type"], "video/mp4")
+        self.assertEqual(result["size"], len(MP4))
+
+
+if __name__ == "__main__":
+    unittest.main()